@@ -3,35 +3,174 @@
 Twitter/X API v2 helper script.
 
 Usage:
-  twitter-api.py read_tweet <tweet_url_or_id>
-  twitter-api.py search <query> [--max_results=10]
-  twitter-api.py bookmarks [--max_results=10]
-  twitter-api.py user_tweets <username> [--max_results=10]
+  twitter-api.py read_tweet <tweet_url_or_id>... [--file=PATH|-] [--fresh]
+  twitter-api.py read_thread <tweet_url_or_id> [--flat] [--fresh]
+  twitter-api.py search <query> [--max_results=10|--limit=N|--all] [--ndjson] [--digest [--clusters=10]]
+                        [--since=DATE] [--until=DATE] [--window=7d] [--parallel[=4]]
+  twitter-api.py bookmarks [--max_results=10|--limit=N|--all] [--ndjson] [--remote]
+                           [--query=WORDS] [--author=USER] [--since=DATE] [--until=DATE]
+                           [--sort=saved|recent|likes|impressions] [--removed]
+  twitter-api.py bookmarks_sync [--full]
+  twitter-api.py user_tweets <username>... [--max_results=10|--limit=N|--all] [--merge] [--ndjson]
+  twitter-api.py monitor [name=query | query]... [--file=QUERIES.json] [--reset]
+  twitter-api.py counts [name=query | query]... [--file=QUERIES.json] [--granularity=minute|hour|day]
+                        [--since=DATE] [--until=DATE] [--window=7d] [--spikes[=3]] [--baseline=N] [--buckets]
+  twitter-api.py stream [name=query | query]... [--file=QUERIES.json] [--rules_only]
+                        [--duration=DURATION] [--max_tweets=N] [--out=PATH|-] [--stall_timeout=30]
+  twitter-api.py stream_read [--consumer=NAME] [--limit=N] [--peek] [--reset] [--queue=PATH]
+  twitter-api.py local_search [query] [--author=USER] [--since=DATE] [--until=DATE] [--days=N]
+                              [--min_likes=N] [--min_retweets=N] [--min_impressions=N]
+                              [--sort=recent|likes|impressions|relevance] [--limit=20]
+  twitter-api.py track [<tweet_url_or_id>... | --file=PATH | -]
+  twitter-api.py track_report [<tweet_url_or_id>...] [--window=24h] [--sort=likes|impressions|...]
+  twitter-api.py cache_stats
+  twitter-api.py serve [--socket=PATH]
+
+search, bookmarks and user_tweets also accept --limit=N (follow next_token
+until N tweets) or --all (until exhausted), --next_token=T to resume (not
+offered when the limit ends mid-page, e.g. --limit=5), and --ndjson to print each tweet as its page arrives followed by a summary line.
+
+Given several URLs/IDs (as args, one per line on stdin with `-`, or in
+--file), read_tweet looks them up 100 at a time via /2/tweets?ids= and returns
+{"count", "failed", "tweets"} in input order, with per-ID error entries.
+
+read_thread returns the whole conversation a tweet belongs to as a reply
+tree (or, with --flat, a depth-first list with depth and in_reply_to). The
+reply graph is cached for 7 days, so re-reading a thread only searches for
+replies newer than the cached ones.
+
+Given several usernames, user_tweets resolves them in one /2/users/by lookup
+and fetches the timelines concurrently, returning per-user groups or, with
+--merge, one timeline ordered newest first (--ndjson applies to one user).
+
+search --since/--until (ISO dates) or --window=24h bound the search by
+time. With --parallel[=N], the window is cut into time slices sized from
+the query's hourly volumes (one /2/tweets/counts/recent request) and N
+workers page them concurrently; the tweets are merged newest first without
+duplicates, so large pulls are bound by the rate limit rather than by one
+round-trip per page (see twitter_slices.py).
+
+search --digest returns, instead of the tweets, near-duplicate clusters
+with their most engaging tweets plus top authors, link domains, hashtags
+and terms (see twitter_digest.py).
+
+monitor runs each named query (default: the ProbeLabs mention searches)
+concurrently and returns only tweets newer than the since_id watermark saved
+for that query by the previous run, then advances the watermark. With a
+watermark it pages until no newer tweets are left; when an explicit --limit
+stops it short, the watermark stays put and the query is marked truncated,
+since moving it would skip the tweets not fetched.
+
+counts reports how many tweets match each query (the same queries as
+monitor, fetched concurrently) per minute, hour or day from
+/2/tweets/counts/recent: total, peak bucket, newer-half vs older-half
+trend and, with --spikes, buckets far above their rolling median. Closed
+buckets are cached, so repeated calls only fetch the latest ones (see
+twitter_counts.py).
+
+stream takes the same queries as monitor, makes them the app's
+filtered-stream rules (tagged with their names) and holds the stream open,
+reconnecting with backoff, until --duration, --max_tweets or Ctrl-C. Each
+tweet, with its `matching_rules` tags, is appended to an NDJSON queue in the
+cache directory (or --out). stream_read returns what was queued since the
+consumer's previous read (see twitter_stream.py).
+
+read_tweet answers from an on-disk LRU cache (see twitter_cache.TweetCache)
+and only refreshes public_metrics once they are older than
+TWITTER_METRICS_CACHE_TTL; pass --fresh to always go to the API.
+
+bookmarks_sync mirrors the bookmarks locally: it pages newest first until
+it reaches a bookmark it already has (or through all of them with --full or
+on the first run) and reports what was added and removed. Once a mirror
+exists, bookmarks answers from it, with the filter and sort options above,
+after an incremental sync if the last one is older than
+TWITTER_BOOKMARK_SYNC_TTL; --remote reads the API directly instead.
+
+track snapshots public_metrics for the given tweets (or, with no IDs, for
+every tweet tracked so far) with 100-ID lookups and appends them to compact
+per-tweet histories (see twitter_metrics.py); track_report turns those into
+per-metric deltas, average and peak hourly rates, optionally over a window.
+
+With TWITTER_ARCHIVE=1, every tweet a command prints is also upserted into
+a local SQLite FTS5 archive (see twitter_archive.py); local_search queries
+it with no API calls, so it reaches back past recent search's 7 days.
+
+All requests share per-endpoint rate-limit buckets with other invocations
+(see twitter_ratelimit.py) and each result carries a `_rate_limit` block
+with the quota of the endpoints it used. With several bearer tokens
+configured, each request goes to the one with the most quota left, and
+cache_stats reports per-token usage and quarantines.
+
+Any command accepts --fields=id,text,... to request and print only those
+tweet fields (id, author, text, created_at, metrics, links,
+referenced_tweets; id is always kept) and --compact for single-line JSON.
+It also accepts --trace (attach a `_timing` block with per-phase and
+per-request timings), --trace=stderr (JSON lines on stderr instead) and
+--profile=PATH (write cProfile stats for the command to PATH).
+
+--deadline_ms=N gives the command a time budget, counted from when it
+starts. Each request's socket timeout is what is left of it, and retries,
+rate-limit waits and further pages stop when it runs out. The command then
+prints what it has with `"partial": true` instead of being killed mid-way.
+
+The `serve` mode keeps the process alive and answers commands over a Unix
+socket, so .env parsing, imports and open connections are paid once rather
+than per call. Use scripts/twitter-client.py to talk to it; the client falls
+back to running this script in-process when no daemon is listening.
 
 Environment variables:
   TWITTER_BEARER_TOKEN       - Required for read_tweet, search, user_tweets
+  TWITTER_BEARER_TOKENS      - More bearer tokens (comma-separated) to spread requests over; see twitter_pool.py
+  TWITTER_POOL_USER_TOKEN    - `1` to also spend the OAuth2 user token's quota on those reads
   TWITTER_CONSUMER_KEY       - Required for bookmarks (OAuth 1.0a)
   TWITTER_SECRET_KEY         - Required for bookmarks (OAuth 1.0a)
   TWITTER_ACCESS_TOKEN       - Required for bookmarks (OAuth 1.0a)
   TWITTER_ACCESS_TOKEN_SECRET - Required for bookmarks (OAuth 1.0a)
+  TWITTER_OAUTH2_USER_TOKEN  - Required for bookmarks (OAuth 2.0 user context)
+  TWITTER_OAUTH2_REFRESH_TOKEN - Refreshes the user token before it expires and after a 401
+  TWITTER_OAUTH2_EXPIRES_AT  - User token expiry (epoch seconds), saved by twitter-oauth2.py
+  TWITTER_CLIENT_ID/SECRET   - OAuth 2.0 client for refreshes (default: consumer key/secret)
+  TWITTER_API_SOCKET         - Socket path for serve/client (default: $TMPDIR/twitter-api-<uid>.sock)
+  TWITTER_CACHE_DIR          - Cache directory (default: ~/.cache/probelabs-assistant/twitter)
+  TWITTER_USER_CACHE_TTL     - Seconds to cache username/`me` lookups (default: 604800)
+  TWITTER_USER_NEGATIVE_TTL  - Seconds to remember unknown usernames (default: 3600)
+  TWITTER_TWEET_CACHE_TTL    - Seconds to keep cached tweet content (default: 2592000)
+  TWITTER_METRICS_CACHE_TTL  - Seconds before cached public_metrics are refreshed (default: 300)
+  TWITTER_TWEET_CACHE_MAX    - Maximum cached tweets before LRU eviction (default: 5000)
+  TWITTER_BOOKMARK_SYNC_TTL  - Seconds before `bookmarks` re-syncs the local mirror (default: 900)
+  TWITTER_RATELIMIT_MAX_WAIT - Longest wait in seconds for an exhausted rate limit (default: 20)
+  TWITTER_API_BASE_URL       - API origin (default: https://api.twitter.com); see twitter-fake-server.py
+  TWITTER_ARCHIVE            - `1` to archive printed tweets for local_search (default: off)
+  TWITTER_SINGLEFLIGHT       - `0` to stop sharing identical in-flight requests (default: on)
+  TWITTER_TRACE              - `1` to attach `_timing` to results, `stderr` for JSON lines on stderr
 """
 
+import time
+
+_MODULE_START = time.perf_counter()  # Start of the `imports` trace phase
+
 import sys
 import os
 import json
+import contextvars
 import re
-import time
-import hmac
 import hashlib
-import base64
-import uuid
 import urllib.parse
-import urllib.request
-import urllib.error
+
+import twitter_cache
+import twitter_http
+import twitter_ratelimit
+
+# Startup phases of a direct run, reported by --trace (cleared by `serve`).
+_STARTUP = {'imports_ms': round((time.perf_counter() - _MODULE_START) * 1000, 2)}
 
 
 def oauth1_header(method, url, query_params, consumer_key, consumer_secret, access_token, access_token_secret):
     """Generate OAuth 1.0a Authorization header."""
+    import base64
+    import hmac
+    import uuid
+
     oauth_params = {
         'oauth_consumer_key': consumer_key,
         'oauth_nonce': uuid.uuid4().hex,
@@ -71,18 +210,406 @@ def oauth1_header(method, url, query_params, consumer_key, consumer_secret, acce
     return auth_header
 
 
+DEFAULT_API_BASE = 'https://api.twitter.com'
+MAX_RETRIES = 3
+DEADLINE_MIN_REQUEST = 0.05  # Seconds; with less of the budget left, skip the request
+
+
+def api_base():
+    """API origin; TWITTER_API_BASE_URL points the script at a stand-in server."""
+    return os.environ.get('TWITTER_API_BASE_URL', DEFAULT_API_BASE).rstrip('/')
+
+
+_command_state = contextvars.ContextVar('command_state', default=None)
+
+
+def command_state():
+    """Per-invocation state, shared with worker threads via run_concurrently()."""
+    state = _command_state.get()
+    if state is None:
+        state = {'quota': {}, 'trace': None, 'fields': None, 'compact': False, 'archive': None,
+                 'deadline': None, 'partial': False}
+        _command_state.set(state)
+    return state
+
+
+def current_trace():
+    return command_state()['trace']
+
+
+def deadline_remaining():
+    """Seconds left of the --deadline_ms budget, or None without one."""
+    deadline = command_state()['deadline']
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_error(label):
+    """Error data for a request skipped or cut off by the deadline; marks the result partial.
+
+    Like the synthesized 429 for an exhausted bucket, it carries a status
+    (504) so callers treat it as a failed request, not a negative answer.
+    """
+    command_state()['partial'] = True
+    return {"error": f"Deadline reached before {label} completed", "status": 504,
+            "deadline_exceeded": True}
+
+
+def start_trace(mode):
+    """Begin timing this invocation, seeded with the process startup phases."""
+    import twitter_trace
+    startup = {}
+    if _STARTUP:
+        age = twitter_trace.process_age_ms()
+        if age is not None:
+            since_module = (time.perf_counter() - _MODULE_START) * 1000
+            startup['interpreter_startup_ms'] = round(age - since_module, 2)
+        startup.update(_STARTUP)
+    trace = twitter_trace.Trace(mode, startup)
+    command_state()['trace'] = trace
+    return trace
+
+
+def run_concurrently(fn, items, max_workers=None):
+    """Map fn over items on a bounded thread pool, preserving order.
+
+    Workers run in copies of the caller's context so they record into the
+    same command_state().
+    """
+    items = list(items)
+    if not items:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+    ctx = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=min(max_workers or MAX_WORKERS, len(items))) as pool:
+        return list(pool.map(lambda item: ctx.copy().run(fn, item), items))
+
+
+def print_result(result, indent=2):
+    """Print a command result with the quota of every endpoint it touched.
+
+    Results cut short by --deadline_ms are marked `"partial": true`.
+    """
+    if command_state()['partial']:
+        result['partial'] = True
+    quota = command_state()['quota']
+    if quota:
+        result['_rate_limit'] = {
+            label: twitter_ratelimit.describe(bucket) for label, bucket in sorted(quota.items())
+        }
+    if command_state()['compact']:
+        indent = None
+    separators = (',', ':') if indent is None else None
+    trace = current_trace()
+    started = time.perf_counter()
+    text = json.dumps(result, indent=indent, separators=separators, ensure_ascii=False)
+    if trace:
+        trace.add('output_ms', (time.perf_counter() - started) * 1000)
+        if trace.mode == 'block':
+            result['_timing'] = trace.summary()
+            text = json.dumps(result, indent=indent, separators=separators, ensure_ascii=False)
+    print(text)
+
+
 def api_get(url, headers):
-    """Make a GET request and return parsed JSON."""
-    req = urllib.request.Request(url, headers=headers)
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
+    """Make a GET request and return parsed JSON.
+
+    Requests go over the shared keep-alive pool and through the cross-process
+    rate-limit scheduler: an exhausted endpoint is waited out (up to
+    TWITTER_RATELIMIT_MAX_WAIT) rather than hit, and 429/503 responses are
+    retried with jittered backoff. Identical requests in flight at the same
+    time, in this process or another, share one upstream call (see
+    twitter_singleflight.py). A 401 for the OAuth2 user token is retried once
+    with a refreshed token.
+    """
+    data = coalesced_get(url, headers)
+    if data.get('status') == 401 and refresh_user_auth(headers):
+        data = coalesced_get(url, headers)
+    return data
+
+
+def coalesced_get(url, headers):
+    """fetch_json() through the single-flight group; returns the data."""
+    import twitter_singleflight
+    flight = twitter_singleflight.get_flight()
+    if flight is None:
+        return fetch_json(url, headers)['data']
+
+    auth = (headers or {}).get('Authorization', '')
+    key = hashlib.sha256(f"GET {url} {auth}".encode()).hexdigest()[:32]
+    started = time.perf_counter()
+    # Local errors reflect the leader's own deadline and wait: followers fetch under theirs
+    result, shared = flight.do(key, lambda: fetch_json(url, headers), wait=deadline_remaining(),
+                               share=lambda result: not result.get('local'))
+    if shared:
+        if result['bucket']:
+            command_state()['quota'][result['label']] = result['bucket']
+        trace = current_trace()
+        if trace:
+            trace.request({
+                'endpoint': result['label'],
+                'coalesced': True,
+                'wait_ms': round((time.perf_counter() - started) * 1000, 2),
+            })
+    return result['data']
+
+
+_REPLACED_USER_TOKENS = {}  # Refreshed-away OAuth2 user token -> its replacement
+
+
+def refresh_user_auth(headers):
+    """Swap a refreshed OAuth2 user token into headers, in place; True on success.
+
+    Only applies when headers carry the current TWITTER_OAUTH2_USER_TOKEN, or
+    one this process already replaced (callers may still hold the old one).
+    Updating the dict in place lets a Pager's later pages use the new token.
+    """
+    auth = (headers or {}).get('Authorization', '')
+    token = auth[len('Bearer '):] if auth.startswith('Bearer ') else ''
+    if token in _REPLACED_USER_TOKENS:
+        fresh = _REPLACED_USER_TOKENS[token]
+    elif token and token == os.environ.get('TWITTER_OAUTH2_USER_TOKEN'):
+        import twitter_credentials
+        fresh, error = twitter_credentials.refresh(token)
+        if error:
+            print(json.dumps({"warning": f"OAuth2 token refresh failed: {error}"}), file=sys.stderr)
+            return False
+        _REPLACED_USER_TOKENS[token] = fresh
+    else:
+        return False
+    headers['Authorization'] = f"Bearer {fresh}"
+    return True
+
+
+def fetch_json(url, headers):
+    """Do the upstream part of api_get().
+
+    Returns {"data", "label", "bucket"}: the parsed body (or error dict), the
+    rate-limit endpoint label and its last known bucket. Errors made up here
+    rather than received (deadline reached, bucket exhausted past this
+    caller's wait) also have "local": True. App-auth requests
+    made with a pooled bearer token go out on whichever pooled token has the
+    most quota left (see twitter_pool.py), and a 401 is retried on another
+    one. User-context requests are never pooled, so their 401 reaches the
+    token refresh in api_get().
+    """
+    limiter = twitter_ratelimit.get_limiter()
+    key = twitter_ratelimit.endpoint_key('GET', url, headers)
+    label = twitter_ratelimit.endpoint_label(key)
+    trace = current_trace()
+    bucket = None
+    pool = None
+    if os.environ.get('TWITTER_BEARER_TOKENS') or os.environ.get('TWITTER_POOL_USER_TOKEN'):
+        import twitter_pool
+        pool = twitter_pool.get_pool()
+        if not pool.covers(url, headers):
+            pool = None
+    retry_statuses = (401, 429, 503) if pool else (429, 503)
+    request_headers = headers
+    unauthorized = set()
+    for attempt in range(MAX_RETRIES + 1):
+        if pool:
+            token = pool.pick('GET', url, exclude=unauthorized)
+            request_headers = {**headers, 'Authorization': f"Bearer {token}"}
+            key = twitter_ratelimit.endpoint_key('GET', url, request_headers)
+        remaining = deadline_remaining()
+        if remaining is not None and remaining < DEADLINE_MIN_REQUEST:
+            return {"data": deadline_error(label), "label": label, "bucket": bucket, "local": True}
+        started = time.perf_counter()
+        max_wait = None if remaining is None else min(remaining, limiter.max_wait)
+        wait = limiter.acquire(key, max_wait=max_wait)
+        waited = time.perf_counter()
+        if wait:
+            if remaining is not None and wait <= limiter.max_wait:
+                return {"data": deadline_error(label), "label": label, "bucket": bucket, "local": True}
+            return {"data": {"error": f"Rate limit exhausted for {label}; resets in {int(wait)}s",
+                             "status": 429, "retry_after": int(wait)},
+                    "label": label, "bucket": bucket, "local": True}
+
+        timeout = None
+        if remaining is not None:
+            timeout = remaining - (waited - started)
+            if timeout < DEADLINE_MIN_REQUEST:
+                return {"data": deadline_error(label), "label": label, "bucket": bucket, "local": True}
+        try:
+            resp = twitter_http.request('GET', url, request_headers, timeout=timeout)
+        except TimeoutError:
+            if timeout is None:
+                raise
+            if trace:
+                trace.request({'endpoint': label, 'attempt': attempt, 'status': None,
+                               'deadline_exceeded': True})
+            return {"data": deadline_error(label), "label": label, "bucket": bucket, "local": True}
+        bucket = limiter.update(key, resp.headers)
+        if bucket:
+            command_state()['quota'][label] = bucket
+        if pool:
+            pool.record(token, resp.status)
+            if resp.status == 401:
+                unauthorized.add(token)
+        if trace:
+            trace.request({
+                'endpoint': label,
+                **({'credential': key.split(' ', 1)[0]} if pool else {}),
+                'attempt': attempt,
+                'status': resp.status,
+                'ratelimit_wait_ms': round((waited - started) * 1000, 2),
+                **resp.timings,
+                'bytes': resp.wire_bytes,
+            })
+
+        if resp.status not in retry_statuses or attempt == MAX_RETRIES:
+            break
+        if resp.status == 401 and len(unauthorized) >= len(twitter_pool.pool_tokens()):
+            break  # Every pooled token was rejected
+        if resp.status == 503:
+            delay = twitter_ratelimit.backoff_delay(attempt)
+            remaining = deadline_remaining()
+            if remaining is not None and delay + DEADLINE_MIN_REQUEST > remaining:
+                command_state()['partial'] = True
+                break  # No time left to retry: report the 503
+            time.sleep(delay)
+        elif resp.status == 429 and (not bucket or bucket['remaining'] > 0):
+            # 429 the quota headers do not explain: hold the bucket for a backoff period
+            limiter.exhaust(key, time.time() + twitter_ratelimit.backoff_delay(attempt))
+
+    body = resp.body.decode()
+    if resp.status >= 400:
         try:
-            return {"error": json.loads(body), "status": e.code}
+            data = {"error": json.loads(body), "status": resp.status}
         except json.JSONDecodeError:
-            return {"error": body, "status": e.code}
+            data = {"error": body, "status": resp.status}
+        return {"data": data, "label": label, "bucket": bucket}
+    started = time.perf_counter()
+    data = json.loads(body)
+    if trace:
+        trace.add('json_decode_ms', (time.perf_counter() - started) * 1000)
+    return {"data": data, "label": label, "bucket": bucket}
+
+
+def api_post(url, headers, payload):
+    """POST a JSON body and return the parsed JSON ({"error", "status"} on failure).
+
+    Goes through the rate-limit scheduler like api_get() but is not retried
+    or coalesced: the only writes are stream rule changes, which callers
+    re-derive from the current rules anyway.
+    """
+    limiter = twitter_ratelimit.get_limiter()
+    key = twitter_ratelimit.endpoint_key('POST', url, headers)
+    label = twitter_ratelimit.endpoint_label(key)
+    wait = limiter.acquire(key)
+    if wait:
+        return {"error": f"Rate limit exhausted for {label}; resets in {int(wait)}s",
+                "status": 429, "retry_after": int(wait)}
+    resp = twitter_http.request('POST', url, {**headers, 'Content-Type': 'application/json'},
+                                body=json.dumps(payload).encode(), timeout=deadline_remaining())
+    bucket = limiter.update(key, resp.headers)
+    if bucket:
+        command_state()['quota'][label] = bucket
+    trace = current_trace()
+    if trace:
+        trace.request({'endpoint': label, 'status': resp.status, **resp.timings, 'bytes': resp.wire_bytes})
+    body = resp.body.decode()
+    try:
+        data = json.loads(body)
+    except json.JSONDecodeError:
+        data = body
+    if resp.status >= 400:
+        return {"error": data, "status": resp.status}
+    return data
+
+
+def lookup_user(username, bearer):
+    """Resolve a username to its user object through the persistent cache.
+
+    Returns (user, details). user is None when the account does not exist or
+    the lookup failed, with details holding the API response to report.
+    """
+    cache = twitter_cache.get_user_cache()
+    key = username.lower()
+    hit, user = cache.get('username', key)
+    if hit:
+        return user, (None if user else {"cached": "user not found"})
+
+    user_url = f"{api_base()}/2/users/by/username/{username}?user.fields=name,description,public_metrics"
+    user_data = api_get(user_url, {"Authorization": f"Bearer {bearer}"})
+
+    if 'data' in user_data:
+        ttl = twitter_cache.env_seconds('TWITTER_USER_CACHE_TTL', twitter_cache.DEFAULT_USER_TTL)
+        cache.set('username', key, user_data['data'], ttl)
+        return user_data['data'], None
+    # A 200 with only `errors` means the account does not exist; HTTP errors
+    # (rate limits, auth) carry a status and must not be cached.
+    if 'status' not in user_data:
+        ttl = twitter_cache.env_seconds('TWITTER_USER_NEGATIVE_TTL', twitter_cache.DEFAULT_NEGATIVE_TTL)
+        cache.set('username', key, None, ttl)
+    return None, user_data
+
+
+def lookup_users(usernames, bearer):
+    """Resolve many usernames at once through the cache and /2/users/by.
+
+    Returns {username_lower: (user, details)} with the same meaning as
+    lookup_user(). Uncached names are resolved LOOKUP_CHUNK per request.
+    """
+    cache = twitter_cache.get_user_cache()
+    found = {}
+    missing = []
+    for username in usernames:
+        key = username.lower()
+        hit, user = cache.get('username', key)
+        if hit:
+            found[key] = (user, None if user else {"cached": "user not found"})
+        elif key not in missing:
+            missing.append(key)
+
+    ttl = twitter_cache.env_seconds('TWITTER_USER_CACHE_TTL', twitter_cache.DEFAULT_USER_TTL)
+    negative_ttl = twitter_cache.env_seconds('TWITTER_USER_NEGATIVE_TTL', twitter_cache.DEFAULT_NEGATIVE_TTL)
+    for i in range(0, len(missing), LOOKUP_CHUNK):
+        chunk = missing[i:i + LOOKUP_CHUNK]
+        url = (
+            f"{api_base()}/2/users/by?usernames={','.join(chunk)}"
+            f"&user.fields=name,description,public_metrics"
+        )
+        data = api_get(url, {"Authorization": f"Bearer {bearer}"})
+        if 'error' in data:
+            for key in chunk:
+                found[key] = (None, data)
+            continue
+        for user in data.get('data', []):
+            key = user['username'].lower()
+            cache.set('username', key, user, ttl)
+            found[key] = (user, None)
+        for e in data.get('errors', []):
+            key = str(e.get('value', '')).lower()
+            if key in chunk and key not in found:
+                cache.set('username', key, None, negative_ttl)
+                found[key] = (None, e)
+    return found
+
+
+def lookup_me(oauth2_token):
+    """Return (user, details) for the OAuth2 token's owner, cached per token.
+
+    Entries are keyed by a hash of the token, and caching a new token drops
+    the entries of the previous ones.
+    """
+    cache = twitter_cache.get_user_cache()
+    key = hashlib.sha256(oauth2_token.encode()).hexdigest()[:32]
+    hit, user = cache.get('me', key)
+    if hit and user:
+        return user, None
+
+    headers = {"Authorization": f"Bearer {oauth2_token}"}
+    me_data = api_get(f"{api_base()}/2/users/me", headers)
+    if 'data' not in me_data:
+        return None, me_data
+    if headers['Authorization'] != f"Bearer {oauth2_token}":  # Refreshed after a 401
+        key = hashlib.sha256(headers['Authorization'][len('Bearer '):].encode()).hexdigest()[:32]
+
+    ttl = twitter_cache.env_seconds('TWITTER_USER_CACHE_TTL', twitter_cache.DEFAULT_USER_TTL)
+    cache.set('me', key, me_data['data'], ttl)
+    cache.clear('me', keep_key=key)
+    return me_data['data'], None
 
 
 def get_bearer():
@@ -118,6 +645,8 @@ def extract_tweet_id(input_str):
 
 def format_tweet(tweet, users_map):
     """Format a tweet for readable output."""
+    trace = current_trace()
+    started = time.perf_counter() if trace else None
     author = users_map.get(tweet.get('author_id', ''), {})
     metrics = tweet.get('public_metrics', {})
     result = {
@@ -141,6 +670,13 @@ def format_tweet(tweet, users_map):
             {'url': u.get('expanded_url', u.get('url', '')), 'display': u.get('display_url', '')}
             for u in entities['urls']
         ]
+    archive = command_state()['archive']
+    if archive is not None:
+        archive.append((result, author or None))  # Written once the command finishes
+    if command_state()['fields'] is not None:
+        result = {k: v for k, v in result.items() if k == 'id' or projected(k)}
+    if trace:
+        trace.add('format_ms', (time.perf_counter() - started) * 1000)
     return result
 
 
@@ -152,89 +688,1208 @@ def build_users_map(includes):
     return users
 
 
-def cmd_read_tweet(args):
-    if not args:
-        print(json.dumps({"error": "Usage: read_tweet <tweet_url_or_id>"}))
-        sys.exit(1)
+READ_TWEET_FIELDS = (
+    "text,author_id,created_at,public_metrics,entities,conversation_id,"
+    "in_reply_to_user_id,referenced_tweets"
+)
+READ_USER_FIELDS = "name,username,description"
+READ_EXPANSIONS = "author_id,referenced_tweets.id,referenced_tweets.id.author_id"
+SEARCH_TWEET_FIELDS = "text,author_id,created_at,public_metrics,entities"
+SEARCH_USER_FIELDS = "name,username"
+
+# format_tweet output fields, and the API tweet.fields each one needs.
+OUTPUT_FIELDS = ('id', 'author', 'text', 'created_at', 'metrics', 'links', 'referenced_tweets')
+API_FIELD_OUTPUT = {
+    'author_id': 'author',
+    'created_at': 'created_at',
+    'public_metrics': 'metrics',
+    'entities': 'links',
+    'referenced_tweets': 'referenced_tweets',
+}
 
-    tweet_id = extract_tweet_id(args[0])
-    bearer = get_bearer()
 
+def projected(field):
+    """True when an output field is requested (always, without --fields)."""
+    fields = command_state()['fields']
+    return fields is None or field in fields
+
+
+def tweet_query(tweet_fields, expansions='', user_fields=''):
+    """Build the tweet.fields/expansions/user.fields query string.
+
+    Under a --fields projection only the parameters the requested output
+    fields need are kept, so the API sends less and format_tweet emits less.
+    """
+    fields = command_state()['fields']
+    if fields is not None:
+        tweet_fields = ','.join(f for f in tweet_fields.split(',') if API_FIELD_OUTPUT.get(f) in fields)
+        expansions = ','.join(
+            e for e in expansions.split(',')
+            if (e.endswith('author_id') and 'author' in fields
+                and (e == 'author_id' or 'referenced_tweets' in fields))
+            or (e == 'referenced_tweets.id' and 'referenced_tweets' in fields)
+        )
+        user_fields = SEARCH_USER_FIELDS if user_fields and 'author' in fields else ''
+    params = []
+    if tweet_fields:
+        params.append(f"tweet.fields={tweet_fields}")
+    if expansions:
+        params.append(f"expansions={expansions}")
+    if user_fields:
+        params.append(f"user.fields={user_fields}")
+    return '&'.join(params)
+
+
+LOOKUP_CHUNK = 100
+MAX_WORKERS = 4
+
+
+def cached_tweet_entries(tweet_id, fields_key, cache):
+    """Return cache entries for a tweet and the tweets it references, or None."""
+    entry = cache.get(tweet_id, fields_key)
+    if entry is None:
+        return None
+    entries = [entry]
+    for ref in entry['tweet'].get('referenced_tweets', []):
+        ref_entry = cache.get(ref['id'], fields_key)
+        if ref_entry is None:
+            return None
+        entries.append(ref_entry)
+    return entries
+
+
+def read_tweet_from_cache(tweet_id, fields_key, cache, bearer):
+    """Serve a tweet and the tweets it references from the tweet cache.
+
+    Stale public_metrics are refreshed with one small multi-ID lookup. Returns
+    (tweet, referenced, users_map), or None when anything is missing and the
+    caller should fetch the full tweet.
+    """
+    entries = cached_tweet_entries(tweet_id, fields_key, cache)
+    if entries is None:
+        return None
+
+    # Metrics that will not be printed are not worth a refresh request
+    stale = [e['tweet']['id'] for e in entries if not e['metrics_fresh'] and projected('metrics')]
+    if stale:
+        url = (
+            f"{api_base()}/2/tweets?ids={','.join(stale)}"
+            f"&tweet.fields=public_metrics"
+        )
+        data = api_get(url, {"Authorization": f"Bearer {bearer}"})
+        fresh = {t['id']: t.get('public_metrics') for t in data.get('data', [])}
+        if set(stale) - set(fresh):
+            return None
+        for e in entries:
+            if e['tweet']['id'] in fresh:
+                e['tweet']['public_metrics'] = fresh[e['tweet']['id']]
+                cache.update_metrics(e['tweet']['id'], fields_key, fresh[e['tweet']['id']])
+        cache.count('stale')
+    else:
+        cache.count('hits')
+
+    users_map = {e['author']['id']: e['author'] for e in entries if e['author']}
+    return entries[0]['tweet'], [e['tweet'] for e in entries[1:]], users_map
+
+
+def read_tweet_inputs(positional, opts):
+    """Collect tweet URLs/IDs from args, stdin (`-`) and --file=PATH."""
+    texts = [a for a in positional if a != '-']
+    if '-' in positional:
+        texts.append(sys.stdin.read())
+    if opts.get('file'):
+        with open(opts['file']) as f:
+            texts.append(f.read())
+    return [item for text in texts for item in re.split(r'[\s,]+', text) if item]
+
+
+def fetch_tweet_chunk(ids, bearer):
+    """Look up up to LOOKUP_CHUNK tweets in one /2/tweets?ids= request."""
     url = (
-        f"https://api.twitter.com/2/tweets/{tweet_id}"
-        f"?tweet.fields=text,author_id,created_at,public_metrics,entities,conversation_id,in_reply_to_user_id"
-        f"&expansions=author_id,referenced_tweets.id,referenced_tweets.id.author_id"
-        f"&user.fields=name,username,description"
+        f"{api_base()}/2/tweets?ids={','.join(ids)}"
+        f"&{tweet_query(READ_TWEET_FIELDS, READ_EXPANSIONS, READ_USER_FIELDS)}"
     )
+    return ids, api_get(url, {"Authorization": f"Bearer {bearer}"})
 
-    data = api_get(url, {"Authorization": f"Bearer {bearer}"})
 
-    if 'errors' in data and 'data' not in data:
-        print(json.dumps({"error": data['errors']}, indent=2))
-        sys.exit(1)
+def read_tweet_batch(inputs, opts):
+    """Read many tweets with multi-ID lookups, keeping input order.
+
+    IDs are deduplicated, served from the tweet cache when fully fresh, and
+    the rest fetched in concurrent chunks of LOOKUP_CHUNK. Tweets that cannot
+    be read get an inline error entry instead of failing the batch.
+    """
+    bearer = get_bearer()
+    cache = twitter_cache.get_tweet_cache()
+    fields_key = tweet_query(READ_TWEET_FIELDS, READ_EXPANSIONS, READ_USER_FIELDS)
+
+    ids = []
+    for raw in inputs:
+        tweet_id = extract_tweet_id(raw)
+        if tweet_id not in ids:
+            ids.append(tweet_id)
+
+    results = {}
+    to_fetch = []
+    for tweet_id in ids:
+        if not tweet_id.isdigit():
+            results[tweet_id] = {"id": tweet_id, "error": "Not a tweet URL or ID"}
+            continue
+        entries = None
+        if opts.get('fresh'):
+            cache.count('bypassed')
+        else:
+            entries = cached_tweet_entries(tweet_id, fields_key, cache)
+        if entries and (not projected('metrics') or all(e['metrics_fresh'] for e in entries)):
+            cache.count('hits')
+            users_map = {e['author']['id']: e['author'] for e in entries if e['author']}
+            results[tweet_id] = format_tweet(entries[0]['tweet'], users_map)
+            if len(entries) > 1:
+                results[tweet_id]['referenced_tweets'] = [
+                    format_tweet(e['tweet'], users_map) for e in entries[1:]
+                ]
+        else:
+            if not opts.get('fresh'):
+                cache.count('misses')
+            to_fetch.append(tweet_id)
+
+    chunks = [to_fetch[i:i + LOOKUP_CHUNK] for i in range(0, len(to_fetch), LOOKUP_CHUNK)]
+    pages = run_concurrently(lambda chunk: fetch_tweet_chunk(chunk, bearer), chunks)
+
+    includes = {'users': [], 'tweets': []}
+    fetched = {}
+    errors = {}
+    for chunk, data in pages:
+        if 'error' in data:
+            for tweet_id in chunk:
+                errors[tweet_id] = {"error": data['error'], "status": data.get('status')}
+            continue
+        for t in data.get('data', []):
+            fetched[t['id']] = t
+        for key in includes:
+            includes[key].extend(data.get('includes', {}).get(key, []))
+        for e in data.get('errors', []):
+            tweet_id = e.get('resource_id') or e.get('value')
+            errors[tweet_id] = {"error": e.get('detail') or e.get('title')}
+
+    users_map = build_users_map(includes)
+    included = {t['id']: t for t in includes['tweets']}
+    for tweet_id in to_fetch:
+        tweet = fetched.get(tweet_id)
+        if tweet is None:
+            results[tweet_id] = {"id": tweet_id, **errors.get(tweet_id, {"error": "Tweet not returned"})}
+            continue
+        referenced = [included[r['id']] for r in tweet.get('referenced_tweets', []) if r['id'] in included]
+        for t in [tweet] + referenced:
+            cache.put(t, users_map.get(t.get('author_id')), fields_key)
+        results[tweet_id] = format_tweet(tweet, users_map)
+        if referenced:
+            results[tweet_id]['referenced_tweets'] = [format_tweet(t, users_map) for t in referenced]
+
+    tweets = [results[tweet_id] for tweet_id in ids]
+    print_result({
+        "count": len(tweets),
+        "failed": sum(1 for t in tweets if 'error' in t),
+        "tweets": tweets,
+    })
+
 
-    if 'data' not in data:
-        print(json.dumps(data, indent=2))
+def cmd_read_tweet(args):
+    positional, opts = parse_args(args)
+    inputs = read_tweet_inputs(positional, opts)
+    if not inputs:
+        print(json.dumps({"error": "Usage: read_tweet <tweet_url_or_id>... [--file=PATH|-] [--fresh]"}))
         sys.exit(1)
 
-    users_map = build_users_map(data.get('includes'))
-    result = format_tweet(data['data'], users_map)
+    if len(inputs) > 1 or '-' in positional or opts.get('file'):
+        read_tweet_batch(inputs, opts)
+        return
+
+    tweet_id = extract_tweet_id(inputs[0])
+    bearer = get_bearer()
+    cache = twitter_cache.get_tweet_cache()
+    fields_key = tweet_query(READ_TWEET_FIELDS, READ_EXPANSIONS, READ_USER_FIELDS)
+
+    cached = None
+    if opts.get('fresh'):
+        cache.count('bypassed')
+    else:
+        cached = read_tweet_from_cache(tweet_id, fields_key, cache, bearer)
+
+    if cached:
+        tweet, referenced, users_map = cached
+    else:
+        url = (
+            f"{api_base()}/2/tweets/{tweet_id}"
+            f"?{fields_key}"
+        )
+
+        data = api_get(url, {"Authorization": f"Bearer {bearer}"})
+
+        if 'errors' in data and 'data' not in data:
+            print(json.dumps({"error": data['errors']}, indent=2))
+            sys.exit(1)
+
+        if 'data' not in data:
+            print(json.dumps(data, indent=2))
+            sys.exit(1)
+
+        users_map = build_users_map(data.get('includes'))
+        tweet = data['data']
+        referenced = data.get('includes', {}).get('tweets', [])
+
+        # Referenced tweets are cached too, so reading a quoted tweet later hits
+        if not opts.get('fresh'):
+            cache.count('misses')
+        for t in [tweet] + referenced:
+            cache.put(t, users_map.get(t.get('author_id')), fields_key)
+
+    result = format_tweet(tweet, users_map)
 
     # Include referenced tweets (quoted, replied to)
-    if data.get('includes', {}).get('tweets'):
+    if referenced:
         result['referenced_tweets'] = [
-            format_tweet(t, users_map) for t in data['includes']['tweets']
+            format_tweet(t, users_map) for t in referenced
         ]
 
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print_result(result)
+
+
+def cmd_cache_stats(args):
+    """Report tweet cache size and hit/miss counters (and credential pool usage)."""
+    stats = {"tweet_cache": twitter_cache.get_tweet_cache().stats()}
+    if os.path.exists(os.path.join(twitter_cache.cache_dir(), 'archive.sqlite3')):
+        import twitter_archive
+        stats["archive"] = twitter_archive.get_archive().stats()
+    if os.environ.get('TWITTER_BEARER_TOKENS') or os.environ.get('TWITTER_POOL_USER_TOKEN'):
+        import twitter_pool
+        stats["credentials"] = twitter_pool.get_pool().stats()
+    print(json.dumps(stats, indent=2))
+
+
+def parse_args(args):
+    """Split command args into positionals and a dict of --key[=value] options."""
+    positional, opts = [], {}
+    for a in args:
+        if a.startswith('--'):
+            key, sep, value = a[2:].partition('=')
+            opts[key] = value if sep else True
+        else:
+            positional.append(a)
+    return positional, opts
+
+
+def page_options(opts):
+    """Translate --max_results / --limit=N / --all into (limit, page_size)."""
+    if opts.get('all'):
+        return None, 100
+    if 'limit' in opts:
+        limit = max(1, int(opts['limit']))
+        return limit, max(10, min(100, limit))
+    max_results = max(10, min(100, int(opts.get('max_results', 10))))
+    return max_results, max_results
+
+
+class Pager:
+    """Iterate formatted tweets from a paginated list endpoint.
+
+    Pages are fetched one at a time, following meta.next_token (sent back as
+    `token_param`), until `limit` tweets have been yielded or the results run
+    out, so callers can stream tweets as their page arrives. Afterwards
+    `next_token` is the cursor for the following page and `error` holds the
+    API error that stopped iteration, if any. With raw=True it yields the
+    API (tweet, author) pairs instead of formatted tweets.
+
+    Pages are sized so that the last one is not cut short where that can be
+    avoided; when the limit does end mid-page (the API returns at least 10
+    per page), `trimmed` counts the tweets left in it and next_token is None,
+    since resuming after that page would skip them.
+    """
+
+    def __init__(self, url, headers, token_param, limit=None, page_size=100,
+                 next_token=None, users_map=None, raw=False):
+        self.url = url
+        self.headers = headers
+        self.token_param = token_param
+        self.limit = limit
+        self.page_size = page_size
+        self.next_token = next_token
+        self.users_map = users_map or {}
+        self.raw = raw
+        self.pages = 0
+        self.error = None
+        self.trimmed = 0
+
+    def __iter__(self):
+        seen = 0
+        token = self.next_token
+        while True:
+            size = self.page_size
+            if self.limit is not None:
+                left = self.limit - seen
+                size = min(size, left)
+                if 0 < left - size < 10:
+                    size = left - 10  # Leave a full last page: 105 is 95 + 10, not 100 + 10 cut to 5
+                size = max(10, size)
+            url = f"{self.url}&max_results={size}"
+            if token:
+                url += f"&{self.token_param}={urllib.parse.quote(token, safe='')}"
+
+            data = api_get(url, self.headers)
+            self.pages += 1
+            if 'data' not in data and ('error' in data or 'errors' in data):
+                self.error = data
+                return
+
+            users_map = {**self.users_map, **build_users_map(data.get('includes'))}
+            token = data.get('meta', {}).get('next_token')
+            self.next_token = token
+            page = data.get('data', [])
+            for i, t in enumerate(page):
+                yield (t, users_map.get(t.get('author_id'))) if self.raw else format_tweet(t, users_map)
+                seen += 1
+                if self.limit is not None and seen >= self.limit:
+                    self.trimmed = len(page) - i - 1
+                    if self.trimmed:
+                        self.next_token = None
+                    return
+            if not token:
+                return
+
+
+def listing_fields(result, count_key, list_key, tweets, count, pager):
+    """Add the count, tweets and pagination/error state of a listing to result."""
+    result[count_key] = count
+    if tweets is not None:
+        result[list_key] = tweets
+    if pager.next_token or pager.trimmed:
+        result['has_more'] = True
+    if pager.next_token:
+        result['next_token'] = pager.next_token
+    if pager.error:
+        result['error'] = pager.error.get('error') or pager.error.get('errors')
+    return result
+
+
+def emit_listing(result, count_key, list_key, pager, ndjson=False):
+    """Print result with the tweets from pager under list_key.
+
+    With ndjson each tweet is printed on its own line as soon as its page
+    arrives and the summary (result without the list) comes last, so memory
+    stays flat and the first tweet is out after the first round-trip.
+    """
+    if ndjson:
+        count = 0
+        for tweet in pager:
+            print(json.dumps(tweet, ensure_ascii=False), flush=True)
+            count += 1
+        tweets = None
+    else:
+        tweets = list(pager)
+        count = len(tweets)
+
+    if pager.error and not count:
+        error = {"error": pager.error.get('error') or pager.error.get('errors')}
+        if pager.error.get('status'):
+            error['status'] = pager.error['status']
+        if command_state()['partial']:
+            error['partial'] = True
+        print(json.dumps(error, indent=2))
+        sys.exit(1)
+
+    listing_fields(result, count_key, list_key, tweets, count, pager)
+
+    print_result(result, indent=None if ndjson else 2)
+
+
+MAX_PARALLEL = 16
+
+
+def query_counts(query, granularity, start, end, headers):
+    """Tweet counts of query over [start, end); returns (buckets, cached, error).
+
+    granularity is 'minute' or 'hour', and start is moved onto a bucket
+    boundary (see twitter_counts.aligned_start). buckets are (start, end,
+    count) tuples, oldest first, and `cached` is how many of them came from
+    the closed-bucket cache; only the rest is fetched, following
+    next_token. error is the API error that cut the fetch short, if any.
+    """
+    import twitter_counts
+    import twitter_slices
+    step = twitter_counts.GRANULARITY[granularity]
+    start = twitter_counts.aligned_start(start, step, twitter_slices.window()[0])
+    cache = twitter_cache.get_counts_cache()
+    key = f"{granularity}:{hashlib.sha256(query.encode()).hexdigest()[:16]}"
+    _, cached = cache.get('counts', key)
+    cached = cached or {}
+    now = time.time()
+    fetch_from = twitter_counts.cached_until(cached, start, end, step, now)
+    buckets = [(t, t + step, cached[str(t)]) for t in range(start, fetch_from, step)]
+    if fetch_from >= end:
+        return buckets, len(buckets), None
+
+    url = (
+        f"{api_base()}/2/tweets/counts/recent"
+        f"?query={urllib.parse.quote(query, safe='')}&granularity={granularity}"
+        f"&start_time={twitter_slices.iso(fetch_from)}&end_time={twitter_slices.iso(end)}"
+    )
+    fetched, error, token = [], None, None
+    while True:
+        data = api_get(url + (f"&next_token={urllib.parse.quote(token, safe='')}" if token else ''), headers)
+        if 'data' not in data and ('error' in data or 'errors' in data):
+            error = data
+            break
+        fetched += twitter_slices.volumes(data.get('data', []))
+        token = data.get('meta', {}).get('next_token')
+        if not token:
+            break
+    fetched.sort()
+    new = twitter_counts.closed(fetched, step, now)
+    if new:
+        oldest = now - twitter_slices.RECENT_WINDOW - step
+        cache.set('counts', key, {**{t: c for t, c in cached.items() if int(t) >= oldest}, **new},
+                  twitter_cache.COUNTS_TTL)
+    return buckets + fetched, len(buckets), error
+
+
+def search_volumes(query, start, end, headers):
+    """Hourly volumes of query over [start, end) (see twitter_slices.volumes), or None."""
+    buckets, _, error = query_counts(query, 'hour', start, end, headers)
+    return None if error else buckets
+
+
+class SlicedSearch:
+    """Pager-like recent search that pages time slices of its window concurrently.
+
+    The slices are planned by twitter_slices.plan() from the query's hourly
+    volumes, fetched up front so the result can report the plan. Each slice
+    is paged with its own Pager on the run_concurrently() pool, and the
+    tweets are merged newest first without duplicates, up to `limit`.
+    next_token is always None; narrow the window with --until instead.
+    """
+
+    def __init__(self, query, url, headers, limit, workers, start, end, raw=False):
+        import twitter_slices
+        self.url = url
+        self.headers = headers
+        self.limit = limit
+        self.workers = workers
+        self.raw = raw
+        self.window = (start, end)
+        self.slices, self.estimate = twitter_slices.plan(
+            start, end, workers, search_volumes(query, start, end, headers), limit)
+        self.next_token = None
+        self.trimmed = 0
+        self.error = None
+        self.pages = 0
+
+    def describe(self):
+        """The plan, for the result: window, number of slices and estimated tweets."""
+        import twitter_slices
+        return {
+            "window": {"start_time": twitter_slices.iso(self.window[0]),
+                       "end_time": twitter_slices.iso(self.window[1])},
+            "slices": len(self.slices),
+            "estimated": self.estimate,
+        }
+
+    def _fetch_slice(self, bounds):
+        import twitter_slices
+        start, end = bounds
+        url = f"{self.url}&start_time={twitter_slices.iso(start)}&end_time={twitter_slices.iso(end)}"
+        # No single slice needs more than limit tweets, even if the volumes were off
+        pager = Pager(url, self.headers, 'next_token', self.limit, 100, raw=self.raw)
+        return list(pager), pager
+
+    def __iter__(self):
+        merged = {}
+        for tweets, pager in run_concurrently(self._fetch_slice, self.slices, self.workers):
+            self.pages += pager.pages
+            if pager.error and self.error is None:
+                self.error = pager.error
+            for item in tweets:
+                merged.setdefault((item[0] if self.raw else item)['id'], item)
+        ordered = sorted(merged.values(), key=lambda item: int((item[0] if self.raw else item)['id']),
+                         reverse=True)
+        yield from ordered[:self.limit]
+
+
+def search_pager(query, opts, limit, page_size, bearer, fields_query, raw=False):
+    """Return a Pager over recent search or, with --parallel[=N], a SlicedSearch.
+
+    --since/--until (ISO dates) or --window=DURATION bound the search with
+    start_time/end_time in either mode. Prints an error and exits on bad
+    options.
+    """
+    url = (
+        f"{api_base()}/2/tweets/search/recent"
+        f"?query={urllib.parse.quote(query, safe='')}&{fields_query}"
+    )
+    headers = {"Authorization": f"Bearer {bearer}"}
+    parallel = opts.get('parallel')
+    if not parallel and not any(k in opts for k in ('since', 'until', 'window')):
+        return Pager(url, headers, 'next_token', limit, page_size, opts.get('next_token'), raw=raw)
+
+    import twitter_slices
+    try:
+        since = twitter_slices.parse_time(opts['since']) if 'since' in opts else None
+        until = twitter_slices.parse_time(opts['until']) if 'until' in opts else None
+        if 'window' in opts:
+            since = (until or time.time()) - parse_duration(opts['window'])
+    except ValueError as e:
+        print(json.dumps({"error": f"Invalid --since/--until/--window: {e}"}))
+        sys.exit(1)
+    start, end = twitter_slices.window(since, until)
+    if start >= end:
+        print(json.dumps({"error": "Empty search window: --since must be before --until, within the last 7 days"}))
+        sys.exit(1)
+
+    if not parallel:
+        url += f"&start_time={twitter_slices.iso(start)}"
+        if until is not None:
+            url += f"&end_time={twitter_slices.iso(end)}"
+        return Pager(url, headers, 'next_token', limit, page_size, opts.get('next_token'), raw=raw)
+    if opts.get('next_token'):
+        print(json.dumps({"error": "--next_token does not apply to --parallel; narrow the window with --until"}))
+        sys.exit(1)
+    workers = MAX_WORKERS if parallel is True else max(1, min(MAX_PARALLEL, int(parallel)))
+    return SlicedSearch(query, url, headers, limit, workers, start, end, raw=raw)
 
 
 def cmd_search(args):
-    if not args:
-        print(json.dumps({"error": "Usage: search <query> [--max_results=10]"}))
+    positional, opts = parse_args(args)
+    if not positional:
+        print(json.dumps({"error": "Usage: search <query> [--max_results=10|--limit=N|--all] [--next_token=T] [--ndjson]"
+                                   " [--parallel[=N]] [--since=DATE] [--until=DATE] [--window=7d]"}))
         sys.exit(1)
 
-    query = args[0]
-    max_results = 10
-    for a in args[1:]:
-        if a.startswith('--max_results='):
-            max_results = max(10, min(100, int(a.split('=')[1])))
+    query = positional[0]
+    limit, page_size = page_options(opts)
 
     bearer = get_bearer()
-    encoded_query = urllib.parse.quote(query, safe='')
 
-    url = (
-        f"https://api.twitter.com/2/tweets/search/recent"
-        f"?query={encoded_query}"
-        f"&tweet.fields=text,author_id,created_at,public_metrics,entities"
-        f"&expansions=author_id"
-        f"&user.fields=name,username"
-        f"&max_results={max_results}"
+    if opts.get('digest'):
+        search_digest(query, opts, limit, page_size, bearer)
+        return
+
+    pager = search_pager(query, opts, limit, page_size, bearer,
+                         tweet_query(SEARCH_TWEET_FIELDS, 'author_id', SEARCH_USER_FIELDS))
+    result = {"query": query}
+    if isinstance(pager, SlicedSearch):
+        result.update(pager.describe())
+    emit_listing(result, 'count', 'tweets', pager, bool(opts.get('ndjson')))
+
+
+def search_digest(query, opts, limit, page_size, bearer):
+    """Print a digest of the search results instead of the tweets (see twitter_digest.py).
+
+    Metrics, entities and authors feed the digest, so they are always
+    requested; --fields only shapes the representative tweets.
+    """
+    import twitter_digest
+    pager = search_pager(query, opts, limit, page_size, bearer,
+                         f"tweet.fields={SEARCH_TWEET_FIELDS}&expansions=author_id&user.fields={SEARCH_USER_FIELDS}",
+                         raw=True)
+    entries = list(pager)
+    if pager.error and not entries:
+        print(json.dumps({"error": pager.error.get('error') or pager.error.get('errors')}, indent=2))
+        sys.exit(1)
+
+    digest = twitter_digest.digest(
+        entries,
+        lambda tweet, author: format_tweet(tweet, {author['id']: author} if author else {}),
+        query=query,
+        clusters=int(opts.get('clusters', twitter_digest.TOP)),
     )
+    result = {"query": query, "count": len(entries), **digest}
+    if isinstance(pager, SlicedSearch):
+        result.update(pager.describe())
+    print_result(listing_fields(result, 'count', 'tweets', None, len(entries), pager))
+
+
+def cmd_local_search(args):
+    """Search the local tweet archive; never calls the API."""
+    import twitter_archive
+    # Split on whitespace so filters can ride along in a single quoted query
+    # argument, as the workflow passes it.
+    positional, opts = parse_args([w for a in args for w in a.split()])
+    query = ' '.join(positional)
+    sort = opts.get('sort', 'relevance' if query else 'recent')
+    if sort not in twitter_archive.SORTS:
+        print(json.dumps({"error": f"Unknown --sort: {sort}. Choose from: {', '.join(twitter_archive.SORTS)}"}))
+        sys.exit(1)
 
-    data = api_get(url, {"Authorization": f"Bearer {bearer}"})
+    archive = twitter_archive.get_archive()
+    if not archive.enabled:
+        print(json.dumps({"error": "Local archive unavailable (needs SQLite with FTS5 and a writable cache dir)"}))
+        sys.exit(1)
 
-    if 'errors' in data and 'data' not in data:
-        print(json.dumps({"error": data['errors']}, indent=2))
+    since = opts.get('since')
+    if 'days' in opts:
+        since = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(time.time() - float(opts['days']) * 86400))
+    min_metrics = {
+        name[len('min_'):]: int(value) for name, value in opts.items()
+        if name.startswith('min_') and name[len('min_'):] in twitter_archive.METRIC_COLUMNS
+    }
+    try:
+        tweets = archive.search(query, author=opts.get('author'), since=since, until=opts.get('until'),
+                                min_metrics=min_metrics, sort=sort, limit=int(opts.get('limit', 20)))
+    except ValueError as e:
+        print(json.dumps({"error": f"Local search failed: {e}"}))
         sys.exit(1)
 
-    users_map = build_users_map(data.get('includes'))
-    tweets = [format_tweet(t, users_map) for t in data.get('data', [])]
+    fields = command_state()['fields']
+    if fields is not None:
+        tweets = [{k: v for k, v in t.items() if k == 'id' or k in fields} for t in tweets]
+    print_result({"query": query, "count": len(tweets), "tweets": tweets})
+
+
+THREAD_QUERY = f"tweet.fields={READ_TWEET_FIELDS}&expansions=author_id&user.fields={SEARCH_USER_FIELDS}"
+THREAD_MAX_ROUNDS = 10  # Parent lookups per read; each round climbs one level
+SNOWFLAKE_EPOCH_MS = 1288834974657
+
+
+def snowflake_time(tweet_id):
+    """Epoch seconds a tweet ID was minted at (from its snowflake timestamp bits)."""
+    return ((int(tweet_id) >> 22) + SNOWFLAKE_EPOCH_MS) / 1000
+
+
+def reply_parent(tweet):
+    """ID of the tweet this one replies to, or None."""
+    for ref in tweet.get('referenced_tweets', []):
+        if ref.get('type') == 'replied_to':
+            return ref['id']
+    return None
+
+
+def fetch_thread_chunk(ids, bearer):
+    url = f"{api_base()}/2/tweets?ids={','.join(ids)}&{THREAD_QUERY}"
+    return ids, api_get(url, {"Authorization": f"Bearer {bearer}"})
+
+
+def thread_nodes(tweet_id, tweets, children, users_map, depth=0, flat=None):
+    """Format a subtree, nested under `replies` or, given flat, appended depth-first."""
+    node = format_tweet(tweets[tweet_id], users_map)
+    if flat is not None:
+        node['depth'] = depth
+        if reply_parent(tweets[tweet_id]) in tweets:
+            node['in_reply_to'] = reply_parent(tweets[tweet_id])
+        flat.append(node)
+        for child in children.get(tweet_id, []):
+            thread_nodes(child, tweets, children, users_map, depth + 1, flat)
+        return node
+    replies = [thread_nodes(child, tweets, children, users_map) for child in children.get(tweet_id, [])]
+    if replies:
+        node['replies'] = replies
+    return node
+
+
+def cmd_read_thread(args):
+    """Read a whole conversation as a reply tree.
+
+    The conversation is collected with a conversation_id: search (all
+    pages), then parents the search cannot see (older than 7 days, or
+    outside the results) are looked up in concurrent 100-ID batches. The
+    graph is cached per conversation, so a later read only searches for
+    replies newer than the ones it already has (or, once the newest is
+    about 6 days old, searches the whole 7-day window again).
+    """
+    positional, opts = parse_args(args)
+    if not positional:
+        print(json.dumps({"error": "Usage: read_thread <tweet_url_or_id> [--flat] [--fresh]"}))
+        sys.exit(1)
+    tweet_id = extract_tweet_id(positional[0])
+    if not tweet_id.isdigit():
+        print(json.dumps({"error": f"Not a tweet URL or ID: {positional[0]}"}))
+        sys.exit(1)
+
+    bearer = get_bearer()
+    headers = {"Authorization": f"Bearer {bearer}"}
+    cache = twitter_cache.get_thread_cache()
+    graph = None
+    if not opts.get('fresh'):
+        hit, conversation_id = cache.get('thread_of', tweet_id)
+        if hit:
+            graph = cache.get('thread', conversation_id)[1]
+    cached = graph is not None
+    if graph is None:
+        data = api_get(f"{api_base()}/2/tweets/{tweet_id}?{THREAD_QUERY}", headers)
+        if 'data' not in data:
+            print(json.dumps({"error": data.get('error') or data.get('errors'), "status": data.get('status')}, indent=2))
+            sys.exit(1)
+        tweet = data['data']
+        graph = {
+            'conversation_id': tweet.get('conversation_id', tweet['id']),
+            'tweets': {tweet['id']: tweet},
+            'users': build_users_map(data.get('includes')),
+            'newest_id': None,
+        }
+    conversation_id = graph['conversation_id']
+    tweets, users_map = graph['tweets'], graph['users']
+
+    url = (
+        f"{api_base()}/2/tweets/search/recent"
+        f"?query={urllib.parse.quote(f'conversation_id:{conversation_id}', safe='')}"
+        f"&{THREAD_QUERY}"
+    )
+    # Recent search rejects a since_id older than its 7 days, which a thread
+    # that has gone quiet soon has: search it all again instead
+    newest_id = graph['newest_id']
+    if newest_id and time.time() - snowflake_time(newest_id) < twitter_cache.WATERMARK_TTL:
+        url += f"&since_id={newest_id}"
+    pager = Pager(url, headers, 'next_token', raw=True)
+    new_replies = 0
+    for tweet, author in pager:
+        if tweet['id'] not in tweets:
+            new_replies += 1
+        tweets[tweet['id']] = tweet
+        if author:
+            users_map[author['id']] = author
+
+    unavailable = set()
+    for _ in range(THREAD_MAX_ROUNDS):
+        missing = sorted({reply_parent(t) for t in tweets.values()} - set(tweets) - unavailable - {None})
+        if not missing:
+            break
+        chunks = [missing[i:i + LOOKUP_CHUNK] for i in range(0, len(missing), LOOKUP_CHUNK)]
+        for _, data in run_concurrently(lambda chunk: fetch_thread_chunk(chunk, bearer), chunks):
+            for tweet in data.get('data', []):
+                tweets[tweet['id']] = tweet
+            users_map.update(build_users_map(data.get('includes')))
+        if command_state()['partial']:
+            break  # Out of --deadline_ms: what is still missing may well exist
+        unavailable.update(i for i in missing if i not in tweets)  # Deleted or protected
+
+    in_conversation = [int(i) for i, t in tweets.items() if t.get('conversation_id') == conversation_id]
+    if in_conversation and not pager.error:
+        graph['newest_id'] = str(max(in_conversation))
+    ttl = twitter_cache.THREAD_TTL
+    cache.set('thread', conversation_id, graph, ttl)
+    cache.set_many('thread_of', [(i, conversation_id) for i in tweets], ttl)
+
+    children = {}
+    for t in sorted(tweets.values(), key=lambda t: int(t['id'])):
+        parent = reply_parent(t)
+        if parent in tweets:
+            children.setdefault(parent, []).append(t['id'])
+    roots = sorted((i for i, t in tweets.items() if reply_parent(t) not in tweets), key=int)
 
     result = {
-        "query": query,
+        "conversation_id": conversation_id,
         "count": len(tweets),
-        "tweets": tweets,
+        "new_replies": new_replies,
+        "cached": cached,
     }
-    if data.get('meta', {}).get('next_token'):
-        result['has_more'] = True
+    if unavailable:
+        result["missing_parents"] = sorted(unavailable)
+    if pager.error:
+        result["error"] = pager.error.get('error') or pager.error.get('errors')
+    if opts.get('flat'):
+        flat = []
+        for root in roots:
+            thread_nodes(root, tweets, children, users_map, flat=flat)
+        result["tweets"] = flat
+    else:
+        result["thread"] = [thread_nodes(root, tweets, children, users_map) for root in roots]
+    print_result(result)
+
+
+def tracking_ids(positional, opts):
+    """Tweet IDs named on the command line, deduplicated in order."""
+    ids = []
+    for raw in read_tweet_inputs(positional, opts):
+        tweet_id = extract_tweet_id(raw)
+        if not tweet_id.isdigit():
+            print(json.dumps({"error": f"Not a tweet URL or ID: {raw}"}))
+            sys.exit(1)
+        if tweet_id not in ids:
+            ids.append(tweet_id)
+    return ids
+
+
+def fetch_metrics_chunk(ids, bearer):
+    url = f"{api_base()}/2/tweets?ids={','.join(ids)}&tweet.fields=public_metrics"
+    return ids, api_get(url, {"Authorization": f"Bearer {bearer}"})
+
+
+def cmd_track(args):
+    """Append a public_metrics snapshot for each tweet to its history.
+
+    With no IDs, every tweet tracked so far is snapshotted again, so a
+    cron entry of plain `track` keeps the whole set current.
+    """
+    import twitter_metrics
+    positional, opts = parse_args(args)
+    store = twitter_metrics.get_metrics_store()
+    ids = tracking_ids(positional, opts) or store.tracked()
+    if not ids:
+        print(json.dumps({"error": "Usage: track <tweet_url_or_id>... [--file=PATH|-] (no IDs: re-snapshot tracked tweets)"}))
+        sys.exit(1)
 
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+    bearer = get_bearer()
+    chunks = [ids[i:i + LOOKUP_CHUNK] for i in range(0, len(ids), LOOKUP_CHUNK)]
+    fetched, errors = {}, {}
+    for chunk, data in run_concurrently(lambda chunk: fetch_metrics_chunk(chunk, bearer), chunks):
+        for t in data.get('data', []):
+            fetched[t['id']] = t.get('public_metrics', {})
+        for e in data.get('errors', []):
+            errors[e.get('resource_id') or e.get('value')] = e.get('detail') or e.get('title')
+        if 'error' in data:
+            errors.update({i: data['error'] for i in chunk})
+
+    now = int(time.time())
+    tweets = []
+    for tweet_id in ids:
+        if tweet_id not in fetched:
+            tweets.append({"id": tweet_id, "error": errors.get(tweet_id, "Tweet not returned")})
+            continue
+        previous = store.last(tweet_id)
+        store.append(tweet_id, fetched[tweet_id], now)
+        current = twitter_metrics.snapshot_values(fetched[tweet_id])
+        entry = {"id": tweet_id, "metrics": current}
+        if previous:
+            entry["change"] = {k: current[k] - previous[1][k] for k in twitter_metrics.COLUMNS}
+            entry["since_previous_s"] = now - previous[0]
+        tweets.append(entry)
+
+    failed = sum(1 for t in tweets if 'error' in t)
+    print_result({"snapshot_at": iso_time(now), "count": len(tweets) - failed, "failed": failed, "tweets": tweets})
+    if failed == len(tweets):
+        sys.exit(1)
+
+
+def parse_duration(text):
+    """Seconds in a duration such as 90m, 24h or 7d (plain numbers are seconds)."""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+    text = str(text).strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def cmd_track_report(args):
+    """Summarize tracked metrics histories: deltas and hourly rates."""
+    import twitter_metrics
+    positional, opts = parse_args(args)
+    store = twitter_metrics.get_metrics_store()
+    ids = tracking_ids(positional, opts) or store.tracked()
+    try:
+        since = time.time() - parse_duration(opts['window']) if 'window' in opts else None
+    except ValueError:
+        print(json.dumps({"error": f"Bad --window: {opts['window']} (use e.g. 90m, 24h, 7d)"}))
+        sys.exit(1)
+
+    tweets = []
+    for tweet_id in ids:
+        series = store.series(tweet_id)
+        summary = series.window(since).summary() if series is not None else None
+        if summary is None:
+            tweets.append({"id": tweet_id, "error": "No snapshots" + (" in window" if series else "")})
+            continue
+        summary['from'] = iso_time(summary['from'])
+        summary['to'] = iso_time(summary['to'])
+        tweets.append({"id": tweet_id, **summary, "history_bytes": store.size(tweet_id)})
+
+    sort = opts.get('sort')
+    if sort:
+        if sort not in twitter_metrics.COLUMNS:
+            print(json.dumps({"error": f"Unknown --sort: {sort}. Choose from: {', '.join(twitter_metrics.COLUMNS)}"}))
+            sys.exit(1)
+        tweets.sort(key=lambda t: t.get('metrics', {}).get(sort, {}).get('delta', -1), reverse=True)
+    print_result({"window": opts.get('window', 'all'), "count": len(tweets), "tweets": tweets})
+
+
+# Mention searches the assistant is asked to watch (see docs/twitter-tool.md).
+DEFAULT_MONITOR_QUERIES = {
+    'probe': 'probe code search',
+    'visor': 'visor code review',
+    'goreplay': 'goreplay',
+}
+
+
+def monitor_queries(positional, opts):
+    """Named queries from `name=query` args, bare queries or --file=JSON."""
+    queries = {}
+    if opts.get('file'):
+        with open(opts['file']) as f:
+            queries.update(json.load(f))
+    for a in positional:
+        name, sep, query = a.partition('=')
+        if sep and name and ' ' not in name:
+            queries[name] = query
+        else:
+            queries[a] = a
+    return queries or dict(DEFAULT_MONITOR_QUERIES)
+
+
+def monitor_query(name, query, opts, bearer):
+    """Fetch tweets newer than the query's watermark and advance it.
+
+    The first run (no watermark) fetches the newest 100 and starts from
+    there. Later runs fetch every newer tweet unless --limit/--max_results
+    caps them, in which case a capped run leaves the watermark where it was.
+    """
+    state = twitter_cache.get_monitor_state()
+    key = f"{name}:{hashlib.sha256(query.encode()).hexdigest()[:16]}"
+    _, since_id = state.get('since_id', key)
+    if opts.get('reset'):
+        since_id = None
+
+    url = (
+        f"{api_base()}/2/tweets/search/recent"
+        f"?query={urllib.parse.quote(query, safe='')}"
+        f"&{tweet_query(SEARCH_TWEET_FIELDS, 'author_id', SEARCH_USER_FIELDS)}"
+    )
+    if since_id:
+        url += f"&since_id={since_id}"
+
+    if 'limit' in opts or 'all' in opts or 'max_results' in opts:
+        limit, page_size = page_options(opts)
+    else:
+        limit, page_size = (None if since_id else 100), 100
+    pager = Pager(url, {"Authorization": f"Bearer {bearer}"}, 'next_token', limit, page_size)
+    tweets = list(pager)
+    result = listing_fields({"name": name, "query": query, "since_id": since_id},
+                            'new', 'tweets', tweets, len(tweets), pager)
+    if pager.error:
+        return result
+    if since_id and (pager.next_token or pager.trimmed):
+        result['truncated'] = True  # Newer tweets are left: advancing would lose them
+        return result
+
+    newest = max((t['id'] for t in tweets), key=int, default=since_id)
+    if newest:
+        state.set('since_id', key, newest, twitter_cache.WATERMARK_TTL)
+    result['newest_id'] = newest
+    return result
+
+
+def cmd_monitor(args):
+    positional, opts = parse_args(args)
+    queries = monitor_queries(positional, opts)
+    bearer = get_bearer()
+
+    results = run_concurrently(lambda item: monitor_query(item[0], item[1], opts, bearer),
+                               queries.items())
+    print_result({
+        "new_total": sum(r['new'] for r in results),
+        "queries": results,
+    })
+
+
+def query_volume(name, query, granularity, start, end, opts, bearer):
+    """Counts summary of one query for cmd_counts."""
+    import twitter_counts
+    import twitter_slices
+    buckets, cached, error = query_counts(query, twitter_counts.FETCH_GRANULARITY[granularity],
+                                          start, end, {"Authorization": f"Bearer {bearer}"})
+    result = {"name": name, "query": query}
+    if error:
+        result["error"] = error.get('error') or error.get('errors')
+        if not buckets:
+            return result
+    step = twitter_counts.GRANULARITY[granularity]
+    if twitter_counts.FETCH_GRANULARITY[granularity] != granularity:
+        buckets = twitter_counts.aggregate(buckets, step)
+    first, last = buckets[0][0], buckets[-1][1]
+    peak = max(buckets, key=lambda b: b[2])
+    result.update({
+        "total": sum(b[2] for b in buckets),
+        "start_time": twitter_slices.iso(first),
+        "end_time": twitter_slices.iso(last),
+        "trend": twitter_counts.trend(buckets, first, last),
+        "peak": {"start": twitter_slices.iso(peak[0]), "count": peak[2]},
+        "cached_buckets": cached,
+    })
+    if opts.get('spikes'):
+        threshold = twitter_counts.SPIKE_THRESHOLD if opts['spikes'] is True else float(opts['spikes'])
+        baseline = int(opts.get('baseline', twitter_counts.BASELINE[granularity]))
+        result["spikes"] = [
+            {
+                "start": twitter_slices.iso(buckets[s['first']][0]),
+                "end": twitter_slices.iso(buckets[s['last']][1]),
+                "total": s['total'],
+                "peak": twitter_slices.iso(buckets[s['peak']][0]),
+                "count": s['count'],
+                "baseline": s['baseline'],
+                "score": round(s['score'], 1),
+            }
+            for s in twitter_counts.spikes(buckets, baseline, threshold)
+        ]
+    if opts.get('buckets'):
+        result["buckets"] = [{"start": twitter_slices.iso(s), "count": c} for s, _, c in buckets]
+    return result
+
+
+def cmd_counts(args):
+    """Tweet volumes of one or more queries from /2/tweets/counts/recent."""
+    import twitter_counts
+    import twitter_slices
+    positional, opts = parse_args(args)
+    queries = monitor_queries(positional, opts)
+    granularity = opts.get('granularity', 'hour')
+    if granularity not in twitter_counts.GRANULARITY:
+        print(json.dumps({"error": f"Unknown --granularity: {granularity}. "
+                                   f"Choose from: {', '.join(twitter_counts.GRANULARITY)}"}))
+        sys.exit(1)
+    try:
+        since = twitter_slices.parse_time(opts['since']) if 'since' in opts else None
+        until = twitter_slices.parse_time(opts['until']) if 'until' in opts else None
+        if 'window' in opts:
+            since = (until or time.time()) - parse_duration(opts['window'])
+    except ValueError as e:
+        print(json.dumps({"error": f"Invalid --since/--until/--window: {e}"}))
+        sys.exit(1)
+    start, end = twitter_slices.window(since, until)
+    if start >= end:
+        print(json.dumps({"error": "Empty window: --since must be before --until, within the last 7 days"}))
+        sys.exit(1)
+
+    bearer = get_bearer()
+    results = run_concurrently(
+        lambda item: query_volume(item[0], item[1], granularity, start, end, opts, bearer), queries.items())
+    print_result({"granularity": granularity, "queries": results})
+
+
+STREAM_RULES_PATH = '/2/tweets/search/stream/rules'
+STREAM_OFFSET_TTL = 90 * 24 * 3600
+
+
+def sync_stream_rules(queries, headers):
+    """Make the filtered-stream rules exactly the {tag: query} set; returns a summary.
+
+    Rules are matched on value and tag, so unchanged queries keep their rule
+    (and the stream its position); anything else, including rules another
+    tool added for this app, is deleted.
+    """
+    import twitter_stream
+    url = f"{api_base()}{STREAM_RULES_PATH}"
+    current = api_get(url, headers)
+    if 'error' in current or ('errors' in current and 'data' not in current):
+        return {"error": current.get('error') or current.get('errors'), "status": current.get('status')}
+    add, delete = twitter_stream.rule_changes(current.get('data', []), queries)
+    summary = {"added": len(add), "deleted": len(delete)}
+    for payload in ([{"delete": {"ids": delete}}] if delete else []) + ([{"add": add}] if add else []):
+        data = api_post(url, headers, payload)
+        if 'error' in data or data.get('errors'):  # e.g. a query that is not a valid rule
+            return {**summary, "error": data.get('error') or data.get('errors'), "status": data.get('status')}
+    if add or delete:
+        current = api_get(url, headers)
+    summary["rules"] = [{"tag": r.get('tag'), "value": r['value'], "id": r['id']}
+                        for r in current.get('data', [])]
+    return summary
+
+
+def cmd_stream(args):
+    """Consume the filtered stream for the monitor queries into the stream queue."""
+    import twitter_stream
+    positional, opts = parse_args(args)
+    queries = monitor_queries(positional, opts)
+    bearer = get_bearer()
+    headers = {"Authorization": f"Bearer {bearer}"}
+
+    rules = sync_stream_rules(queries, headers)
+    if 'error' in rules:
+        error = {"error": rules['error']}
+        if rules.get('status'):
+            error['status'] = rules['status']
+        print(json.dumps(error, indent=2))
+        sys.exit(1)
+    if opts.get('rules_only'):
+        print_result({"rules": rules})
+        return
+
+    try:
+        until = time.monotonic() + parse_duration(opts['duration']) if 'duration' in opts else None
+    except ValueError:
+        print(json.dumps({"error": f"Bad --duration: {opts['duration']} (use e.g. 90m, 24h)"}))
+        sys.exit(1)
+    remaining = deadline_remaining()
+    if remaining is not None:
+        until = min(until or float('inf'), time.monotonic() + remaining)
+    max_tweets = int(opts['max_tweets']) if 'max_tweets' in opts else None
+    to_stdout = opts.get('out') == '-'
+    queue = None if to_stdout else twitter_stream.get_queue(opts.get('out'))
+    state = command_state()
+    received = 0
+
+    def on_tweet(message):
+        nonlocal received
+        tweet = format_tweet(message['data'], build_users_map(message.get('includes')))
+        tweet['matching_rules'] = [r.get('tag') or r.get('id') for r in message.get('matching_rules', [])]
+        tweet['received_at'] = iso_time(time.time())
+        if to_stdout:
+            print(json.dumps(tweet, ensure_ascii=False), flush=True)
+        else:
+            queue.append(tweet)
+        if state['archive']:
+            import twitter_archive
+            twitter_archive.get_archive().upsert(state['archive'])  # Flushed as it goes: the run may be long
+            state['archive'].clear()
+        received += 1
+        return max_tweets is None or received < max_tweets
+
+    url = (f"{api_base()}/2/tweets/search/stream"
+           f"?{tweet_query(SEARCH_TWEET_FIELDS, 'author_id', SEARCH_USER_FIELDS)}")
+    stats = twitter_stream.consume(url, headers, on_tweet, until=until,
+                                   stall_timeout=float(opts.get('stall_timeout', twitter_stream.STALL_TIMEOUT)))
+
+    result = {"received": received, "rules": rules}
+    if queue is not None:
+        result["queue"] = queue.path
+    result.update({k: stats[k] for k in ('connections', 'reconnects', 'keepalives')})
+    if stats['errors']:
+        result["errors"] = stats['errors']
+    if stats['fatal']:
+        result["error"] = stats['fatal']['error']
+        result["status"] = stats['fatal']['status']
+    print_result(result, indent=None if to_stdout else 2)
+    if stats['fatal'] and not received:
+        sys.exit(1)
+
+
+def cmd_stream_read(args):
+    """Return tweets `stream` queued since this consumer's previous read."""
+    import twitter_stream
+    _, opts = parse_args(args)
+    queue = twitter_stream.get_queue(opts.get('queue'))
+    if not os.path.exists(queue.path):
+        print(json.dumps({"error": f"No stream queue at {queue.path}; run `twitter-api.py stream` to fill it"}))
+        sys.exit(1)
+
+    consumer = opts.get('consumer', 'default')
+    state = twitter_cache.get_monitor_state()
+    key = f"{consumer}:{os.path.realpath(queue.path)}"
+    _, offset = state.get('stream_offset', key)
+    if opts.get('reset'):
+        offset = 0
+    limit = max(1, int(opts['limit'])) if 'limit' in opts else None
+    tweets, next_offset = queue.read(offset or 0, limit)
+    if not opts.get('peek'):
+        state.set('stream_offset', key, next_offset, STREAM_OFFSET_TTL)
+
+    result = {"consumer": consumer, "new": len(tweets), "tweets": tweets}
+    if next_offset < queue.size():
+        result["has_more"] = True
+    print_result(result)
 
 
 def get_oauth2_user_token():
-    """Get OAuth 2.0 user access token (required for bookmarks)."""
+    """Get OAuth 2.0 user access token (required for bookmarks).
+
+    A token within twitter_credentials.REFRESH_MARGIN of its saved expiry is
+    refreshed first; if that fails, the old token is still tried.
+    """
     token = os.environ.get('TWITTER_OAUTH2_USER_TOKEN', '')
+    if token and os.environ.get('TWITTER_OAUTH2_EXPIRES_AT'):
+        import twitter_credentials
+        if twitter_credentials.expiring(os.environ):
+            fresh, error = twitter_credentials.refresh(token)
+            if error:
+                print(json.dumps({"warning": f"OAuth2 token refresh failed: {error}"}), file=sys.stderr)
+            elif fresh != token:
+                _REPLACED_USER_TOKENS[token] = fresh
+                token = fresh
     if not token:
         print(json.dumps({
             "error": "Bookmarks require OAuth 2.0 User Context. "
@@ -247,96 +1902,263 @@ def get_oauth2_user_token():
     return token
 
 
-def cmd_bookmarks(args):
-    max_results = 10
-    for a in args:
-        if a.startswith('--max_results='):
-            max_results = max(10, min(100, int(a.split('=')[1])))
+def bookmarks_owner(oauth2_token):
+    """Return the user ID whose bookmarks the token reads, or exit."""
+    me, details = lookup_me(oauth2_token)
+    if me is None:
+        print(json.dumps({"error": "Failed to get user info. Token may be expired.", "details": details}, indent=2))
+        sys.exit(1)
+    return me['id']
 
-    oauth2_token = get_oauth2_user_token()
 
-    # First get authenticated user ID
-    me_url = "https://api.twitter.com/2/users/me"
-    me_data = api_get(me_url, {"Authorization": f"Bearer {oauth2_token}"})
+def iso_time(ts):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
 
-    if 'data' not in me_data:
-        print(json.dumps({"error": "Failed to get user info. Token may be expired.", "details": me_data}, indent=2))
-        sys.exit(1)
 
-    user_id = me_data['data']['id']
+BOOKMARK_STOP_RUN = 3  # Mirrored bookmarks in a row, in mirror order, that end an incremental walk
 
-    # Get bookmarks (requires OAuth 2.0 User Context)
-    url = (
-        f"https://api.twitter.com/2/users/{user_id}/bookmarks"
-        f"?tweet.fields=text,author_id,created_at,public_metrics,entities"
-        f"&expansions=author_id"
-        f"&user.fields=name,username"
-        f"&max_results={max_results}"
-    )
-
-    data = api_get(url, {"Authorization": f"Bearer {oauth2_token}"})
 
-    if 'error' in data or ('errors' in data and 'data' not in data):
-        print(json.dumps({"error": data.get('error') or data.get('errors'), "status": data.get('status')}, indent=2))
-        sys.exit(1)
+def sync_bookmarks(user_id, oauth2_token, full=False):
+    """Walk bookmarks newest first into the local mirror.
 
-    users_map = build_users_map(data.get('includes'))
-    tweets = [format_tweet(t, users_map) for t in data.get('data', [])]
+    An incremental walk stops where it catches up with the mirror: at the
+    mirror's newest bookmark, or at the first of BOOKMARK_STOP_RUN mirrored
+    bookmarks that follow each other as they do in the mirror. Mirrored
+    bookmarks that should have appeared before that point were removed. A
+    lone mirrored bookmark elsewhere (an old tweet bookmarked again) does
+    not end the walk. A full walk (also used for the first sync), or one
+    that reaches the end, reads every page and treats anything it did not
+    see as removed.
+    """
+    mirror = twitter_cache.get_bookmark_mirror()
+    full = full or mirror.last_sync(user_id) is None
+    known_ids = mirror.active_ids(user_id)
+    position = {tweet_id: i for i, tweet_id in enumerate(known_ids)}
 
+    # Always fetch every field: the mirror serves later --fields projections.
+    url = (
+        f"{api_base()}/2/users/{user_id}/bookmarks"
+        f"?tweet.fields={SEARCH_TWEET_FIELDS}&expansions=author_id&user.fields={SEARCH_USER_FIELDS}"
+    )
+    pager = Pager(url, {"Authorization": f"Bearer {oauth2_token}"}, 'pagination_token', raw=True)
+    seen, stop_id, run = [], None, []
+    for tweet, author in pager:
+        i = position.get(tweet['id'])
+        if not full and i is not None:
+            if i == 0:
+                stop_id = tweet['id']
+                break
+            run = run + [i] if run and i == run[-1] + 1 else [i]
+            if len(run) == BOOKMARK_STOP_RUN:
+                stop_id = known_ids[run[0]]
+                del seen[len(seen) - (BOOKMARK_STOP_RUN - 1):]  # The run is already mirrored in place
+                break
+        else:
+            run = []
+        seen.append((tweet, author))
+
+    complete = pager.error is None
+    # A walk that ran out of pages saw every bookmark, like a full one
+    added, removed = mirror.apply_sync(user_id, seen, stop_id, complete, full or stop_id is None)
+    added_set = set(added)
+    users_map = {a['id']: a for _, a in seen if a}
     result = {
-        "bookmarks_count": len(tweets),
-        "bookmarks": tweets,
+        "mode": "full" if full else "incremental",
+        "pages": pager.pages,
+        "added_count": len(added),
+        "removed_count": len(removed),
+        "total": len(mirror.active_ids(user_id)),
+        "added": [format_tweet(t, users_map) for t, _ in seen if t['id'] in added_set],
+        "removed": removed,
     }
-    if data.get('meta', {}).get('next_token'):
-        result['has_more'] = True
+    if pager.error:
+        result['error'] = pager.error.get('error') or pager.error.get('errors')
+    return result
 
-    print(json.dumps(result, indent=2, ensure_ascii=False))
 
+MIRROR_SORTS = {
+    'saved': None,  # Mirror order: most recently bookmarked first
+    'recent': lambda e: e['tweet'].get('created_at', ''),
+    'likes': lambda e: e['tweet'].get('public_metrics', {}).get('like_count', 0),
+    'impressions': lambda e: e['tweet'].get('public_metrics', {}).get('impression_count', 0),
+}
 
-def cmd_user_tweets(args):
-    if not args:
-        print(json.dumps({"error": "Usage: user_tweets <username> [--max_results=10]"}))
+
+def bookmarks_from_mirror(user_id, opts, sync_result=None):
+    """Print bookmarks from the local mirror, filtered and sorted per opts."""
+    sort = opts.get('sort', 'saved')
+    if sort not in MIRROR_SORTS:
+        print(json.dumps({"error": f"Unknown --sort: {sort}. Choose from: {', '.join(MIRROR_SORTS)}"}))
         sys.exit(1)
+    limit, _ = page_options(opts)
+    mirror = twitter_cache.get_bookmark_mirror()
+    entries = mirror.entries(user_id, removed=bool(opts.get('removed')))
+
+    words = str(opts.get('query', '')).lower().split()
+    author = str(opts.get('author', '')).lstrip('@').lower()
+    since, until = opts.get('since'), opts.get('until')
+    entries = [
+        e for e in entries
+        if all(w in e['tweet']['text'].lower() for w in words)
+        and (not author or (e['author'] or {}).get('username', '').lower() == author)
+        and (not since or e['tweet'].get('created_at', '') >= since)
+        and (not until or e['tweet'].get('created_at', '') < until)
+    ]
+    if MIRROR_SORTS[sort]:
+        entries.sort(key=MIRROR_SORTS[sort], reverse=True)
+    matched = len(entries)
+    if limit is not None:
+        entries = entries[:limit]
+
+    users_map = {e['author']['id']: e['author'] for e in entries if e['author']}
+    tweets = []
+    for e in entries:
+        tweet = format_tweet(e['tweet'], users_map)
+        tweet['bookmarked_at'] = iso_time(e['added_at'])
+        if e['removed_at']:
+            tweet['removed_at'] = iso_time(e['removed_at'])
+        tweets.append(tweet)
+
+    result = {"source": "mirror", "synced_at": iso_time(mirror.last_sync(user_id)['synced_at'])}
+    if sync_result and sync_result.get('error'):
+        result['sync_error'] = sync_result['error']
+    if opts.get('ndjson'):
+        for tweet in tweets:
+            print(json.dumps(tweet, ensure_ascii=False), flush=True)
+        print_result({**result, "bookmarks_count": len(tweets), "matched": matched}, indent=None)
+        return
+    print_result({**result, "bookmarks_count": len(tweets), "matched": matched, "bookmarks": tweets})
 
-    username = args[0].lstrip('@')
-    max_results = 10
-    for a in args[1:]:
-        if a.startswith('--max_results='):
-            max_results = int(a.split('=')[1])
 
-    bearer = get_bearer()
+def cmd_bookmarks(args):
+    _, opts = parse_args(args)
+    limit, page_size = page_options(opts)
 
-    # First resolve username to user ID
-    user_url = f"https://api.twitter.com/2/users/by/username/{username}?user.fields=name,description,public_metrics"
-    user_data = api_get(user_url, {"Authorization": f"Bearer {bearer}"})
+    oauth2_token = get_oauth2_user_token()
+    user_id = bookmarks_owner(oauth2_token)
+
+    # Once bookmarks_sync has run, answer from the mirror, topping it up
+    # first when the last sync is older than TWITTER_BOOKMARK_SYNC_TTL.
+    mirror = twitter_cache.get_bookmark_mirror()
+    last = mirror.last_sync(user_id) if not (opts.get('remote') or opts.get('next_token')) else None
+    if last:
+        sync_result = None
+        ttl = twitter_cache.env_seconds('TWITTER_BOOKMARK_SYNC_TTL', twitter_cache.DEFAULT_BOOKMARK_SYNC_TTL)
+        if time.time() - last['synced_at'] > ttl:
+            sync_result = sync_bookmarks(user_id, oauth2_token)
+        bookmarks_from_mirror(user_id, opts, sync_result)
+        return
+
+    # Get bookmarks (requires OAuth 2.0 User Context)
+    url = (
+        f"{api_base()}/2/users/{user_id}/bookmarks"
+        f"?{tweet_query(SEARCH_TWEET_FIELDS, 'author_id', SEARCH_USER_FIELDS)}"
+    )
 
-    if 'data' not in user_data:
-        print(json.dumps({"error": f"User @{username} not found", "details": user_data}, indent=2))
+    pager = Pager(url, {"Authorization": f"Bearer {oauth2_token}"}, 'pagination_token',
+                  limit, page_size, opts.get('next_token'))
+    emit_listing({}, 'bookmarks_count', 'bookmarks', pager, bool(opts.get('ndjson')))
+
+
+def cmd_bookmarks_sync(args):
+    """Bring the local bookmark mirror up to date."""
+    _, opts = parse_args(args)
+    oauth2_token = get_oauth2_user_token()
+    user_id = bookmarks_owner(oauth2_token)
+    if not twitter_cache.get_bookmark_mirror().enabled:
+        print(json.dumps({"error": "Bookmark mirror unavailable (cache directory not writable)"}))
+        sys.exit(1)
+    result = sync_bookmarks(user_id, oauth2_token, full=bool(opts.get('full')))
+    print_result(result)
+    if result.get('error') and not result['added_count']:
         sys.exit(1)
 
-    user_id = user_data['data']['id']
-    user_info = user_data['data']
 
-    # Get their tweets
-    tweets_url = (
-        f"https://api.twitter.com/2/users/{user_id}/tweets"
-        f"?tweet.fields=text,created_at,public_metrics,entities"
-        f"&max_results={max_results}"
+def user_timeline_url(user_id):
+    return (
+        f"{api_base()}/2/users/{user_id}/tweets"
+        f"?{tweet_query(SEARCH_TWEET_FIELDS)}"
     )
 
-    tweets_data = api_get(tweets_url, {"Authorization": f"Bearer {bearer}"})
-    users_map = {user_id: user_info}
-    tweets = [format_tweet(t, users_map) for t in tweets_data.get('data', [])]
 
-    result = {
+def user_header(username, user_info):
+    return {
         "user": f"@{username} ({user_info.get('name', '')})",
         "description": user_info.get('description', ''),
         "followers": user_info.get('public_metrics', {}).get('followers_count', 0),
-        "count": len(tweets),
-        "tweets": tweets,
     }
 
-    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+def user_tweets_multi(usernames, opts, bearer):
+    """Fetch several timelines concurrently after one bulk username lookup.
+
+    Returns per-user groups, or with --merge a single timeline of all tweets
+    ordered newest first. Wall time tracks the slowest user, not the sum.
+    """
+    limit, page_size = page_options(opts)
+    resolved = lookup_users(usernames, bearer)
+    headers = {"Authorization": f"Bearer {bearer}"}
+
+    def fetch(user_info):
+        pager = Pager(user_timeline_url(user_info['id']), headers, 'pagination_token',
+                      limit, page_size, users_map={user_info['id']: user_info})
+        return list(pager), pager
+
+    found = [resolved[u.lower()][0] for u in usernames if resolved.get(u.lower(), (None,))[0]]
+    timelines = dict(zip([u['id'] for u in found], run_concurrently(fetch, found)))
+
+    groups = []
+    for username in usernames:
+        user_info, details = resolved.get(username.lower(), (None, None))
+        if user_info is None:
+            groups.append({"user": f"@{username}", "error": f"User @{username} not found",
+                           "details": details})
+            continue
+        tweets, pager = timelines[user_info['id']]
+        groups.append(listing_fields(user_header(username, user_info), 'count', 'tweets',
+                                     tweets, len(tweets), pager))
+
+    if opts.get('merge'):
+        merged = sorted((t for g in groups for t in g.pop('tweets', [])),
+                        key=lambda t: (t.get('created_at', ''), int(t['id'])), reverse=True)
+        return {"users": groups, "count": len(merged), "tweets": merged}
+    return {"users": groups, "count": sum(g.get('count', 0) for g in groups)}
+
+
+def cmd_user_tweets(args):
+    positional, opts = parse_args(args)
+    usernames = []
+    for a in positional:
+        for name in re.split(r'[\s,]+', a):
+            name = name.lstrip('@')
+            if name and name.lower() not in [u.lower() for u in usernames]:
+                usernames.append(name)
+    if not usernames:
+        print(json.dumps({"error": "Usage: user_tweets <username>... [--max_results=10|--limit=N|--all] [--merge] [--ndjson]"}))
+        sys.exit(1)
+
+    bearer = get_bearer()
+
+    if len(usernames) > 1:
+        print_result(user_tweets_multi(usernames, opts, bearer))
+        return
+
+    username = usernames[0]
+    limit, page_size = page_options(opts)
+
+    # First resolve username to user ID
+    user_info, details = lookup_user(username, bearer)
+
+    if user_info is None:
+        print(json.dumps({"error": f"User @{username} not found", "details": details}, indent=2))
+        sys.exit(1)
+
+    user_id = user_info['id']
+
+    # Get their tweets
+    pager = Pager(user_timeline_url(user_id), {"Authorization": f"Bearer {bearer}"}, 'pagination_token',
+                  limit, page_size, opts.get('next_token'), users_map={user_id: user_info})
+    emit_listing(user_header(username, user_info), 'count', 'tweets', pager, bool(opts.get('ndjson')))
 
 
 def load_env_file():
@@ -365,18 +2187,108 @@ def load_env_file():
 
 COMMANDS = {
     'read_tweet': cmd_read_tweet,
+    'read_thread': cmd_read_thread,
     'search': cmd_search,
     'bookmarks': cmd_bookmarks,
+    'bookmarks_sync': cmd_bookmarks_sync,
     'user_tweets': cmd_user_tweets,
+    'monitor': cmd_monitor,
+    'counts': cmd_counts,
+    'stream': cmd_stream,
+    'stream_read': cmd_stream_read,
+    'local_search': cmd_local_search,
+    'track': cmd_track,
+    'track_report': cmd_track_report,
+    'cache_stats': cmd_cache_stats,
 }
 
-if __name__ == '__main__':
-    load_env_file()
 
-    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+def run_command(argv):
+    """Dispatch argv (without the program name) to a command in COMMANDS.
+
+    Handles the global --trace[=stderr], --profile=PATH, --fields, --compact
+    and --deadline_ms options, which may appear anywhere in argv.
+    """
+    _command_state.set(None)
+    trace_mode = os.environ.get('TWITTER_TRACE', '')
+    profile_path = None
+    state = command_state()
+    rest = []
+    for a in argv:
+        if a == '--trace':
+            trace_mode = 'block'
+        elif a.startswith('--trace='):
+            trace_mode = a.split('=', 1)[1]
+        elif a.startswith('--profile='):
+            profile_path = a.split('=', 1)[1]
+        elif a.startswith('--fields='):
+            requested = {f.strip() for f in a.split('=', 1)[1].split(',') if f.strip()}
+            unknown = requested - set(OUTPUT_FIELDS)
+            if unknown:
+                print(json.dumps({"error": f"Unknown --fields: {', '.join(sorted(unknown))}. "
+                                           f"Choose from: {', '.join(OUTPUT_FIELDS)}"}))
+                sys.exit(1)
+            state['fields'] = requested
+        elif a == '--compact':
+            state['compact'] = True
+        elif a.startswith(('--deadline_ms=', '--deadline-ms=')):
+            try:
+                budget_ms = float(a.split('=', 1)[1])
+            except ValueError:
+                print(json.dumps({"error": f"Invalid {a}: expected milliseconds"}))
+                sys.exit(1)
+            state['deadline'] = time.monotonic() + budget_ms / 1000
+        else:
+            rest.append(a)
+    argv = rest
+    if os.environ.get('TWITTER_ARCHIVE', '') not in ('', '0'):
+        state['archive'] = []
+
+    trace = None
+    if trace_mode and trace_mode not in ('0', 'off'):
+        trace = start_trace('stderr' if trace_mode == 'stderr' else 'block')
+
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        dispatch(argv)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if state['archive']:
+            import twitter_archive
+            twitter_archive.get_archive().upsert(state['archive'])
+        if trace:
+            trace.finish()
+
+
+def dispatch(argv):
+    if not argv or argv[0] not in COMMANDS:
         print(json.dumps({
-            "error": f"Usage: {sys.argv[0]} <{'|'.join(COMMANDS.keys())}> [args...]"
+            "error": f"Usage: twitter-api.py <{'|'.join(COMMANDS.keys())}> [args...]"
         }))
         sys.exit(1)
 
-    COMMANDS[sys.argv[1]](sys.argv[2:])
+    COMMANDS[argv[0]](argv[1:])
+
+
+def serve(args):
+    """Run the command daemon (see twitter_daemon.py)."""
+    import twitter_daemon
+    _STARTUP.clear()  # Per-request traces should not repeat daemon startup
+    twitter_daemon.serve(args, run_command)
+
+
+if __name__ == '__main__':
+    env_started = time.perf_counter()
+    load_env_file()
+    _STARTUP['load_env_ms'] = round((time.perf_counter() - env_started) * 1000, 2)
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        serve(sys.argv[2:])
+    else:
+        run_command(sys.argv[1:])
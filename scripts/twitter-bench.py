@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Latency/throughput benchmark for twitter-api.py against the fake API server.
+
+Usage:
+  twitter-bench.py [--iterations=20] [--concurrency=1,4] [--modes=cold,warm]
+                   [--commands=read_tweet,search,user_tweets,bookmarks]
+                   [--latency_ms=20] [--jitter_ms=5] [--synthetic=300]
+                   [--rate_limit=100000] [--fail_rate=0]
+
+Starts twitter-fake-server.py, then runs each command the way the workflow
+does, as a fresh process per call:
+  cold - python3 twitter-api.py <command> (interpreter start, imports, .env
+         parsing and a new connection on every call)
+  warm - python3 twitter-client.py <command> against a `twitter-api.py serve`
+         daemon (only the thin client is started per call)
+For every (mode, command, concurrency) it reports p50/p95/p99 latency in ms,
+requests per second across the concurrent callers, and failures. Caches are
+pointed at a throwaway directory and read_tweet is run with --fresh, so the
+numbers measure the request path rather than cache hits.
+"""
+
+import sys
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = {
+    'read_tweet': ['read_tweet', '1850000000000000002', '--fresh'],
+    'search': ['search', 'goreplay', '--max_results=100'],
+    'user_tweets': ['user_tweets', 'buger', '--max_results=100'],
+    'bookmarks': ['bookmarks', '--max_results=10'],
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def start_fake_server(opts):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS, 'twitter-fake-server.py'),
+         f"--latency_ms={opts['latency_ms']}", f"--jitter_ms={opts['jitter_ms']}",
+         f"--synthetic={opts['synthetic']}", f"--rate_limit={opts['rate_limit']}",
+         f"--fail_rate={opts['fail_rate']}"],
+        stdout=subprocess.PIPE, text=True,
+    )
+    port = json.loads(proc.stdout.readline())['port']
+    return proc, f'http://127.0.0.1:{port}'
+
+
+def start_daemon(env, socket_path):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS, 'twitter-api.py'), 'serve', f'--socket={socket_path}'],
+        env=env, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        if os.path.exists(socket_path):
+            return proc
+        time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError('twitter-api daemon did not start')
+
+
+def run_batch(argv, env, iterations, concurrency):
+    """Run argv iterations times from `concurrency` threads; return latencies and failures."""
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    remaining = [iterations]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            proc = subprocess.run(argv, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if proc.returncode != 0:
+                    failures[0] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    return sorted(latencies), failures[0], wall
+
+
+def main(args):
+    opts = {'iterations': '20', 'concurrency': '1,4', 'modes': 'cold,warm',
+            'commands': ','.join(COMMANDS), 'latency_ms': '20', 'jitter_ms': '5',
+            'synthetic': '300', 'rate_limit': '100000', 'fail_rate': '0'}
+    for a in args:
+        key, _, value = a.lstrip('-').partition('=')
+        if key in opts:
+            opts[key] = value
+
+    workdir = tempfile.mkdtemp(prefix='twitter-bench-')
+    server, base_url = start_fake_server(opts)
+    env = dict(os.environ,
+               TWITTER_API_BASE_URL=base_url,
+               TWITTER_BEARER_TOKEN='bench-bearer',
+               TWITTER_OAUTH2_USER_TOKEN='bench-user',
+               TWITTER_CACHE_DIR=os.path.join(workdir, 'cache'),
+               TWITTER_API_SOCKET=os.path.join(workdir, 'twitter-api.sock'))
+
+    daemon = None
+    results = []
+    try:
+        for mode in opts['modes'].split(','):
+            if mode == 'warm':
+                daemon = start_daemon(env, env['TWITTER_API_SOCKET'])
+                script = 'twitter-client.py'
+            else:
+                script = 'twitter-api.py'
+            for name in opts['commands'].split(','):
+                argv = [sys.executable, os.path.join(SCRIPTS, script)] + COMMANDS[name]
+                for concurrency in [int(c) for c in opts['concurrency'].split(',')]:
+                    latencies, failures, wall = run_batch(argv, env, int(opts['iterations']), concurrency)
+                    results.append({
+                        "mode": mode,
+                        "command": name,
+                        "concurrency": concurrency,
+                        "calls": len(latencies),
+                        "failures": failures,
+                        "p50_ms": round(percentile(latencies, 50), 1),
+                        "p95_ms": round(percentile(latencies, 95), 1),
+                        "p99_ms": round(percentile(latencies, 99), 1),
+                        "rps": round(len(latencies) / wall, 1),
+                    })
+            if daemon:
+                daemon.terminate()
+                daemon.wait()
+                daemon = None
+    finally:
+        if daemon:
+            daemon.kill()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"settings": opts, "results": results}, indent=2))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Thin client for the twitter-api.py daemon.
+
+Usage:
+  twitter-client.py <command> [args...]
+
+Forwards the command to a running `twitter-api.py serve` over its Unix socket
+and relays its output and exit code. The request carries this process's cwd
+(relative --file/--out/... paths resolve against it), TWITTER_* environment
+(with .env filled in, as twitter-api.py would load it) and, when an argument
+is `-`, stdin. When no daemon is listening, or its TWITTER_* environment
+differs from this one in any variable, runs twitter-api.py in this process
+instead, so callers never depend on the daemon being up.
+
+Environment variables:
+  TWITTER_API_SOCKET - Socket path (default: $TMPDIR/twitter-api-<uid>.sock)
+"""
+
+import sys
+import os
+import io
+import json
+import socket
+import tempfile
+
+
+API_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'twitter-api.py')
+
+
+def default_socket_path():
+    return os.environ.get('TWITTER_API_SOCKET') or os.path.join(
+        tempfile.gettempdir(), f'twitter-api-{os.getuid()}.sock')
+
+
+def connect(path):
+    """Return a connected socket, or None if no daemon is listening."""
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def command_env():
+    """TWITTER_* variables a command run from here would see.
+
+    Mirrors twitter-api.py's load_env_file(): the first .env found (next to
+    the repo root, else in the cwd) fills in what the environment leaves unset.
+    """
+    env = {}
+    for candidate in [os.path.join(os.path.dirname(API_SCRIPT), '..', '.env'),
+                      os.path.join(os.getcwd(), '.env')]:
+        path = os.path.normpath(candidate)
+        if os.path.isfile(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#') or '=' not in line:
+                        continue
+                    if line.startswith('export '):
+                        line = line[7:]
+                    key, _, value = line.partition('=')
+                    env[key.strip()] = value.strip().strip('"').strip("'")
+            break
+    env.update(os.environ)
+    return {k: v for k, v in env.items() if k.startswith('TWITTER_') and k != 'TWITTER_API_SOCKET'}
+
+
+def run_remote(sock, argv, stdin=None):
+    """Send argv to the daemon, relay its frames and return the exit code.
+
+    Returns None when the daemon declines the command (a "fallback" frame),
+    before any output.
+    """
+    request = {
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": command_env(),
+    }
+    if stdin is not None:
+        request['stdin'] = stdin
+    with sock:
+        sock.sendall((json.dumps(request) + '\n').encode())
+        for line in sock.makefile('rb'):
+            frame = json.loads(line)
+            if 'fallback' in frame:
+                return None
+            if 'out' in frame:
+                sys.stdout.write(frame['out'])
+                sys.stdout.flush()
+            elif 'err' in frame:
+                sys.stderr.write(frame['err'])
+                sys.stderr.flush()
+            elif 'exit' in frame:
+                return frame['exit']
+    print(json.dumps({"error": "twitter-api daemon closed the connection"}))
+    return 1
+
+
+def run_in_process(argv):
+    """Fallback: execute twitter-api.py as if it had been invoked directly."""
+    import runpy
+    sys.argv = [API_SCRIPT] + argv
+    runpy.run_path(API_SCRIPT, run_name='__main__')
+    return 0
+
+
+if __name__ == '__main__':
+    argv = sys.argv[1:]
+    sock = connect(default_socket_path())
+    code = None
+    if sock:
+        stdin = sys.stdin.read() if '-' in argv else None
+        code = run_remote(sock, argv, stdin)
+        if code is None and stdin is not None:
+            sys.stdin = io.StringIO(stdin)  # Already read: hand it to the in-process run
+    sys.exit(run_in_process(argv) if code is None else code)
@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Twitter/X API v2, for benchmarks and regression runs.
+
+Usage:
+  twitter-fake-server.py [--port=0] [--fixtures=PATH] [--synthetic=N]
+                         [--latency_ms=0] [--jitter_ms=0]
+                         [--rate_limit=450] [--window=900] [--fail_rate=0.0]
+                         [--token_ttl=7200] [--stream_interval_ms=1000]
+                         [--keepalive_ms=20000] [--stream_drop=0]
+
+Serves the tweets, users and bookmarks in scripts/fixtures/twitter-api.json
+(plus N generated tweets with --synthetic) on the endpoints twitter-api.py
+uses: tweet lookup, recent search and counts, user lookup, timelines and
+bookmarks, with tweet.fields / user.fields projection, expansions,
+max_results pagination, since_id, start_time / end_time and the
+conversation_id: / from: search operators. Every response carries x-rate-limit-* headers for a per
+token+endpoint window of `rate_limit` requests; past it, or for a random
+`fail_rate` share of requests, the server answers 429. POST /2/oauth2/token
+implements the refresh_token grant with single-use refresh tokens; the
+access tokens it issues expire after `token_ttl` seconds, and those (or any
+bearer starting with `expired`) get a 401.
+
+The filtered stream keeps its rules in memory (GET/POST
+/2/tweets/search/stream/rules). /2/tweets/search/stream sends a newly made
+tweet that matches the rules every `stream_interval_ms` and a keep-alive
+line every `keepalive_ms`, chunked like the real stream. With
+`stream_drop`, it cuts the connection after that many tweets, so clients
+have to reconnect. Prints {"port": N} on stdout once listening.
+
+Point the script at it with:
+  TWITTER_API_BASE_URL=http://127.0.0.1:<port> TWITTER_BEARER_TOKEN=fake \
+  TWITTER_OAUTH2_USER_TOKEN=fake python3 scripts/twitter-api.py search goreplay
+"""
+
+import sys
+import os
+import bisect
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import http.server
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'twitter-api.json')
+
+SYNTHETIC_TEXTS = [
+    "goreplay made our load test realistic in an afternoon",
+    "probe code search found the handler in seconds",
+    "visor code review flagged a race condition before merge",
+    "shadowing prod traffic with goreplay before the cutover",
+    "our agents use probe code search over MCP now",
+    "visor code review comments are short and actually useful",
+]
+
+
+def parse_time(text):
+    """Epoch seconds of an API timestamp such as 2026-10-17T09:00:00.000Z."""
+    return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+
+
+def format_time(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+GRANULARITY = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def load_fixtures(path, synthetic=0):
+    with open(path) as f:
+        data = json.load(f)
+    tweets = data['tweets']
+    if synthetic:
+        authors = [u['id'] for u in data['users']]
+        base_id = max(int(t['id']) for t in tweets) + 1
+        start = datetime.now(timezone.utc) - timedelta(days=6)
+        step = timedelta(days=6) / synthetic
+        for i in range(synthetic):
+            tweet_id = str(base_id + i)
+            tweets.append({
+                "id": tweet_id,
+                "text": f"{SYNTHETIC_TEXTS[i % len(SYNTHETIC_TEXTS)]} #{i}",
+                "author_id": authors[i % len(authors)],
+                "created_at": (start + step * i).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+                "conversation_id": tweet_id,
+                "public_metrics": {"retweet_count": i % 7, "reply_count": i % 3, "like_count": i % 50,
+                                   "quote_count": i % 2, "bookmark_count": i % 5,
+                                   "impression_count": 100 + i * 3},
+                "edit_history_tweet_ids": [tweet_id],
+            })
+    return data
+
+
+class FakeTwitter:
+    """Fixture-backed implementation of the v2 endpoints."""
+
+    def __init__(self, data):
+        self.users = {u['id']: u for u in data['users']}
+        self.by_username = {u['username'].lower(): u for u in data['users']}
+        self.tweets = {t['id']: t for t in data['tweets']}
+        self.newest_first = sorted(self.tweets.values(), key=lambda t: int(t['id']), reverse=True)
+        self.me = data.get('me')
+        self.bookmarks = data.get('bookmarks', [])
+        self.lock = threading.Lock()  # Guards the stream rules and generated tweets
+        self.rules = {}
+        self.next_rule_id = 1850000000000000000
+        self.stream_base_id = max(map(int, self.tweets)) + 1000000
+        self.stream_seq = 0
+
+    # -- projection and expansions ------------------------------------------
+
+    @staticmethod
+    def _fields(params, name, always):
+        requested = params.get(name, [''])[0]
+        return set(always) | {f for f in requested.split(',') if f}
+
+    def project_tweet(self, tweet, params):
+        fields = self._fields(params, 'tweet.fields', ('id', 'text', 'edit_history_tweet_ids'))
+        expansions = set(params.get('expansions', [''])[0].split(','))
+        if 'referenced_tweets.id' in expansions:
+            fields.add('referenced_tweets')
+        if 'author_id' in expansions:
+            fields.add('author_id')
+        return {k: v for k, v in tweet.items() if k in fields}
+
+    def project_user(self, user, params):
+        fields = self._fields(params, 'user.fields', ('id', 'name', 'username'))
+        return {k: v for k, v in user.items() if k in fields}
+
+    def includes(self, tweets, params):
+        expansions = set(params.get('expansions', [''])[0].split(','))
+        users, refs = {}, {}
+        if 'referenced_tweets.id' in expansions:
+            for t in tweets:
+                for r in t.get('referenced_tweets', []):
+                    if r['id'] in self.tweets:
+                        refs[r['id']] = self.tweets[r['id']]
+        if 'author_id' in expansions:
+            for t in tweets:
+                if t.get('author_id') in self.users:
+                    users[t['author_id']] = self.users[t['author_id']]
+        if 'referenced_tweets.id.author_id' in expansions:
+            for t in refs.values():
+                if t.get('author_id') in self.users:
+                    users[t['author_id']] = self.users[t['author_id']]
+        result = {}
+        if users:
+            result['users'] = [self.project_user(u, params) for u in users.values()]
+        if refs:
+            result['tweets'] = [self.project_tweet(t, params) for t in refs.values()]
+        return result
+
+    def tweet_response(self, tweets, params, errors=None, meta=None, single=False):
+        body = {}
+        if tweets:
+            projected = [self.project_tweet(t, params) for t in tweets]
+            body['data'] = projected[0] if single else projected
+            includes = self.includes(tweets, params)
+            if includes:
+                body['includes'] = includes
+        if errors:
+            body['errors'] = errors
+        if meta is not None:
+            body['meta'] = meta
+        return body
+
+    def page(self, tweets, params, token_param):
+        """Slice a newest-first list by since_id, max_results and an offset token."""
+        since_id = params.get('since_id', [None])[0]
+        if since_id:
+            tweets = [t for t in tweets if int(t['id']) > int(since_id)]
+        max_results = int(params.get('max_results', ['10'])[0])
+        offset = int(params.get(token_param, ['0'])[0] or 0)
+        page = tweets[offset:offset + max_results]
+        meta = {'result_count': len(page)}
+        if page:
+            meta['newest_id'] = page[0]['id']
+            meta['oldest_id'] = page[-1]['id']
+        if offset + max_results < len(tweets):
+            meta['next_token'] = str(offset + max_results)
+        return self.tweet_response(page, params, meta=meta)
+
+    # -- endpoints -------------------------------------------------------------
+
+    @staticmethod
+    def in_window(tweets, params):
+        """Keep tweets created in [start_time, end_time)."""
+        start = params.get('start_time', [None])[0]
+        end = params.get('end_time', [None])[0]
+        if start:
+            tweets = [t for t in tweets if parse_time(t['created_at']) >= parse_time(start)]
+        if end:
+            tweets = [t for t in tweets if parse_time(t['created_at']) < parse_time(end)]
+        return tweets
+
+    def query_filter(self, query):
+        """Predicate for tweets matching a query's terms and operators."""
+        words = query.split()
+        terms = [w.lower().strip('"') for w in words if ':' not in w and not w.startswith('-')]
+        operators = dict(w.split(':', 1) for w in words if ':' in w and not w.startswith('-'))
+        return lambda t: (all(term in t['text'].lower() for term in terms)
+                          and self.matches_operators(t, operators))
+
+    def search(self, params):
+        """Tweets matching the query, newest first."""
+        matches = self.query_filter(params.get('query', [''])[0])
+        return self.in_window([t for t in self.newest_first if matches(t)], params)
+
+    def stream_rules(self):
+        with self.lock:
+            rules = list(self.rules.values())
+        body = {'meta': {'sent': format_time(time.time()), 'result_count': len(rules)}}
+        if rules:
+            body['data'] = rules
+        return body
+
+    def change_rules(self, payload):
+        """Return (status, body) for a rules POST: {"add": [...]} or {"delete": {"ids": [...]}}."""
+        meta = {'sent': format_time(time.time())}
+        with self.lock:
+            if 'add' in payload:
+                created, errors = [], []
+                for rule in payload['add']:
+                    value = rule.get('value', '')
+                    existing = next((r for r in self.rules.values() if r['value'] == value), None)
+                    if not value or existing:
+                        errors.append({'value': value, 'title': 'DuplicateRule' if existing else 'InvalidRule',
+                                       **({'id': existing['id']} if existing else {})})
+                        continue
+                    self.next_rule_id += 1
+                    new = {'id': str(self.next_rule_id), 'value': value}
+                    if rule.get('tag'):
+                        new['tag'] = rule['tag']
+                    self.rules[new['id']] = new
+                    created.append(new)
+                meta['summary'] = {'created': len(created), 'not_created': len(errors),
+                                   'valid': len(created), 'invalid': len(errors)}
+                body = {'meta': meta}
+                if created:
+                    body['data'] = created
+                if errors:
+                    body['errors'] = errors
+                return 200, body
+            if 'delete' in payload:
+                ids = payload['delete'].get('ids', [])
+                deleted = [i for i in ids if self.rules.pop(i, None)]
+                meta['summary'] = {'deleted': len(deleted), 'not_deleted': len(ids) - len(deleted)}
+                return 200, {'meta': meta}
+        return 400, {'title': 'Invalid Request', 'detail': 'Expected "add" or "delete"', 'status': 400}
+
+    def stream_message(self, params):
+        """The next made-up tweet that matches a rule, as a stream line's JSON, or None."""
+        with self.lock:
+            rules = [(r, self.query_filter(r['value'])) for r in self.rules.values()]
+            authors = sorted(self.users)
+            for _ in range(len(SYNTHETIC_TEXTS)):  # Skip texts no rule matches
+                self.stream_seq += 1
+                n = self.stream_seq
+                tweet_id = str(self.stream_base_id + n)
+                tweet = {
+                    "id": tweet_id,
+                    "text": f"{SYNTHETIC_TEXTS[n % len(SYNTHETIC_TEXTS)]} (live {n})",
+                    "author_id": authors[n % len(authors)],
+                    "created_at": format_time(time.time()),
+                    "conversation_id": tweet_id,
+                    "public_metrics": {"retweet_count": 0, "reply_count": 0, "like_count": 0,
+                                       "quote_count": 0, "bookmark_count": 0, "impression_count": 0},
+                    "edit_history_tweet_ids": [tweet_id],
+                }
+                matching = [{'id': r['id'], 'tag': r.get('tag', '')} for r, matches in rules if matches(tweet)]
+                if matching:
+                    body = self.tweet_response([tweet], params, single=True)
+                    body['matching_rules'] = matching
+                    return body
+        return None
+
+    def counts(self, params):
+        """Per-bucket match counts between start_time (default: 7 days ago) and end_time."""
+        now = time.time()
+        step = GRANULARITY.get(params.get('granularity', ['hour'])[0], 3600)
+        start = parse_time(params['start_time'][0]) if 'start_time' in params else now - 7 * 86400
+        end = parse_time(params['end_time'][0]) if 'end_time' in params else now - 30
+        times = sorted(parse_time(t['created_at']) for t in self.search(params))
+        buckets = []
+        while start < end:
+            bucket_end = min(end, (start // step + 1) * step)
+            count = bisect.bisect_left(times, bucket_end) - bisect.bisect_left(times, start)
+            buckets.append({'end': format_time(bucket_end), 'start': format_time(start), 'tweet_count': count})
+            start = bucket_end
+        return {'data': buckets, 'meta': {'total_tweet_count': sum(b['tweet_count'] for b in buckets)}}
+
+    def matches_operators(self, tweet, operators):
+        """Apply the conversation_id: and from: search operators."""
+        if 'conversation_id' in operators and tweet.get('conversation_id') != operators['conversation_id']:
+            return False
+        if 'from' in operators:
+            author = self.users.get(tweet.get('author_id'), {})
+            if author.get('username', '').lower() != operators['from'].lstrip('@').lower():
+                return False
+        return True
+
+    def route(self, path, params):
+        """Return (status, body) for a GET request."""
+        m = re.fullmatch(r'/2/tweets/(\d+)', path)
+        if m:
+            tweet = self.tweets.get(m.group(1))
+            if tweet is None:
+                return 200, {'errors': [not_found('tweet', 'id', m.group(1))]}
+            return 200, self.tweet_response([tweet], params, single=True)
+
+        if path == '/2/tweets':
+            ids = params.get('ids', [''])[0].split(',')
+            found = [self.tweets[i] for i in ids if i in self.tweets]
+            errors = [not_found('tweet', 'ids', i) for i in ids if i not in self.tweets]
+            return 200, self.tweet_response(found, params, errors=errors)
+
+        if path == '/2/tweets/search/recent':
+            return 200, self.page(self.search(params), params, 'next_token')
+
+        if path == '/2/tweets/counts/recent':
+            return 200, self.counts(params)
+
+        if path == '/2/tweets/search/stream/rules':
+            return 200, self.stream_rules()
+
+        m = re.fullmatch(r'/2/users/by/username/(\w+)', path)
+        if m:
+            user = self.by_username.get(m.group(1).lower())
+            if user is None:
+                return 200, {'errors': [not_found('user', 'username', m.group(1))]}
+            return 200, {'data': self.project_user(user, params)}
+
+        if path == '/2/users/by':
+            names = params.get('usernames', [''])[0].split(',')
+            found = [self.by_username[n.lower()] for n in names if n.lower() in self.by_username]
+            body = {'data': [self.project_user(u, params) for u in found]} if found else {}
+            errors = [not_found('user', 'usernames', n) for n in names if n.lower() not in self.by_username]
+            if errors:
+                body['errors'] = errors
+            return 200, body
+
+        if path == '/2/users/me':
+            return 200, {'data': self.project_user(self.users[self.me], params)}
+
+        m = re.fullmatch(r'/2/users/(\d+)/tweets', path)
+        if m:
+            tweets = [t for t in self.newest_first if t.get('author_id') == m.group(1)]
+            return 200, self.page(tweets, params, 'pagination_token')
+
+        m = re.fullmatch(r'/2/users/(\d+)/bookmarks', path)
+        if m:
+            tweets = [self.tweets[i] for i in self.bookmarks if i in self.tweets]
+            return 200, self.page(tweets, params, 'pagination_token')
+
+        return 404, {'title': 'Not Found', 'detail': f'No fake route for {path}', 'status': 404}
+
+
+def not_found(kind, parameter, value):
+    return {
+        'value': value,
+        'detail': f'Could not find {kind} with {parameter}: [{value}].',
+        'title': 'Not Found Error',
+        'resource_type': kind,
+        'parameter': parameter,
+        'resource_id': value,
+        'type': 'https://api.twitter.com/2/problems/resource-not-found',
+    }
+
+
+class FakeServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, api, latency_s=0.0, jitter_s=0.0, rate_limit=450,
+                 window=900, fail_rate=0.0, token_ttl=7200, stream_interval_s=1.0,
+                 keepalive_s=20.0, stream_drop=0):
+        super().__init__(address, FakeHandler)
+        self.api = api
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.rate_limit = rate_limit
+        self.window = window
+        self.fail_rate = fail_rate
+        self.token_ttl = token_ttl
+        self.stream_interval_s = stream_interval_s
+        self.keepalive_s = keepalive_s
+        self.stream_drop = stream_drop
+        self.windows = {}
+        self.issued = {}  # Access token -> expiry
+        self.spent_refresh_tokens = set()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'connections': 0, 'rate_limited': 0, 'token_refreshes': 0}
+
+    def take_quota(self, key):
+        """Count a request against key's window; returns (limit, remaining, reset)."""
+        now = time.time()
+        with self.lock:
+            reset, used = self.windows.get(key, (now + self.window, 0))
+            if reset <= now:
+                reset, used = now + self.window, 0
+            used += 1
+            self.windows[key] = (reset, used)
+        return self.rate_limit, self.rate_limit - used, int(reset)
+
+    def token_expired(self, token):
+        with self.lock:
+            expires = self.issued.get(token)
+        return token.startswith('expired') or (expires is not None and expires <= time.time())
+
+    def refresh_grant(self, params):
+        """Return (status, body) for a refresh_token grant; each refresh token works once."""
+        refresh_token = params.get('refresh_token', [''])[0]
+        if params.get('grant_type', [''])[0] != 'refresh_token' or not refresh_token:
+            return 400, {'error': 'invalid_request', 'error_description': 'Missing required parameter.'}
+        with self.lock:
+            if refresh_token in self.spent_refresh_tokens:
+                return 400, {'error': 'invalid_request',
+                             'error_description': 'Value passed for the token was invalid.'}
+            self.spent_refresh_tokens.add(refresh_token)
+            self.stats['token_refreshes'] += 1
+            n = self.stats['token_refreshes']
+            access_token = f'user-{n}-{random.getrandbits(32):08x}'
+            self.issued[access_token] = time.time() + self.token_ttl
+        return 200, {'token_type': 'bearer', 'expires_in': self.token_ttl, 'access_token': access_token,
+                     'scope': 'tweet.read users.read bookmark.read offline.access',
+                     'refresh_token': f'refresh-{n}-{random.getrandbits(32):08x}'}
+
+
+class FakeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def do_GET(self):
+        server = self.server
+        parts = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(parts.query)
+        with server.lock:
+            server.stats['requests'] += 1
+
+        delay = server.latency_s + random.uniform(0, server.jitter_s)
+        if delay:
+            time.sleep(delay)
+
+        template = re.sub(r'(?<=.)/\d+(?=/|$)', '/:id', parts.path)
+        template = re.sub(r'(?<=/by/username)/[^/]+', '/:username', template)
+        key = f"{self.headers.get('Authorization', '')} {template}"
+        limit, remaining, reset = server.take_quota(key)
+        headers = {
+            'x-rate-limit-limit': str(limit),
+            'x-rate-limit-remaining': str(max(0, remaining)),
+            'x-rate-limit-reset': str(reset),
+        }
+        if remaining < 0 or random.random() < server.fail_rate:
+            with server.lock:
+                server.stats['rate_limited'] += 1
+            self.respond(429, {'title': 'Too Many Requests', 'detail': 'Too Many Requests',
+                               'type': 'about:blank', 'status': 429}, headers)
+            return
+
+        auth = self.headers.get('Authorization', '')
+        if not auth.startswith('Bearer ') or server.token_expired(auth[len('Bearer '):]):
+            self.respond(401, {'title': 'Unauthorized', 'status': 401, 'detail': 'Unauthorized'}, headers)
+            return
+
+        if parts.path == '/2/tweets/search/stream':
+            self.stream(params, headers)
+            return
+        status, body = server.api.route(parts.path, params)
+        self.respond(status, body, headers)
+
+    def stream(self, params, headers):
+        """Serve the filtered stream as chunked NDJSON until the client goes away."""
+        server = self.server
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        def chunk(data):
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+        sent = 0
+        next_tweet = time.monotonic() + server.stream_interval_s
+        next_keepalive = time.monotonic() + server.keepalive_s
+        self.close_connection = True
+        try:
+            while True:
+                time.sleep(max(0.0, min(next_tweet, next_keepalive) - time.monotonic()))
+                now = time.monotonic()
+                if now >= next_keepalive:
+                    chunk(b'\r\n')
+                    next_keepalive = now + server.keepalive_s
+                if now >= next_tweet:
+                    next_tweet = now + server.stream_interval_s
+                    message = server.api.stream_message(params)
+                    if message:
+                        chunk(json.dumps(message).encode() + b'\r\n')
+                        sent += 1
+                        if server.stream_drop and sent >= server.stream_drop:
+                            return  # Cut off without the final chunk, like a dropped connection
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length).decode()
+        path = urllib.parse.urlsplit(self.path).path
+        with server.lock:
+            server.stats['requests'] += 1
+        if server.latency_s:
+            time.sleep(server.latency_s)
+        if path == '/2/tweets/search/stream/rules':
+            if not self.headers.get('Authorization', '').startswith('Bearer '):
+                self.respond(401, {'title': 'Unauthorized', 'status': 401, 'detail': 'Unauthorized'}, {})
+                return
+            try:
+                payload = json.loads(raw)
+            except ValueError:
+                self.respond(400, {'title': 'Invalid Request', 'detail': 'Body is not JSON', 'status': 400}, {})
+                return
+            status, body = server.api.change_rules(payload)
+            self.respond(status, body, {})
+            return
+        if path != '/2/oauth2/token':
+            self.respond(404, {'title': 'Not Found', 'detail': f'No fake route for {self.path}',
+                               'status': 404}, {})
+            return
+        status, body = server.refresh_grant(urllib.parse.parse_qs(raw))
+        self.respond(status, body, {})
+
+    def respond(self, status, body, headers):
+        data = json.dumps(body).encode()
+        gzipped = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if gzipped:
+            data = gzip.compress(data)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(args):
+    opts = {'port': '0', 'fixtures': DEFAULT_FIXTURES, 'synthetic': '0', 'latency_ms': '0',
+            'jitter_ms': '0', 'rate_limit': '450', 'window': '900', 'fail_rate': '0',
+            'token_ttl': '7200', 'stream_interval_ms': '1000', 'keepalive_ms': '20000', 'stream_drop': '0'}
+    for a in args:
+        key, _, value = a.lstrip('-').partition('=')
+        if key in opts:
+            opts[key] = value
+
+    api = FakeTwitter(load_fixtures(opts['fixtures'], int(opts['synthetic'])))
+    server = FakeServer(
+        ('127.0.0.1', int(opts['port'])), api,
+        latency_s=float(opts['latency_ms']) / 1000,
+        jitter_s=float(opts['jitter_ms']) / 1000,
+        rate_limit=int(opts['rate_limit']),
+        window=int(opts['window']),
+        fail_rate=float(opts['fail_rate']),
+        token_ttl=int(opts['token_ttl']),
+        stream_interval_s=float(opts['stream_interval_ms']) / 1000,
+        keepalive_s=float(opts['keepalive_ms']) / 1000,
+        stream_drop=int(opts['stream_drop']),
+    )
+    print(json.dumps({"port": server.server_port}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark the keep-alive pool in twitter_http.py against per-call urllib.
+
+Usage:
+  twitter-http-bench.py [--requests=50] [--handshake_ms=40] [--latency_ms=5]
+
+Starts a local HTTP/1.1 stand-in server that sleeps `handshake_ms` once per new
+connection (standing in for the TCP+TLS handshake to api.twitter.com) and
+`latency_ms` per request, and serves a tweet-sized JSON payload (gzipped when
+the client asks for it). Then issues the same sequential GETs with
+urllib.request.urlopen, as api_get() used to, and through ConnectionPool, and
+prints wall time, connections accepted by the server and bytes transferred.
+"""
+
+import sys
+import os
+import gzip
+import json
+import threading
+import time
+import http.server
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import twitter_http  # noqa: E402
+
+PAYLOAD = json.dumps({
+    "data": [{
+        "id": str(1800000000000000000 + i),
+        "text": "Probe makes code search for AI agents fast and precise. " * 3,
+        "author_id": "12345",
+        "created_at": "2026-01-01T00:00:00.000Z",
+        "public_metrics": {"like_count": i, "retweet_count": 0, "reply_count": 0,
+                           "impression_count": 100 * i, "bookmark_count": 0},
+    } for i in range(20)],
+    "includes": {"users": [{"id": "12345", "name": "ProbeLabs", "username": "probelabs"}]},
+}).encode()
+PAYLOAD_GZ = gzip.compress(PAYLOAD)
+
+
+class StandInServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handshake_s, latency_s):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.handshake_s = handshake_s
+        self.latency_s = latency_s
+        self.connections = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        time.sleep(self.server.handshake_s)
+
+    def do_GET(self):
+        time.sleep(self.server.latency_s)
+        gzipped = 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        body = PAYLOAD_GZ if gzipped else PAYLOAD
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_urllib(url, n):
+    for _ in range(n):
+        with urllib.request.urlopen(url) as resp:
+            json.loads(resp.read().decode())
+
+
+def run_pool(url, n):
+    pool = twitter_http.ConnectionPool()
+    for _ in range(n):
+        json.loads(pool.request('GET', url).body.decode())
+    pool.close()
+
+
+def measure(server, label, fn, url, n):
+    server.connections = 0
+    server.bytes_sent = 0
+    start = time.perf_counter()
+    fn(url, n)
+    elapsed = time.perf_counter() - start
+    return {
+        "client": label,
+        "requests": n,
+        "total_ms": round(elapsed * 1000, 1),
+        "per_request_ms": round(elapsed * 1000 / n, 2),
+        "connections": server.connections,
+        "bytes_received": server.bytes_sent,
+    }
+
+
+def main(args):
+    opts = {'requests': 50, 'handshake_ms': 40, 'latency_ms': 5}
+    for a in args:
+        key, _, value = a.lstrip('-').partition('=')
+        if key in opts:
+            opts[key] = int(value)
+
+    server = StandInServer(opts['handshake_ms'] / 1000, opts['latency_ms'] / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/2/tweets/search/recent'
+
+    results = [
+        measure(server, 'urllib (per-call connection)', run_urllib, url, opts['requests']),
+        measure(server, 'twitter_http.ConnectionPool', run_pool, url, opts['requests']),
+    ]
+    server.shutdown()
+
+    base, pooled = results
+    print(json.dumps({
+        "settings": opts,
+        "results": results,
+        "speedup": round(base['total_ms'] / pooled['total_ms'], 2),
+        "handshakes_saved": base['connections'] - pooled['connections'],
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
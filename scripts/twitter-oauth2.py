@@ -6,20 +6,20 @@ Usage:
   twitter-oauth2.py          # Start full flow (opens browser, runs callback server)
   twitter-oauth2.py refresh   # Refresh an expired token using TWITTER_OAUTH2_REFRESH_TOKEN
 
-Generates a user access token with scopes: tweet.read, users.read, bookmark.read
+Generates a user access token with scopes: tweet.read, users.read, bookmark.read,
+and stores it in .env with its refresh token and expiry
+(TWITTER_OAUTH2_EXPIRES_AT). twitter-api.py refreshes it from there on its
+own (see twitter_credentials.py), so `refresh` is only needed to force one.
 """
 
 import sys
 import os
 import json
-import secrets
-import hashlib
 import base64
+import time
 import urllib.parse
-import urllib.request
-import webbrowser
-import http.server
-import threading
+
+import twitter_credentials
 
 
 def load_env():
@@ -44,85 +44,37 @@ def load_env():
             return
 
 
+def token_request(data, client_id, client_secret, label):
+    """POST a form to the token endpoint and return the parsed JSON response."""
+    status, body = twitter_credentials.token_request(data, client_id, client_secret)
+    if status >= 400:
+        print(f"{label} failed ({status}): {json.dumps(body)}", file=sys.stderr)
+        sys.exit(1)
+    return body
+
+
 def exchange_code(code, code_verifier, client_id, client_secret, redirect_uri):
     """Exchange authorization code for access token."""
-    url = 'https://api.twitter.com/2/oauth2/token'
-    data = urllib.parse.urlencode({
+    return token_request({
         'code': code,
         'grant_type': 'authorization_code',
         'client_id': client_id,
         'redirect_uri': redirect_uri,
         'code_verifier': code_verifier,
-    }).encode()
-
-    # Use Basic auth with client_id:client_secret
-    credentials = base64.b64encode(f'{client_id}:{client_secret}'.encode()).decode()
-    req = urllib.request.Request(url, data=data, headers={
-        'Authorization': f'Basic {credentials}',
-        'Content-Type': 'application/x-www-form-urlencoded',
-    })
-
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        print(f"Token exchange failed ({e.code}): {body}", file=sys.stderr)
-        sys.exit(1)
-
-
-def refresh_token(refresh_tok, client_id, client_secret):
-    """Refresh an expired access token."""
-    url = 'https://api.twitter.com/2/oauth2/token'
-    data = urllib.parse.urlencode({
-        'refresh_token': refresh_tok,
-        'grant_type': 'refresh_token',
-        'client_id': client_id,
-    }).encode()
-
-    credentials = base64.b64encode(f'{client_id}:{client_secret}'.encode()).decode()
-    req = urllib.request.Request(url, data=data, headers={
-        'Authorization': f'Basic {credentials}',
-        'Content-Type': 'application/x-www-form-urlencoded',
-    })
-
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return json.loads(resp.read().decode())
-    except urllib.error.HTTPError as e:
-        body = e.read().decode()
-        print(f"Token refresh failed ({e.code}): {body}", file=sys.stderr)
-        sys.exit(1)
-
-
-def update_env_file(key, value):
-    """Add or update a key in the .env file."""
-    env_path = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.env'))
-    if not os.path.isfile(env_path):
-        env_path = os.path.join(os.getcwd(), '.env')
-
-    lines = []
-    found = False
-    if os.path.isfile(env_path):
-        with open(env_path) as f:
-            for line in f:
-                if line.strip().startswith(f'{key}=') or line.strip().startswith(f'export {key}='):
-                    lines.append(f'{key}={value}\n')
-                    found = True
-                else:
-                    lines.append(line)
+    }, client_id, client_secret, 'Token exchange')
 
-    if not found:
-        lines.append(f'{key}={value}\n')
 
-    with open(env_path, 'w') as f:
-        f.writelines(lines)
+def save_tokens(token_data):
+    """Write the token, refresh token and expiry to .env in one atomic update."""
+    updates = twitter_credentials.token_updates(token_data)
+    twitter_credentials.update_env_file(updates)
+    for key in updates:
+        print(f"  Saved {key} to .env")
 
 
 def get_oauth2_client_creds():
     """Get OAuth 2.0 client credentials, preferring TWITTER_CLIENT_ID/SECRET."""
-    client_id = os.environ.get('TWITTER_CLIENT_ID', '') or os.environ.get('TWITTER_CONSUMER_KEY', '')
-    client_secret = os.environ.get('TWITTER_CLIENT_SECRET', '') or os.environ.get('TWITTER_SECRET_KEY', '')
+    client_id, client_secret = twitter_credentials.client_credentials()
     if not client_id or not client_secret:
         print("Error: TWITTER_CLIENT_ID and TWITTER_CLIENT_SECRET must be set in .env")
         sys.exit(1)
@@ -131,6 +83,13 @@ def get_oauth2_client_creds():
 
 def full_flow():
     """Run the full OAuth 2.0 PKCE flow with a local callback server."""
+    # Only the interactive flow needs these; `refresh` skips importing them.
+    import hashlib
+    import http.server
+    import secrets
+    import threading
+    import webbrowser
+
     client_id, client_secret = get_oauth2_client_creds()
 
     redirect_uri = 'http://localhost:3000/callback'
@@ -206,7 +165,6 @@ def full_flow():
     print("Got authorization code, exchanging for token...")
     token_data = exchange_code(auth_code[0], code_verifier, client_id, client_secret, redirect_uri)
 
-    access_token = token_data.get('access_token', '')
     refresh_tok = token_data.get('refresh_token', '')
     expires_in = token_data.get('expires_in', 0)
     scope = token_data.get('scope', '')
@@ -216,37 +174,26 @@ def full_flow():
     print(f"  Expires in: {expires_in}s ({expires_in // 3600}h)")
 
     # Save to .env
-    update_env_file('TWITTER_OAUTH2_USER_TOKEN', access_token)
-    print(f"  Saved TWITTER_OAUTH2_USER_TOKEN to .env")
+    with twitter_credentials.refresh_lock():
+        save_tokens(token_data)
 
     if refresh_tok:
-        update_env_file('TWITTER_OAUTH2_REFRESH_TOKEN', refresh_tok)
-        print(f"  Saved TWITTER_OAUTH2_REFRESH_TOKEN to .env")
-        print(f"\n  When token expires, run: python3 scripts/twitter-oauth2.py refresh")
+        print("\n  The token is refreshed automatically before it expires;"
+              " to force it, run: python3 scripts/twitter-oauth2.py refresh")
 
 
 def do_refresh():
-    """Refresh an expired token."""
-    client_id, client_secret = get_oauth2_client_creds()
-    refresh_tok = os.environ.get('TWITTER_OAUTH2_REFRESH_TOKEN', '')
-
-    if not refresh_tok:
-        print("Error: TWITTER_OAUTH2_REFRESH_TOKEN not set. Run full flow first.")
-        sys.exit(1)
-
+    """Refresh the token now, under the same lock twitter-api.py refreshes with."""
     print("Refreshing token...")
-    token_data = refresh_token(refresh_tok, client_id, client_secret)
-
-    access_token = token_data.get('access_token', '')
-    new_refresh = token_data.get('refresh_token', '')
-    expires_in = token_data.get('expires_in', 0)
-
-    update_env_file('TWITTER_OAUTH2_USER_TOKEN', access_token)
-    print(f"  Saved new TWITTER_OAUTH2_USER_TOKEN (expires in {expires_in // 3600}h)")
-
-    if new_refresh:
-        update_env_file('TWITTER_OAUTH2_REFRESH_TOKEN', new_refresh)
-        print(f"  Saved new TWITTER_OAUTH2_REFRESH_TOKEN")
+    _, error = twitter_credentials.refresh()
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    expires_at = os.environ.get(twitter_credentials.EXPIRES_KEY)
+    if expires_at:
+        print(f"  Saved new {twitter_credentials.TOKEN_KEY} (expires in {(int(expires_at) - int(time.time())) // 3600}h)")
+    else:
+        print(f"  Saved new {twitter_credentials.TOKEN_KEY}")
 
 
 if __name__ == '__main__':
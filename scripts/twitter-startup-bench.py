@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for the Twitter helper scripts.
+
+Usage:
+  twitter-startup-bench.py [--runs=5] [--budget_ms=80] [--top=8]
+
+Every tool call is a fresh interpreter, so module imports are paid on each
+one. For a few cheap invocations this runs `python3 -X importtime <script>`
+`runs` times and reports, per case, the median import time of the modules
+the script adds on top of a bare interpreter, the slowest of those modules,
+and the wall time of the whole process. It exits 1 when a case goes over
+`budget_ms`, or imports a module that only another code path needs (the
+OAuth 1.0a signer, the daemon, tracing, the browser flow), so a new eager
+import shows up as a failure rather than as slowly creeping latency.
+-X importtime itself adds overhead, so the budget is not a wall-clock figure;
+it is sized for the full request path (read_tweet) with some headroom.
+
+This is a manual check: `visor test` runs the workflow tests with mocked
+steps and never starts these scripts, so run it after changing them.
+"""
+
+import sys
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+
+SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+API_LAZY = ['hmac', 'uuid', 'socketserver', 'twitter_daemon', 'twitter_trace', 'twitter_archive',
+            'twitter_credentials', 'twitter_pool', 'twitter_digest', 'twitter_slices', 'twitter_stream',
+            'twitter_counts', 'cProfile']
+
+# (name, argv, modules that must stay lazy for this invocation). read_tweet
+# runs the whole request path against a closed local port.
+CASES = [
+    ('api-usage', ['twitter-api.py'], API_LAZY),
+    ('api-cache_stats', ['twitter-api.py', 'cache_stats'], API_LAZY),
+    ('api-read_tweet', ['twitter-api.py', 'read_tweet', '20', '--fresh'], API_LAZY),
+    ('oauth2-refresh', ['twitter-oauth2.py', 'refresh'],
+     ['webbrowser', 'http.server', 'secrets']),
+]
+
+
+def import_times(argv, env, cwd=None):
+    """Run argv under -X importtime; return ({module: self_us}, wall_ms)."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + argv, env=env, cwd=cwd,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = (time.perf_counter() - started) * 1000
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(self_us)
+    return modules, wall
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(args):
+    opts = {'runs': '5', 'budget_ms': '80', 'top': '8'}
+    for a in args:
+        key, _, value = a.lstrip('-').partition('=')
+        if key in opts:
+            opts[key] = value
+    runs = int(opts['runs'])
+    budget = float(opts['budget_ms'])
+
+    workdir = tempfile.mkdtemp(prefix='twitter-startup-')
+    # No credentials from the environment and a throwaway cache directory
+    env = {k: v for k, v in os.environ.items() if not k.startswith('TWITTER_')}
+    env['TWITTER_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    env['TWITTER_API_BASE_URL'] = 'http://127.0.0.1:9'
+    env['TWITTER_BEARER_TOKEN'] = 'startup-bench'
+    results = []
+    failed = False
+    try:
+        baseline = set(import_times(['-c', 'pass'], env)[0])
+        for name, argv, lazy in CASES:
+            argv = [os.path.join(SCRIPTS, argv[0])] + argv[1:]
+            totals, walls, per_module = [], [], {}
+            eager = set()
+            for _ in range(runs):
+                modules, wall = import_times(argv, env, cwd=workdir)
+                added = {m: us for m, us in modules.items() if m not in baseline}
+                totals.append(sum(added.values()) / 1000)
+                walls.append(wall)
+                for m, us in added.items():
+                    per_module.setdefault(m, []).append(us)
+                eager.update(m for m in lazy if m in modules)
+            imports_ms = median(totals)
+            slowest = sorted(((median(v), m) for m, v in per_module.items()), reverse=True)
+            ok = imports_ms <= budget and not eager
+            failed = failed or not ok
+            results.append({
+                "case": name,
+                "ok": ok,
+                "imports_ms": round(imports_ms, 1),
+                "budget_ms": budget,
+                "wall_ms": round(median(walls), 1),
+                "modules": len(per_module),
+                "slowest": {m: round(us / 1000, 2) for us, m in slowest[:int(opts['top'])]},
+                "unexpected_imports": sorted(eager),
+            })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({"runs": runs, "results": results}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
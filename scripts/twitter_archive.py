@@ -0,0 +1,177 @@
+"""
+Opt-in local archive of every tweet twitter-api.py prints (TWITTER_ARCHIVE=1).
+
+Formatted tweets and their authors are upserted into archive.sqlite3 in the
+cache directory, with an FTS5 index over the text and author, so
+`local_search` can answer questions about anything seen before (including
+tweets older than recent search's 7-day window) without an API call. Fields
+a projected or partial response did not include keep their archived values.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+
+import twitter_cache
+
+SORTS = {
+    'recent': 'tweets.created_at DESC',
+    'likes': 'tweets.likes DESC',
+    'impressions': 'tweets.impressions DESC',
+    'relevance': 'bm25(tweets_fts)',
+}
+METRIC_COLUMNS = ('likes', 'retweets', 'replies', 'impressions', 'bookmarks')
+
+
+def fts_query(text):
+    """Quote each word so user input is matched literally (all words must match)."""
+    words = text.split()
+    return ' '.join('"' + w.replace('"', '""') + '"' for w in words)
+
+
+class TweetArchive:
+    """SQLite table of formatted tweets plus an external-content FTS5 index."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = twitter_cache.open_db(
+            path,
+            'CREATE TABLE IF NOT EXISTS tweets ('
+            ' id INTEGER PRIMARY KEY, username TEXT, name TEXT, text TEXT NOT NULL,'
+            ' created_at TEXT, likes INTEGER, retweets INTEGER, replies INTEGER,'
+            ' impressions INTEGER, bookmarks INTEGER, links TEXT, archived_at REAL NOT NULL)',
+            'CREATE INDEX IF NOT EXISTS tweets_created ON tweets (created_at)',
+            'CREATE INDEX IF NOT EXISTS tweets_username ON tweets (username COLLATE NOCASE)',
+            "CREATE VIRTUAL TABLE IF NOT EXISTS tweets_fts USING fts5("
+            " text, username, name, content='tweets', content_rowid='id')",
+            'CREATE TRIGGER IF NOT EXISTS tweets_ai AFTER INSERT ON tweets BEGIN'
+            ' INSERT INTO tweets_fts (rowid, text, username, name)'
+            ' VALUES (new.id, new.text, new.username, new.name); END',
+            'CREATE TRIGGER IF NOT EXISTS tweets_au AFTER UPDATE ON tweets BEGIN'
+            " INSERT INTO tweets_fts (tweets_fts, rowid, text, username, name)"
+            " VALUES ('delete', old.id, old.text, old.username, old.name);"
+            ' INSERT INTO tweets_fts (rowid, text, username, name)'
+            ' VALUES (new.id, new.text, new.username, new.name); END',
+        )
+
+    @property
+    def enabled(self):
+        return self._db is not None
+
+    def upsert(self, entries):
+        """Store (formatted_tweet, author_user) pairs in one transaction."""
+        if self._db is None or not entries:
+            return
+        now = time.time()
+        rows = []
+        for tweet, author in entries:
+            metrics = tweet.get('metrics') or {}
+            rows.append((
+                int(tweet['id']), (author or {}).get('username'), (author or {}).get('name'),
+                tweet['text'], tweet.get('created_at') or None,
+                *[metrics.get(c) for c in METRIC_COLUMNS],
+                json.dumps(tweet['links'], ensure_ascii=False) if 'links' in tweet else None,
+                now,
+            ))
+        with self._lock:
+            try:
+                self._db.executemany(
+                    'INSERT INTO tweets (id, username, name, text, created_at, likes, retweets,'
+                    ' replies, impressions, bookmarks, links, archived_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+                    ' ON CONFLICT(id) DO UPDATE SET'
+                    ' username = COALESCE(excluded.username, username),'
+                    ' name = COALESCE(excluded.name, name),'
+                    ' text = excluded.text,'
+                    ' created_at = COALESCE(excluded.created_at, created_at),'
+                    + ''.join(f' {c} = COALESCE(excluded.{c}, {c}),' for c in METRIC_COLUMNS)
+                    + ' links = COALESCE(excluded.links, links),'
+                    ' archived_at = excluded.archived_at',
+                    rows,
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+
+    def search(self, query='', author=None, since=None, until=None, min_metrics=None,
+               sort='recent', limit=20):
+        """Return archived tweets, newest first unless sort says otherwise.
+
+        since/until compare against the ISO created_at prefix, so dates
+        (2026-10-01) and full timestamps both work. min_metrics maps metric
+        column names to lower bounds. Raises ValueError for a query SQLite
+        rejects.
+        """
+        clauses, params = [], []
+        if query:
+            clauses.append('tweets_fts MATCH ?')
+            params.append(fts_query(query))
+        if author:
+            clauses.append('tweets.username = ? COLLATE NOCASE')
+            params.append(author.lstrip('@'))
+        if since:
+            clauses.append('tweets.created_at >= ?')
+            params.append(since)
+        if until:
+            clauses.append('tweets.created_at < ?')
+            params.append(until)
+        for column, minimum in (min_metrics or {}).items():
+            clauses.append(f'tweets.{column} >= ?')
+            params.append(minimum)
+        if sort == 'relevance' and not query:
+            sort = 'recent'
+        source = 'tweets JOIN tweets_fts ON tweets_fts.rowid = tweets.id' if query else 'tweets'
+        sql = (
+            f'SELECT tweets.id, tweets.username, tweets.name, tweets.text, tweets.created_at,'
+            f' {", ".join("tweets." + c for c in METRIC_COLUMNS)}, tweets.links FROM {source}'
+            + (f' WHERE {" AND ".join(clauses)}' if clauses else '')
+            + f' ORDER BY {SORTS[sort]} LIMIT ?'
+        )
+        with self._lock:
+            try:
+                rows = self._db.execute(sql, params + [limit]).fetchall()
+            except sqlite3.Error as e:
+                raise ValueError(str(e)) from None
+        return [self._row_to_tweet(row) for row in rows]
+
+    @staticmethod
+    def _row_to_tweet(row):
+        tweet_id, username, name, text, created_at = row[:5]
+        metrics = row[5:5 + len(METRIC_COLUMNS)]
+        links = row[-1]
+        tweet = {
+            'id': str(tweet_id),
+            'author': f"@{username or '?'} ({name or '?'})",
+            'text': text,
+            'created_at': created_at or '',
+        }
+        if any(m is not None for m in metrics):
+            tweet['metrics'] = {c: m or 0 for c, m in zip(METRIC_COLUMNS, metrics)}
+        if links:
+            tweet['links'] = json.loads(links)
+        return tweet
+
+    def stats(self):
+        if self._db is None:
+            return {"enabled": False}
+        with self._lock:
+            entries, oldest, newest = self._db.execute(
+                'SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM tweets').fetchone()
+        return {"enabled": True, "path": self.path, "entries": entries,
+                "oldest": oldest, "newest": newest}
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Return the process-wide archive in the cache directory."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = TweetArchive(os.path.join(twitter_cache.cache_dir(), 'archive.sqlite3'))
+        return _archive
@@ -0,0 +1,467 @@
+"""
+Persistent caches for the Twitter helper scripts.
+
+Entries live in a SQLite database under the cache directory
+($TWITTER_CACHE_DIR, else $XDG_CACHE_HOME/probelabs-assistant/twitter, else
+~/.cache/probelabs-assistant/twitter) so they survive across the short-lived
+processes the workflow spawns. A cache that cannot be opened degrades to
+"always miss" rather than failing the command.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_USER_TTL = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 3600
+DEFAULT_TWEET_TTL = 30 * 24 * 3600
+DEFAULT_METRICS_TTL = 300
+DEFAULT_TWEET_CACHE_MAX = 5000
+DEFAULT_BOOKMARK_SYNC_TTL = 900
+# Recent search rejects since_id values older than its 7-day window.
+WATERMARK_TTL = 6 * 24 * 3600
+# Past that window a cached reply graph can no longer be extended by search.
+THREAD_TTL = 7 * 24 * 3600
+# Count buckets older than the recent-search window are never asked for again.
+COUNTS_TTL = 7 * 24 * 3600
+
+
+def cache_dir():
+    """Return the cache directory, honouring TWITTER_CACHE_DIR and XDG."""
+    if os.environ.get('TWITTER_CACHE_DIR'):
+        return os.environ['TWITTER_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'probelabs-assistant', 'twitter')
+
+
+def env_seconds(name, default):
+    """Read a TTL in seconds from the environment."""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def open_db(path, *schema):
+    """Open a SQLite database shared between threads and processes.
+
+    Returns None if the file cannot be created, which callers treat as a
+    disabled cache.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        for statement in schema:
+            db.execute(statement)
+        db.commit()
+        return db
+    except (OSError, sqlite3.Error):
+        return None
+
+
+class TTLCache:
+    """Namespaced key/value store with per-entry expiry.
+
+    A stored value of None is a negative entry: get() reports it as a hit so
+    callers can skip lookups that are known to fail.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = open_db(
+            path,
+            'CREATE TABLE IF NOT EXISTS kv ('
+            ' namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT,'
+            ' expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))',
+        )
+
+    def get(self, namespace, key):
+        """Return (hit, value) for an unexpired entry."""
+        if self._db is None:
+            return False, None
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    'SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?',
+                    (namespace, key),
+                ).fetchone()
+            except sqlite3.Error:
+                return False, None
+        if row is None or row[1] <= time.time():
+            return False, None
+        return True, (json.loads(row[0]) if row[0] is not None else None)
+
+    def set(self, namespace, key, value, ttl):
+        if self._db is None:
+            return
+        encoded = json.dumps(value, ensure_ascii=False) if value is not None else None
+        with self._lock:
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                    (namespace, key, encoded, time.time() + ttl),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def set_many(self, namespace, items, ttl):
+        """Store several (key, value) pairs in one transaction."""
+        if self._db is None:
+            return
+        expires_at = time.time() + ttl
+        rows = [(namespace, key, json.dumps(value, ensure_ascii=False) if value is not None else None,
+                 expires_at) for key, value in items]
+        with self._lock:
+            try:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                    rows,
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def clear(self, namespace, keep_key=None):
+        """Drop every entry in a namespace except keep_key."""
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                self._db.execute(
+                    'DELETE FROM kv WHERE namespace = ? AND key IS NOT ?',
+                    (namespace, keep_key),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+
+class TweetCache:
+    """Size-bounded LRU store of tweets with two staleness tiers.
+
+    Entries are keyed by tweet ID plus a key for the requested fields. The
+    tweet content and author are treated as immutable (`ttl`), while
+    public_metrics go stale after `metrics_ttl` and can be refreshed on their
+    own. Once more than `max_entries` are stored, the least recently read
+    ones are evicted. Hit, stale and miss counts are kept in the database.
+    """
+
+    def __init__(self, path, ttl, metrics_ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.metrics_ttl = metrics_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = open_db(
+            path,
+            'CREATE TABLE IF NOT EXISTS tweets ('
+            ' id TEXT NOT NULL, fields_key TEXT NOT NULL, tweet TEXT NOT NULL,'
+            ' author TEXT, metrics TEXT, stored_at REAL NOT NULL,'
+            ' metrics_at REAL NOT NULL, last_access REAL NOT NULL,'
+            ' PRIMARY KEY (id, fields_key))',
+            'CREATE INDEX IF NOT EXISTS tweets_lru ON tweets (last_access)',
+            'CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+        )
+
+    def get(self, tweet_id, fields_key):
+        """Return {"tweet", "author", "metrics_fresh"} or None if absent or expired."""
+        if self._db is None:
+            return None
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    'SELECT tweet, author, metrics, stored_at, metrics_at FROM tweets'
+                    ' WHERE id = ? AND fields_key = ?',
+                    (tweet_id, fields_key),
+                ).fetchone()
+                if row is None or now - row[3] > self.ttl:
+                    return None
+                self._db.execute(
+                    'UPDATE tweets SET last_access = ? WHERE id = ? AND fields_key = ?',
+                    (now, tweet_id, fields_key),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                return None
+        tweet = json.loads(row[0])
+        if row[2] is not None:
+            tweet['public_metrics'] = json.loads(row[2])
+        return {
+            'tweet': tweet,
+            'author': json.loads(row[1]) if row[1] else None,
+            'metrics_fresh': now - row[4] <= self.metrics_ttl,
+        }
+
+    def put(self, tweet, author, fields_key):
+        """Store a raw API tweet and its author user object."""
+        if self._db is None:
+            return
+        now = time.time()
+        content = {k: v for k, v in tweet.items() if k != 'public_metrics'}
+        metrics = tweet.get('public_metrics')
+        with self._lock:
+            try:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO tweets'
+                    ' (id, fields_key, tweet, author, metrics, stored_at, metrics_at, last_access)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (tweet['id'], fields_key, json.dumps(content, ensure_ascii=False),
+                     json.dumps(author, ensure_ascii=False) if author else None,
+                     json.dumps(metrics) if metrics is not None else None, now, now, now),
+                )
+                self._evict()
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def update_metrics(self, tweet_id, fields_key, metrics):
+        """Refresh only the volatile tier of an entry."""
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                self._db.execute(
+                    'UPDATE tweets SET metrics = ?, metrics_at = ? WHERE id = ? AND fields_key = ?',
+                    (json.dumps(metrics), time.time(), tweet_id, fields_key),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _evict(self):
+        count = self._db.execute('SELECT COUNT(*) FROM tweets').fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                'DELETE FROM tweets WHERE rowid IN'
+                ' (SELECT rowid FROM tweets ORDER BY last_access LIMIT ?)',
+                (count - self.max_entries,),
+            )
+
+    def count(self, name):
+        """Increment a counter (hits, stale, misses, bypassed)."""
+        if self._db is None:
+            return
+        with self._lock:
+            try:
+                self._db.execute(
+                    'INSERT INTO counters (name, value) VALUES (?, 1)'
+                    ' ON CONFLICT(name) DO UPDATE SET value = value + 1',
+                    (name,),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def stats(self):
+        if self._db is None:
+            return {"enabled": False}
+        with self._lock:
+            counters = dict(self._db.execute('SELECT name, value FROM counters').fetchall())
+            entries = self._db.execute('SELECT COUNT(*) FROM tweets').fetchone()[0]
+        return {
+            "enabled": True,
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": counters.get('hits', 0),
+            "stale": counters.get('stale', 0),
+            "misses": counters.get('misses', 0),
+            "bypassed": counters.get('bypassed', 0),
+        }
+
+
+class BookmarkMirror:
+    """Local copy of each user's bookmarks, kept current by bookmarks_sync.
+
+    Rows hold the raw API tweet and author so they can be formatted (and
+    projected) like fresh results. `rank` orders bookmarks newest-saved
+    first, matching the API; removed bookmarks keep their row with
+    `removed_at` set so syncs can report what went away.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = open_db(
+            path,
+            'CREATE TABLE IF NOT EXISTS bookmarks ('
+            ' user_id TEXT NOT NULL, tweet_id TEXT NOT NULL, rank INTEGER NOT NULL,'
+            ' tweet TEXT NOT NULL, author TEXT, added_at REAL NOT NULL, removed_at REAL,'
+            ' PRIMARY KEY (user_id, tweet_id))',
+            'CREATE TABLE IF NOT EXISTS syncs ('
+            ' user_id TEXT PRIMARY KEY, synced_at REAL NOT NULL, full_at REAL)',
+        )
+
+    @property
+    def enabled(self):
+        return self._db is not None
+
+    def last_sync(self, user_id):
+        """Return {"synced_at", "full_at"} for user_id, or None if never synced."""
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                'SELECT synced_at, full_at FROM syncs WHERE user_id = ?', (user_id,)).fetchone()
+        return {'synced_at': row[0], 'full_at': row[1]} if row else None
+
+    def active_ids(self, user_id):
+        """Tweet IDs currently bookmarked, newest-saved first."""
+        if self._db is None:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT tweet_id FROM bookmarks WHERE user_id = ? AND removed_at IS NULL'
+                ' ORDER BY rank DESC', (user_id,)).fetchall()
+        return [r[0] for r in rows]
+
+    def apply_sync(self, user_id, seen, stop_id=None, complete=True, full=False):
+        """Record one sync walk and return (added_ids, removed_ids).
+
+        `seen` is the (tweet, author) pairs the walk returned, in API order,
+        up to but excluding `stop_id`, the mirrored bookmark where the walk
+        caught up with the mirror. They are ranked above the rest, in that
+        order, so a bookmark saved again moves to the top. Mirrored bookmarks
+        that should have been seen before `stop_id` (or anywhere, for a full
+        walk) were removed. Removals are only inferred from a `complete` walk.
+        """
+        if self._db is None:
+            return [], []
+        now = time.time()
+        known = self.active_ids(user_id)
+        known_set = set(known)
+        seen_ids = {t['id'] for t, _ in seen}
+        added = [t['id'] for t, _ in seen if t['id'] not in known_set]
+        removed = []
+        if complete:
+            region = known if full or stop_id is None else known[:known.index(stop_id)]
+            removed = [i for i in region if i not in seen_ids]
+        with self._lock:
+            try:
+                top = self._db.execute(
+                    'SELECT COALESCE(MAX(rank), 0) FROM bookmarks WHERE user_id = ?',
+                    (user_id,)).fetchone()[0]
+                for i, (tweet, author) in enumerate(seen):
+                    self._db.execute(
+                        'INSERT INTO bookmarks (user_id, tweet_id, rank, tweet, author, added_at)'
+                        ' VALUES (?, ?, ?, ?, ?, ?)'
+                        ' ON CONFLICT(user_id, tweet_id) DO UPDATE SET tweet = excluded.tweet,'
+                        ' author = excluded.author, rank = excluded.rank,'
+                        ' added_at = CASE WHEN removed_at IS NULL THEN added_at ELSE excluded.added_at END,'
+                        ' removed_at = NULL',
+                        (user_id, tweet['id'], top + len(seen) - i, json.dumps(tweet, ensure_ascii=False),
+                         json.dumps(author, ensure_ascii=False) if author else None, now),
+                    )
+                self._db.executemany(
+                    'UPDATE bookmarks SET removed_at = ? WHERE user_id = ? AND tweet_id = ?',
+                    [(now, user_id, i) for i in removed],
+                )
+                self._db.execute(
+                    'INSERT INTO syncs (user_id, synced_at, full_at) VALUES (?, ?, ?)'
+                    ' ON CONFLICT(user_id) DO UPDATE SET synced_at = excluded.synced_at,'
+                    ' full_at = COALESCE(excluded.full_at, full_at)',
+                    (user_id, now, now if full and complete else None),
+                )
+                self._db.commit()
+            except sqlite3.Error:
+                self._db.rollback()
+                return [], []
+        return added, removed
+
+    def entries(self, user_id, removed=False):
+        """Return mirrored bookmarks as dicts with tweet, author, added_at and removed_at."""
+        if self._db is None:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT tweet, author, added_at, removed_at FROM bookmarks WHERE user_id = ?'
+                f' AND removed_at IS {"NOT " if removed else ""}NULL ORDER BY rank DESC',
+                (user_id,)).fetchall()
+        return [{
+            'tweet': json.loads(r[0]),
+            'author': json.loads(r[1]) if r[1] else None,
+            'added_at': r[2],
+            'removed_at': r[3],
+        } for r in rows]
+
+
+_user_cache = None
+_cache_lock = threading.Lock()
+_tweet_cache = None
+
+
+def get_user_cache():
+    """Return the process-wide cache for user lookups."""
+    global _user_cache
+    with _cache_lock:
+        if _user_cache is None:
+            _user_cache = TTLCache(os.path.join(cache_dir(), 'users.sqlite3'))
+        return _user_cache
+
+
+def get_tweet_cache():
+    """Return the process-wide tweet cache."""
+    global _tweet_cache
+    with _cache_lock:
+        if _tweet_cache is None:
+            _tweet_cache = TweetCache(
+                os.path.join(cache_dir(), 'tweets.sqlite3'),
+                ttl=env_seconds('TWITTER_TWEET_CACHE_TTL', DEFAULT_TWEET_TTL),
+                metrics_ttl=env_seconds('TWITTER_METRICS_CACHE_TTL', DEFAULT_METRICS_TTL),
+                max_entries=int(env_seconds('TWITTER_TWEET_CACHE_MAX', DEFAULT_TWEET_CACHE_MAX)),
+            )
+        return _tweet_cache
+
+
+_monitor_state = None
+
+
+def get_monitor_state():
+    """Return the store holding per-query since_id watermarks."""
+    global _monitor_state
+    with _cache_lock:
+        if _monitor_state is None:
+            _monitor_state = TTLCache(os.path.join(cache_dir(), 'monitor.sqlite3'))
+        return _monitor_state
+
+
+_bookmark_mirror = None
+
+
+def get_bookmark_mirror():
+    """Return the local bookmark mirror."""
+    global _bookmark_mirror
+    with _cache_lock:
+        if _bookmark_mirror is None:
+            _bookmark_mirror = BookmarkMirror(os.path.join(cache_dir(), 'bookmarks.sqlite3'))
+        return _bookmark_mirror
+
+
+_thread_cache = None
+
+
+def get_thread_cache():
+    """Return the store of cached conversation reply graphs."""
+    global _thread_cache
+    with _cache_lock:
+        if _thread_cache is None:
+            _thread_cache = TTLCache(os.path.join(cache_dir(), 'threads.sqlite3'))
+        return _thread_cache
+
+
+_counts_cache = None
+
+
+def get_counts_cache():
+    """Return the store of closed tweet-count buckets per query."""
+    global _counts_cache
+    with _cache_lock:
+        if _counts_cache is None:
+            _counts_cache = TTLCache(os.path.join(cache_dir(), 'counts.sqlite3'))
+        return _counts_cache
@@ -0,0 +1,119 @@
+"""
+Tweet volumes for `twitter-api.py counts`, from /2/tweets/counts/recent.
+
+The endpoint returns per-minute, -hour or -day tweet counts for a query
+over the last 7 days in one small response, so "are mentions up this
+week?" costs one request instead of paging through every tweet.
+
+Buckets that are closed (ended more than SETTLE seconds ago) never change,
+so they are cached per query and granularity (see twitter_cache): a later
+call only asks the API for the buckets after the cached ones. Windows are
+moved onto bucket boundaries so that every bucket but the open last one
+spans a whole interval and can be cached. Day counts are summed from hour
+buckets, which keeps the oldest, partial day of the 7-day reach and shares
+the hour cache.
+
+Spikes are buckets that stand out from a rolling baseline: the median of
+the preceding BASELINE buckets, with their median absolute deviation
+(scaled to a standard deviation) as the spread. The spread is floored at
+the Poisson noise of the baseline, sqrt(median), so that in a quiet series
+one extra tweet is not a spike. Consecutive outstanding buckets are one
+spike, reported with its peak bucket.
+"""
+
+import math
+import statistics
+
+GRANULARITY = {'minute': 60, 'hour': 3600, 'day': 86400}
+FETCH_GRANULARITY = {'minute': 'minute', 'hour': 'hour', 'day': 'hour'}
+SETTLE = 60  # Seconds after a bucket ends before its count is final enough to cache
+BASELINE = {'minute': 60, 'hour': 24, 'day': 3}  # Preceding buckets the baseline is taken from
+SPIKE_THRESHOLD = 3.0
+SPIKE_MIN_COUNT = 5
+_MAD_TO_STDDEV = 1.4826
+
+
+def aligned_start(start, step, earliest):
+    """start moved onto a bucket boundary: back if that is not before earliest, else forward."""
+    down = start - start % step
+    return down if down >= earliest else down + step
+
+
+def cached_until(cached, start, end, step, now):
+    """End of the run of closed, cached buckets at the start of [start, end)."""
+    if start % step:
+        return start  # Partial first bucket: never cached
+    t = start
+    while t + step <= end and t + step <= now - SETTLE and str(t) in cached:
+        t += step
+    return t
+
+
+def closed(buckets, step, now):
+    """{str(start): count} for the fetched buckets that can be cached."""
+    return {str(int(start)): count for start, end, count in buckets
+            if end - start == step and start % step == 0 and end <= now - SETTLE}
+
+
+def aggregate(buckets, step):
+    """Sum buckets into `step`-long ones on step boundaries (e.g. hours into days)."""
+    merged = {}
+    for start, end, count in buckets:
+        key = start - start % step
+        b_start, b_end, total = merged.get(key, (start, end, 0))
+        merged[key] = (min(b_start, start), max(b_end, end), total + count)
+    return [merged[key] for key in sorted(merged)]
+
+
+def volume(buckets, start, end):
+    """Tweets in [start, end), counting partly covered buckets pro rata."""
+    total = 0.0
+    for b_start, b_end, count in buckets:
+        lo, hi = max(b_start, start), min(b_end, end)
+        if hi > lo:
+            total += count * (hi - lo) / (b_end - b_start)
+    return total
+
+
+def trend(buckets, start, end):
+    """Volume of the newer half of the window against the older half."""
+    middle = (start + end) / 2
+    previous, recent = volume(buckets, start, middle), volume(buckets, middle, end)
+    return {
+        "previous": round(previous),
+        "recent": round(recent),
+        "change_pct": round((recent - previous) / previous * 100, 1) if previous else None,
+    }
+
+
+def spikes(buckets, baseline=24, threshold=SPIKE_THRESHOLD, min_count=SPIKE_MIN_COUNT):
+    """Return the spikes in buckets as dicts of bucket indexes and stats.
+
+    A bucket stands out when its count is `threshold` spreads or more above
+    the median of the `baseline` buckets before it (so the first `baseline`
+    buckets are never flagged). Each spike has its `first` and `last`
+    bucket, its `total` count and, for its peak bucket, `peak`, `count`,
+    `baseline` (the median) and `score` (spreads above it).
+    """
+    counts = [count for _, _, count in buckets]
+    found = []
+    for i in range(baseline, len(counts)):
+        if counts[i] < min_count:
+            continue
+        previous = counts[i - baseline:i]
+        median = statistics.median(previous)
+        mad = statistics.median(abs(c - median) for c in previous) * _MAD_TO_STDDEV
+        score = (counts[i] - median) / max(mad, math.sqrt(median), 1.0)
+        if score < threshold:
+            continue
+        if found and found[-1]['last'] == i - 1:
+            spike = found[-1]
+            spike['last'] = i
+            spike['total'] += counts[i]
+            if score <= spike['score']:
+                continue
+        else:
+            spike = {'first': i, 'last': i, 'total': counts[i]}
+            found.append(spike)
+        spike.update(peak=i, count=counts[i], baseline=median, score=score)
+    return found
@@ -0,0 +1,205 @@
+"""
+OAuth 2.0 user-token lifecycle shared by twitter-api.py and twitter-oauth2.py.
+
+The access token, its refresh token and its expiry (TWITTER_OAUTH2_EXPIRES_AT,
+epoch seconds) live in .env. twitter-api.py refreshes the token shortly before
+it expires, or once after a 401, instead of failing until someone runs
+`twitter-oauth2.py refresh` by hand.
+
+Refresh tokens are single-use, so two processes refreshing at once would
+leave one of them holding a revoked token. Refreshes therefore run under an
+flock in the cache directory, and a process that gets the lock re-reads .env
+first: if another process already stored a new token, it uses that one. .env
+is rewritten atomically (temp file plus rename), so a concurrent reader sees
+the old file or the new one, never a partial one.
+"""
+
+import os
+import sys
+import json
+import base64
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+import twitter_http
+
+TOKEN_KEY = 'TWITTER_OAUTH2_USER_TOKEN'
+REFRESH_KEY = 'TWITTER_OAUTH2_REFRESH_TOKEN'
+EXPIRES_KEY = 'TWITTER_OAUTH2_EXPIRES_AT'
+REFRESH_MARGIN = 300  # Refresh this many seconds before the token expires
+
+
+def env_path():
+    """The .env file the scripts read: next to the repo root, else the cwd."""
+    path = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.env'))
+    if not os.path.isfile(path):
+        path = os.path.join(os.getcwd(), '.env')
+    return os.path.realpath(path)  # Rename over a symlink's target, not the link
+
+
+def read_env(path):
+    """Parse KEY=value lines of a .env file into a dict ({} if missing)."""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#') or '=' not in line:
+                    continue
+                if line.startswith('export '):
+                    line = line[7:]
+                key, _, value = line.partition('=')
+                values[key.strip()] = value.strip().strip('"').strip("'")
+    except OSError:
+        pass
+    return values
+
+
+def update_env_file(updates, path=None):
+    """Set the keys in `updates` in .env, replacing the file atomically.
+
+    Existing lines for those keys are rewritten in place; new keys are
+    appended. The file keeps its permissions (0600 when it is created).
+    """
+    path = path or env_path()
+    lines = []
+    done = set()
+    try:
+        mode = os.stat(path).st_mode & 0o777
+        with open(path) as f:
+            for line in f:
+                stripped = line.strip()
+                if stripped.startswith('export '):
+                    stripped = stripped[7:]
+                key = stripped.partition('=')[0].strip() if '=' in stripped else None
+                if key in updates and not stripped.startswith('#'):
+                    if key not in done:
+                        lines.append(f'{key}={updates[key]}\n')
+                        done.add(key)
+                    continue
+                lines.append(line)
+    except FileNotFoundError:
+        mode = 0o600
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += '\n'
+    lines.extend(f'{key}={value}\n' for key, value in updates.items() if key not in done)
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)  # os.open's mode is filtered through the umask
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def token_url():
+    """Token endpoint; TWITTER_API_BASE_URL points it at a stand-in server."""
+    base = os.environ.get('TWITTER_API_BASE_URL', 'https://api.twitter.com').rstrip('/')
+    return f'{base}/2/oauth2/token'
+
+
+def client_credentials():
+    """(client_id, client_secret), preferring TWITTER_CLIENT_ID/SECRET; '' if unset."""
+    client_id = os.environ.get('TWITTER_CLIENT_ID', '') or os.environ.get('TWITTER_CONSUMER_KEY', '')
+    client_secret = os.environ.get('TWITTER_CLIENT_SECRET', '') or os.environ.get('TWITTER_SECRET_KEY', '')
+    return client_id, client_secret
+
+
+def token_request(fields, client_id, client_secret):
+    """POST a form to the token endpoint; return (status, parsed body)."""
+    credentials = base64.b64encode(f'{client_id}:{client_secret}'.encode()).decode()
+    resp = twitter_http.request('POST', token_url(), headers={
+        'Authorization': f'Basic {credentials}',
+        'Content-Type': 'application/x-www-form-urlencoded',
+    }, body=urllib.parse.urlencode(fields).encode())
+    body = resp.body.decode()
+    try:
+        return resp.status, json.loads(body)
+    except json.JSONDecodeError:
+        return resp.status, {'error': body}
+
+
+def token_updates(token_data, now=None):
+    """The .env entries to store for a token endpoint response."""
+    updates = {TOKEN_KEY: token_data['access_token']}
+    if token_data.get('refresh_token'):
+        updates[REFRESH_KEY] = token_data['refresh_token']
+    expires_in = token_data.get('expires_in')
+    # An empty value clears the expiry of a previous token
+    updates[EXPIRES_KEY] = str(int((now or time.time()) + int(expires_in))) if expires_in else ''
+    return updates
+
+
+def expiring(values, margin=REFRESH_MARGIN, now=None):
+    """True if `values` (os.environ or a read_env dict) holds a token about to expire."""
+    try:
+        expires_at = float(values.get(EXPIRES_KEY, ''))
+    except ValueError:
+        return False  # Expiry unknown: rely on the 401 retry
+    return expires_at - (now or time.time()) <= margin
+
+
+@contextmanager
+def refresh_lock():
+    """Hold the cross-process refresh lock (a no-op where flock is unavailable)."""
+    import twitter_cache
+    try:
+        import fcntl
+        os.makedirs(twitter_cache.cache_dir(), exist_ok=True)
+        lock_file = open(os.path.join(twitter_cache.cache_dir(), 'oauth2-refresh.lock'), 'a')
+    except (ImportError, OSError):
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def refresh(stale_token=None):
+    """Replace the user token; return (token, error).
+
+    stale_token is the token the caller found expiring or rejected. If .env
+    already holds a different, unexpired token by the time the lock is
+    held, another process refreshed first and that token is returned as is.
+    The new values are written to .env and os.environ.
+    """
+    with refresh_lock():
+        path = env_path()
+        saved = read_env(path)
+        current = saved.get(TOKEN_KEY)
+        if stale_token and current and current != stale_token and not expiring(saved):
+            os.environ.update({k: saved[k] for k in (TOKEN_KEY, REFRESH_KEY, EXPIRES_KEY) if k in saved})
+            return current, None
+
+        refresh_token = saved.get(REFRESH_KEY) or os.environ.get(REFRESH_KEY, '')
+        client_id, client_secret = client_credentials()
+        if not refresh_token:
+            return None, f'{REFRESH_KEY} not set; run `python3 scripts/twitter-oauth2.py` first'
+        if not client_id or not client_secret:
+            return None, 'TWITTER_CLIENT_ID and TWITTER_CLIENT_SECRET must be set in .env'
+
+        status, data = token_request({
+            'refresh_token': refresh_token,
+            'grant_type': 'refresh_token',
+            'client_id': client_id,
+        }, client_id, client_secret)
+        if status >= 400 or not data.get('access_token'):
+            return None, f'Token refresh failed ({status}): {json.dumps(data)}'
+
+        updates = token_updates(data)
+        try:
+            update_env_file(updates, path)
+        except OSError as e:
+            print(f'Warning: could not save the refreshed token to {path}: {e}', file=sys.stderr)
+        os.environ.update(updates)
+        return updates[TOKEN_KEY], None
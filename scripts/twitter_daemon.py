@@ -0,0 +1,229 @@
+"""
+Unix-socket command daemon behind `twitter-api.py serve`.
+
+Only the serve path imports this module, so one-shot commands do not pay for
+socketserver and friends. Requests and replies use the newline-delimited JSON
+frames that scripts/twitter-client.py speaks.
+
+A request carries the caller's cwd, TWITTER_* environment (as the command
+would see it there, .env included) and (for `-` arguments) stdin. Commands run on threads of one process, so the cwd is
+applied by resolving PATH_OPTIONS against it. stdin, stdout and stderr are
+routed to the request through context variables, which the worker threads
+of run_concurrently() inherit, so their trace records and warnings reach
+the client too. The environment cannot be switched per request: when the caller's
+TWITTER_* set differs from the daemon's in any variable, set on either side, the reply is a {"fallback"} frame and the client
+runs the command itself.
+"""
+
+import os
+import io
+import sys
+import json
+import contextvars
+import signal
+import socket
+import socketserver
+import tempfile
+import threading
+
+
+_run_command = None  # Set by serve()
+PATH_OPTIONS = ('--file=', '--profile=', '--out=', '--queue=')
+
+
+def default_socket_path():
+    """Socket path shared by `serve` and scripts/twitter-client.py."""
+    return os.environ.get('TWITTER_API_SOCKET') or os.path.join(
+        tempfile.gettempdir(), f'twitter-api-{os.getuid()}.sock')
+
+
+class _FrameWriter:
+    """Write newline-delimited JSON frames to a client connection."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+        self._lock = threading.Lock()
+
+    def send(self, frame):
+        data = (json.dumps(frame, ensure_ascii=False) + '\n').encode()
+        with self._lock:
+            self._wfile.write(data)
+            self._wfile.flush()
+
+
+class _StreamRouter:
+    """sys.stdout/sys.stderr stand-in that sends writes made in a request's
+    context to that request's client, and everything else to the real stream."""
+
+    def __init__(self, key, fallback):
+        self._key = key
+        self._fallback = fallback
+        self._frames = contextvars.ContextVar(f'{key}_frames', default=None)
+
+    def bind(self, frames):
+        self._frames.set(frames)
+
+    def unbind(self):
+        self._frames.set(None)
+
+    def write(self, s):
+        frames = self._frames.get()
+        if frames is None:
+            return self._fallback.write(s)
+        if s:
+            frames.send({self._key: s})
+        return len(s)
+
+    def flush(self):
+        if self._frames.get() is None:
+            self._fallback.flush()
+
+
+class _InputRouter:
+    """sys.stdin stand-in that reads, in a request's context, the stdin text
+    its client sent, and everything else from the real stream."""
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._text = contextvars.ContextVar('stdin_text', default=None)
+
+    def bind(self, text):
+        self._text.set(io.StringIO(text))
+
+    def unbind(self):
+        self._text.set(None)
+
+    def _stream(self):
+        stream = self._text.get()
+        return self._fallback if stream is None else stream
+
+    def read(self, size=-1):
+        return self._stream().read(size)
+
+    def readline(self, size=-1):
+        return self._stream().readline(size)
+
+    def __iter__(self):
+        return iter(self._stream())
+
+
+def resolve_paths(argv, cwd):
+    """argv with relative PATH_OPTIONS values made absolute against cwd."""
+    if not cwd:
+        return argv
+    resolved = []
+    for a in argv:
+        for prefix in PATH_OPTIONS:
+            value = a[len(prefix):]
+            if a.startswith(prefix) and value and value != '-' and not os.path.isabs(value):
+                a = prefix + os.path.join(cwd, os.path.expanduser(value))
+                break
+        resolved.append(a)
+    return resolved
+
+
+def twitter_env(environ):
+    """The TWITTER_* variables of environ that shape a command's behavior."""
+    return {k: v for k, v in environ.items() if k.startswith('TWITTER_') and k != 'TWITTER_API_SOCKET'}
+
+
+def env_mismatch(env):
+    """Names of TWITTER_* variables set differently (or only) on one side."""
+    daemon = twitter_env(os.environ)
+    return sorted(k for k in set(env) | set(daemon) if env.get(k) != daemon.get(k))
+
+
+class _CommandHandler(socketserver.StreamRequestHandler):
+    """Handle one request: a JSON line {"argv", "cwd", "env", "stdin"},
+    answered with {"out": ...} / {"err": ...} frames and a final
+    {"exit": code}, or with a single {"fallback": reason}."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return  # Liveness probe; nothing to answer
+        frames = _FrameWriter(self.wfile)
+        try:
+            request = json.loads(line)
+            argv = resolve_paths([str(a) for a in request.get('argv', [])], request.get('cwd'))
+            mismatch = env_mismatch(dict(request.get('env') or {}))
+            stdin = str(request.get('stdin') or '')
+        except (ValueError, AttributeError, TypeError):
+            frames.send({"out": json.dumps({"error": "Malformed request"}) + '\n'})
+            frames.send({"exit": 1})
+            return
+        if mismatch:
+            frames.send({"fallback": f"Daemon environment differs: {', '.join(mismatch)}"})
+            return
+
+        sys.stdout.bind(frames)
+        sys.stderr.bind(frames)
+        sys.stdin.bind(stdin)
+        code = 0
+        try:
+            _run_command(argv)
+        except SystemExit as e:
+            if isinstance(e.code, int):
+                code = e.code
+            elif e.code is not None:
+                print(e.code, file=sys.stderr)
+                code = 1
+        except Exception as e:
+            print(json.dumps({"error": f"{type(e).__name__}: {e}"}))
+            code = 1
+        finally:
+            sys.stdout.unbind()
+            sys.stderr.unbind()
+            sys.stdin.unbind()
+        try:
+            frames.send({"exit": code})
+        except OSError:
+            pass  # Client went away
+
+
+class _CommandServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(args, run_command):
+    """Run the command daemon on a Unix socket until interrupted.
+
+    run_command(argv) executes one command; its output goes to the client.
+    """
+    path = default_socket_path()
+    for a in args:
+        if a.startswith('--socket='):
+            path = a.split('=', 1)[1]
+
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            print(json.dumps({"error": f"Daemon already listening on {path}"}))
+            sys.exit(1)
+        except OSError:
+            os.unlink(path)  # Stale socket from a previous run
+        finally:
+            probe.close()
+
+    sys.stdout = _StreamRouter('out', sys.stdout)
+    sys.stderr = _StreamRouter('err', sys.stderr)
+    sys.stdin = _InputRouter(sys.stdin)
+
+    global _run_command
+    _run_command = run_command
+    umask = os.umask(0o177)  # Create the socket 0600: no window where others can connect
+    try:
+        server = _CommandServer(path, _CommandHandler)
+    finally:
+        os.umask(umask)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"twitter-api daemon listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
@@ -0,0 +1,265 @@
+"""
+Keep-alive HTTP/1.1 client shared by the Twitter helper scripts.
+
+Connections are pooled per (scheme, host, port) so sequential requests to
+api.twitter.com reuse one TCP+TLS session instead of handshaking each time.
+Idle connections are evicted after IDLE_TIMEOUT seconds and at most
+MAX_IDLE_PER_HOST are kept per host. Responses are requested with
+`Accept-Encoding: gzip` and decompressed while they are read.
+
+open_stream() is for long-lived streaming responses instead: it holds its
+own connection, outside the pool, and hands out the body as it arrives.
+"""
+
+import http.client
+import threading
+import time
+import urllib.parse
+import zlib
+
+MAX_IDLE_PER_HOST = 4
+IDLE_TIMEOUT = 60.0
+DEFAULT_TIMEOUT = 30.0
+READ_CHUNK = 64 * 1024
+
+# Errors that mean a pooled connection was closed by the server while idle.
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                 ConnectionResetError, BrokenPipeError)
+
+
+class Response:
+    """A fully read HTTP response.
+
+    `timings` holds monotonic millisecond durations for the final attempt:
+    connect (DNS, TCP and TLS; 0 on a reused connection), ttfb (request sent
+    until status line) and read (body read and gunzip), plus `reused`.
+    `wire_bytes` is the body size before decompression.
+    """
+
+    def __init__(self, status, headers, body, timings=None, wire_bytes=0):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.timings = timings or {}
+        self.wire_bytes = wire_bytes
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+
+class ConnectionPool:
+    """Host-keyed pool of idle keep-alive connections."""
+
+    def __init__(self, max_idle_per_host=MAX_IDLE_PER_HOST, idle_timeout=IDLE_TIMEOUT,
+                 timeout=DEFAULT_TIMEOUT):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_context = None
+        self.stats = {'connections_opened': 0, 'connections_reused': 0, 'requests': 0}
+
+    def _new_connection(self, key):
+        scheme, host, port = key
+        with self._lock:
+            self.stats['connections_opened'] += 1
+        if scheme == 'https':
+            if self._ssl_context is None:
+                import ssl
+                self._ssl_context = ssl.create_default_context()
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout,
+                                               context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _acquire(self, key):
+        """Return (connection, reused) for key, evicting expired idle ones."""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, last_used = idle.pop()
+                if now - last_used < self.idle_timeout:
+                    self.stats['connections_reused'] += 1
+                    return conn, True
+                conn.close()
+        return self._new_connection(key), False
+
+    def _release(self, key, conn):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) >= self.max_idle_per_host:
+                conn.close()
+            else:
+                idle.append((conn, time.monotonic()))
+
+    def close(self):
+        """Close every idle connection."""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def request(self, method, url, headers=None, body=None, timeout=None):
+        """Send a request and return a Response with the decoded body.
+
+        A request on a reused connection that the server has already closed
+        is retried once on a fresh connection. `timeout` (seconds) overrides
+        the pool's socket timeout for this request.
+        """
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or 'https'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        req_headers = {'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'}
+        req_headers.update(headers or {})
+
+        with self._lock:
+            self.stats['requests'] += 1
+        while True:
+            conn, reused = self._acquire(key)
+            conn.timeout = self.timeout if timeout is None else timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                started = time.perf_counter()
+                if conn.sock is None:
+                    conn.connect()
+                connected = time.perf_counter()
+                conn.request(method, path, body=body, headers=req_headers)
+                resp = conn.getresponse()
+                first_byte = time.perf_counter()
+                data, wire_bytes = _read_body(resp)
+                done = time.perf_counter()
+            except _STALE_ERRORS:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            timings = {
+                'reused': reused,
+                'connect_ms': round((connected - started) * 1000, 2),
+                'ttfb_ms': round((first_byte - connected) * 1000, 2),
+                'read_ms': round((done - first_byte) * 1000, 2),
+            }
+            return Response(resp.status, resp.headers, data, timings, wire_bytes)
+
+
+class Stream:
+    """A streaming response on a connection of its own; close it when done."""
+
+    def __init__(self, conn, resp):
+        self.conn = conn
+        self.status = resp.status
+        self.headers = resp.headers
+        self._resp = resp
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+    def chunks(self, timeout=None):
+        """Yield the body, gunzipped, in pieces as they arrive.
+
+        timeout, if given, is called before each read and returns the socket
+        timeout for it; a read that times out raises TimeoutError.
+        """
+        encoding = (self.getheader('Content-Encoding') or '').lower()
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding == 'gzip' else None
+        while True:
+            if timeout is not None and self.conn.sock is not None:
+                self.conn.sock.settimeout(timeout())
+            chunk = self._resp.read1(READ_CHUNK)
+            if not chunk:
+                break
+            data = decoder.decompress(chunk) if decoder else chunk
+            if data:
+                yield data
+        if decoder:
+            tail = decoder.flush()
+            if tail:
+                yield tail
+
+    def read(self):
+        """The rest of the body (e.g. of an error response)."""
+        return b''.join(self.chunks())
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_stream(url, headers=None, timeout=DEFAULT_TIMEOUT):
+    """Send a GET on a new connection and return a Stream once the status line is in.
+
+    timeout is the socket timeout for connecting and, unless Stream.chunks()
+    is given another, for every read, so a stream that goes quiet for that
+    long raises TimeoutError.
+    """
+    parts = urllib.parse.urlsplit(url)
+    scheme = parts.scheme or 'https'
+    port = parts.port or (443 if scheme == 'https' else 80)
+    path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+    conn = get_pool()._new_connection((scheme, parts.hostname, port))  # Shares the SSL context
+    conn.timeout = timeout
+    try:
+        conn.request('GET', path, headers={'Accept-Encoding': 'gzip', **(headers or {})})
+        resp = conn.getresponse()
+    except BaseException:
+        conn.close()
+        raise
+    return Stream(conn, resp)
+
+
+def _read_body(resp):
+    """Read a response body, gunzipping it incrementally if needed.
+
+    Returns (body, bytes received).
+    """
+    encoding = (resp.getheader('Content-Encoding') or '').lower()
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if encoding == 'gzip' else None
+    chunks = []
+    received = 0
+    while True:
+        chunk = resp.read(READ_CHUNK)
+        if not chunk:
+            break
+        received += len(chunk)
+        chunks.append(decoder.decompress(chunk) if decoder else chunk)
+    if decoder:
+        chunks.append(decoder.flush())
+    return b''.join(chunks), received
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+
+def request(method, url, headers=None, body=None, timeout=None):
+    """Send a request through the process-wide pool."""
+    return get_pool().request(method, url, headers=headers, body=body, timeout=timeout)
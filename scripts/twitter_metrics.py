@@ -0,0 +1,146 @@
+"""
+Append-only public_metrics history for `twitter-api.py track`.
+
+Each tracked tweet has its own file, metrics/<tweet_id>.u32, in the cache
+directory. The file is a flat run of fixed-width records: the snapshot time
+followed by one counter per column, all little-endian unsigned 32-bit ints
+(28 bytes a snapshot, no header). Appends are a single O_APPEND write, so
+concurrent trackers never interleave records. Reads load the file into one
+array and take each column as a strided slice, so scanning a long history
+never builds per-snapshot objects.
+"""
+
+import os
+import sys
+import array
+import bisect
+import struct
+import time
+
+import twitter_cache
+
+COLUMNS = ('likes', 'retweets', 'replies', 'quotes', 'impressions', 'bookmarks')
+API_KEYS = ('like_count', 'retweet_count', 'reply_count', 'quote_count',
+            'impression_count', 'bookmark_count')
+_RECORD = struct.Struct('<' + 'I' * (1 + len(COLUMNS)))
+_WIDTH = 1 + len(COLUMNS)
+_MAX = 2 ** 32 - 1
+_TYPECODE = 'I' if array.array('I').itemsize == 4 else 'L'
+
+
+def snapshot_values(public_metrics):
+    """Map an API public_metrics object onto COLUMNS as stored (clamped to u32)."""
+    return {name: min(_MAX, max(0, int(public_metrics.get(key, 0))))
+            for name, key in zip(COLUMNS, API_KEYS)}
+
+
+class Series:
+    """Snapshots of one tweet: `times` plus one array per column."""
+
+    def __init__(self, values):
+        self.times = values[0::_WIDTH]
+        self.columns = {name: values[i + 1::_WIDTH] for i, name in enumerate(COLUMNS)}
+
+    def __len__(self):
+        return len(self.times)
+
+    def window(self, since=None):
+        """Return the Series restricted to snapshots at or after `since`."""
+        if since is None:
+            return self
+        start = bisect.bisect_left(self.times, since)
+        trimmed = Series.__new__(Series)
+        trimmed.times = self.times[start:]
+        trimmed.columns = {name: col[start:] for name, col in self.columns.items()}
+        return trimmed
+
+    def summary(self):
+        """First/last values, delta, average and peak hourly rate per column."""
+        if not self.times:
+            return None
+        hours = (self.times[-1] - self.times[0]) / 3600
+        gaps = [b - a for a, b in zip(self.times, self.times[1:])]
+        metrics = {}
+        for name, col in self.columns.items():
+            delta = col[-1] - col[0]
+            peak = max(((b - a) * 3600 / gap for a, b, gap in zip(col, col[1:], gaps) if gap > 0),
+                       default=0)
+            metrics[name] = {
+                'first': col[0],
+                'last': col[-1],
+                'delta': delta,
+                'per_hour': round(delta / hours, 2) if hours > 0 else 0,
+                'peak_per_hour': round(peak, 2),
+            }
+        return {
+            'snapshots': len(self.times),
+            'from': self.times[0],
+            'to': self.times[-1],
+            'metrics': metrics,
+        }
+
+
+class MetricsStore:
+    """Directory of per-tweet snapshot files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, tweet_id):
+        return os.path.join(self.directory, f'{int(tweet_id)}.u32')
+
+    def append(self, tweet_id, public_metrics, ts=None):
+        """Record one snapshot of an API public_metrics object."""
+        os.makedirs(self.directory, exist_ok=True)
+        values = snapshot_values(public_metrics)
+        record = _RECORD.pack(int(ts if ts is not None else time.time()),
+                              *[values[name] for name in COLUMNS])
+        fd = os.open(self._path(tweet_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+
+    def last(self, tweet_id):
+        """Return (ts, {column: value}) for the latest snapshot, or None."""
+        try:
+            with open(self._path(tweet_id), 'rb') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size < _RECORD.size:
+                    return None
+                f.seek(size - size % _RECORD.size - _RECORD.size)
+                values = _RECORD.unpack(f.read(_RECORD.size))
+        except OSError:
+            return None
+        return values[0], dict(zip(COLUMNS, values[1:]))
+
+    def series(self, tweet_id):
+        """Load the full history of a tweet, or None if it is not tracked."""
+        values = array.array(_TYPECODE)
+        try:
+            with open(self._path(tweet_id), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        values.frombytes(data[:len(data) - len(data) % _RECORD.size])  # Drop a torn tail
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return Series(values)
+
+    def tracked(self):
+        """IDs of every tweet with a history file."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(n[:-len('.u32')] for n in names if n.endswith('.u32'))
+
+    def size(self, tweet_id):
+        try:
+            return os.path.getsize(self._path(tweet_id))
+        except OSError:
+            return 0
+
+
+def get_metrics_store():
+    return MetricsStore(os.path.join(twitter_cache.cache_dir(), 'metrics'))
@@ -0,0 +1,162 @@
+"""
+Bearer-token pool for twitter-api.py: spread app-auth requests over several
+credentials so their rate-limit windows add up.
+
+The pool is TWITTER_BEARER_TOKEN plus any tokens in TWITTER_BEARER_TOKENS
+(comma or whitespace separated), and with TWITTER_POOL_USER_TOKEN=1 also the
+OAuth2 user token, whose user-context limits are counted separately from the
+app's. Only app-auth reads are pooled: requests made with a pooled app
+token to an endpoint in APP_AUTH_PATHS. User-context requests (/users/me,
+bookmarks) keep the user token, which app-only tokens cannot stand in for.
+Each pooled request goes to the credential with the most quota left for its
+endpoint according to the shared buckets in twitter_ratelimit.py; one that
+has not been used on the endpoint yet counts as full.
+
+Throttling is per endpoint: a 429 empties that credential's bucket until
+its reset, which is enough for routing to pass it over on that endpoint
+only. A 401 (revoked or invalid token) quarantines the credential on every
+endpoint for QUARANTINE_UNAUTHORIZED seconds. The user token is never
+quarantined: it expires routinely and is refreshed by the next
+user-context request that gets its 401. Quarantines and
+per-credential usage counters live in credentials.json in the cache
+directory, keyed by the same short hash as the buckets, so tokens are never
+written to disk.
+"""
+
+import os
+import contextlib
+import random
+import re
+import threading
+import time
+
+import twitter_ratelimit
+
+QUARANTINE_UNAUTHORIZED = 3600
+# GET endpoints (templated as in twitter_ratelimit.endpoint_key) that app-only auth supports
+APP_AUTH_PATHS = re.compile(
+    r'/2/(tweets(/:id|/search/recent|/counts/recent)?'
+    r'|users(/by|/by/username/:username|/:id|/:id/tweets|/:id/mentions)?)'
+)
+
+
+def pool_tokens():
+    """The pooled bearer tokens, primary first, without duplicates."""
+    tokens = [os.environ.get('TWITTER_BEARER_TOKEN', '')]
+    tokens += re.split(r'[\s,]+', os.environ.get('TWITTER_BEARER_TOKENS', ''))
+    if os.environ.get('TWITTER_POOL_USER_TOKEN', '') not in ('', '0'):
+        tokens.append(os.environ.get('TWITTER_OAUTH2_USER_TOKEN', ''))
+    return list(dict.fromkeys(t for t in tokens if t))
+
+
+def _auth(token):
+    return f"Bearer {token}"
+
+
+def _is_user_token(token):
+    return bool(token) and token == os.environ.get('TWITTER_OAUTH2_USER_TOKEN')
+
+
+def _id(token):
+    return twitter_ratelimit.credential_id(_auth(token))
+
+
+class CredentialPool:
+    """Routes requests across pool_tokens() and tracks each token's health."""
+
+    def __init__(self, path, limiter):
+        self.path = path
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._memory = {}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._persistent = True
+        except OSError:
+            self._persistent = False
+
+    def _state(self):
+        if not self._persistent:
+            return contextlib.nullcontext(self._memory)
+        return twitter_ratelimit.locked_json(self.path)
+
+    def covers(self, url, headers):
+        """True if the request may go out on any of several pooled tokens.
+
+        That is an app-auth request: it authenticates with a pooled token other
+        than the user token, to an endpoint app-only auth supports.
+        """
+        tokens = pool_tokens()
+        path = twitter_ratelimit.endpoint_key('GET', url, None).split(' ', 2)[2]
+        app_auths = {_auth(t) for t in tokens if not _is_user_token(t)}
+        return (len(tokens) > 1 and APP_AUTH_PATHS.fullmatch(path) is not None
+                and (headers or {}).get('Authorization') in app_auths)
+
+    def pick(self, method, url, exclude=()):
+        """Return the pooled token with the most quota left for this endpoint.
+
+        Tokens in exclude (e.g. ones this request already got a 401 for) are
+        left out. Quarantined tokens are skipped unless every token is
+        quarantined, in which case the one released soonest is used. Ties are
+        broken at random so parallel processes spread out.
+        """
+        tokens = [t for t in pool_tokens() if t not in exclude] or pool_tokens()
+        keys = {t: twitter_ratelimit.endpoint_key(method, url, {'Authorization': _auth(t)}) for t in tokens}
+        buckets = self.limiter.peek(keys.values())
+        now = time.time()
+        with self._lock, self._state() as state:
+            quarantine = {t: state.get(_id(t), {}).get('quarantined_until', 0) for t in tokens}
+        healthy = [t for t in tokens if quarantine[t] <= now]
+        if not healthy:
+            return min(tokens, key=lambda t: quarantine[t])
+
+        def score(token):
+            bucket = buckets[keys[token]]
+            if bucket is None:
+                return (1, float('inf'), random.random())
+            if bucket['remaining'] > 0:
+                return (1, bucket['remaining'], random.random())
+            return (0, -bucket['reset'], random.random())  # All empty: soonest reset
+        return max(healthy, key=score)
+
+    def record(self, token, status):
+        """Count a response for token; a 401 quarantines it unless it is the user token."""
+        now = time.time()
+        with self._lock, self._state() as state:
+            entry = state.setdefault(_id(token), {'requests': 0})
+            entry['requests'] += 1
+            entry['last_used'] = int(now)
+            if status == 429:
+                entry['throttled'] = entry.get('throttled', 0) + 1
+            elif status == 401:
+                entry['unauthorized'] = entry.get('unauthorized', 0) + 1
+                if not _is_user_token(token):
+                    entry['quarantined_until'] = now + QUARANTINE_UNAUTHORIZED
+            elif status < 400 and entry.get('quarantined_until', 0) > now:
+                entry['quarantined_until'] = 0  # Working again (e.g. a re-enabled app)
+
+    def stats(self):
+        """Usage and quarantine state of each pooled token, by credential hash."""
+        now = time.time()
+        with self._lock, self._state() as state:
+            usage = {_id(t): dict(state.get(_id(t), {'requests': 0})) for t in pool_tokens()}
+        for entry in usage.values():
+            until = entry.pop('quarantined_until', 0)
+            if until > now:
+                entry['quarantined_for'] = int(until - now)
+        return usage
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool backed by credentials.json in the cache dir."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import twitter_cache
+            _pool = CredentialPool(os.path.join(twitter_cache.cache_dir(), 'credentials.json'),
+                                   twitter_ratelimit.get_limiter())
+        return _pool
@@ -0,0 +1,181 @@
+"""
+Rate-limit scheduler shared by every twitter-api.py process.
+
+Each (credential, endpoint) pair is a token bucket whose size and refill
+time come from the x-rate-limit-limit / -remaining / -reset response headers.
+The buckets live in a JSON file in the cache directory, guarded by an flock,
+so parallel workflow runs see each other's usage: a request reserves a token
+before it is sent, and when a bucket is empty callers sleep until its reset
+instead of spending a request on a 429.
+"""
+
+import os
+import json
+import hashlib
+import random
+import re
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+DEFAULT_MAX_WAIT = 20.0
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 16.0
+
+_ID_SEGMENT = re.compile(r'(?<=.)/\d+(?=/|$)')  # Keeps the leading /2 version
+_USERNAME_SEGMENT = re.compile(r'(?<=/by/username)/[^/]+')
+
+
+def credential_id(auth):
+    """Short hash of an Authorization header value ('anon' without one)."""
+    return hashlib.sha256(auth.encode()).hexdigest()[:12] if auth else 'anon'
+
+
+def endpoint_key(method, url, headers):
+    """Bucket key: a hash of the credential plus method and templated path."""
+    path = _ID_SEGMENT.sub('/:id', urllib.parse.urlsplit(url).path)
+    path = _USERNAME_SEGMENT.sub('/:username', path)  # One bucket for all usernames
+    return f"{credential_id((headers or {}).get('Authorization', ''))} {method.upper()} {path}"
+
+
+def endpoint_label(key):
+    """The human-readable part of a bucket key (method and path)."""
+    return key.split(' ', 1)[1]
+
+
+@contextmanager
+def locked_json(path):
+    """Yield the dict stored in a JSON file under an flock on path + '.lock'.
+
+    The dict is written back (atomically) when the block exits normally.
+    """
+    import fcntl
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            yield state
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RateLimiter:
+    """File-backed token buckets keyed by endpoint_key()."""
+
+    def __init__(self, path, max_wait=DEFAULT_MAX_WAIT):
+        self.path = path
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._memory = {}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._persistent = True
+        except OSError:
+            self._persistent = False
+
+    @contextmanager
+    def _state(self):
+        """Yield the mutable bucket state under both the thread and file lock."""
+        with self._lock:
+            if not self._persistent:
+                yield self._memory
+                return
+            with locked_json(self.path) as state:
+                yield state
+
+    def acquire(self, key, max_wait=None):
+        """Reserve one request for key, sleeping while its bucket is empty.
+
+        Returns 0 once a token is reserved, or the number of seconds until the
+        reset when that is longer than max_wait (nothing is reserved then).
+        max_wait defaults to the limiter's own.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        while True:
+            now = time.time()
+            with self._state() as state:
+                bucket = state.get(key)
+                if bucket and bucket['reset'] <= now:
+                    bucket['remaining'] = bucket['limit']
+                if not bucket or bucket['remaining'] > 0:
+                    if bucket:
+                        bucket['remaining'] -= 1
+                    return 0
+                wait = bucket['reset'] - now
+            if wait > max_wait:
+                return wait
+            time.sleep(min(wait + random.uniform(0, 1), max_wait))
+
+    def peek(self, keys):
+        """Return {key: bucket or None} for keys, without reserving anything.
+
+        A bucket whose reset has passed is reported full.
+        """
+        now = time.time()
+        with self._state() as state:
+            buckets = {key: dict(state[key]) if key in state else None for key in keys}
+        for bucket in buckets.values():
+            if bucket and bucket['reset'] <= now:
+                bucket['remaining'] = bucket['limit']
+        return buckets
+
+    def update(self, key, headers):
+        """Record the server's view of a bucket from response headers."""
+        try:
+            limit = int(headers.get('x-rate-limit-limit'))
+            remaining = int(headers.get('x-rate-limit-remaining'))
+            reset = int(headers.get('x-rate-limit-reset'))
+        except (TypeError, ValueError):
+            return None
+        bucket = {'limit': limit, 'remaining': remaining, 'reset': reset}
+        with self._state() as state:
+            state[key] = bucket
+        return bucket
+
+    def exhaust(self, key, reset):
+        """Mark a bucket empty until `reset` (used on 429s without headers)."""
+        with self._state() as state:
+            bucket = state.setdefault(key, {'limit': 1, 'remaining': 0, 'reset': reset})
+            bucket['remaining'] = 0
+            bucket['reset'] = max(bucket['reset'], reset)
+
+
+def describe(bucket):
+    """Quota summary for command output."""
+    return {
+        'limit': bucket['limit'],
+        'remaining': bucket['remaining'],
+        'reset_in': max(0, int(bucket['reset'] - time.time())),
+    }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the process-wide limiter backed by ratelimit.json in the cache dir."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            import twitter_cache
+            try:
+                max_wait = float(os.environ.get('TWITTER_RATELIMIT_MAX_WAIT', DEFAULT_MAX_WAIT))
+            except ValueError:
+                max_wait = DEFAULT_MAX_WAIT
+            _limiter = RateLimiter(os.path.join(twitter_cache.cache_dir(), 'ratelimit.json'), max_wait)
+        return _limiter
@@ -0,0 +1,181 @@
+"""
+Request coalescing for twitter-api.py: identical concurrent GETs share one
+upstream call.
+
+Within a process, threads asking for the same key wait on the first one's
+result. Across processes, the first caller holds an flock on
+inflight/<key>.lock in the cache directory while it fetches. Callers that
+find the lock taken touch <key>.wait and wait for the lock; a leader that
+sees that marker leaves its result in <key>.json before unlocking, and the
+followers use it if it was written after they started waiting. Without
+followers nothing is written, and neither is a value the caller's share()
+rejects (e.g. an error the leader made up under its own deadline): the
+followers then fetch for themselves. Only requests that overlap are merged. Later
+identical requests go upstream again, so this is not a cache. A crashed
+leader releases its lock with the process, and its followers then fetch for
+themselves.
+"""
+
+import os
+import json
+import random
+import threading
+import time
+
+DEFAULT_WAIT = 30.0
+RESULT_MAX_AGE = 300  # Files older than this are swept away
+SWEEP_EVERY = 64  # One leader call in this many (on average) sweeps the directory
+_POLL = 0.01
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run fn once per key among concurrent callers, in and across processes."""
+
+    def __init__(self, directory, wait=DEFAULT_WAIT):
+        self.directory = directory
+        self.wait = wait
+        self._lock = threading.Lock()
+        self._calls = {}
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            import fcntl  # noqa: F401  (POSIX only; elsewhere coalesce in-process)
+            self._cross_process = True
+        except (OSError, ImportError):
+            self._cross_process = False
+
+    def do(self, key, fn, wait=None, share=None):
+        """Return (value, shared). fn() must return a JSON-serializable value.
+
+        shared is True when the value came from another caller's request.
+        Each caller gets its own copy of the value. A caller that has waited
+        `wait` seconds (default: the group's) for another one calls fn()
+        itself, as do the callers waiting on a value share(value) rejects.
+        """
+        wait = self.wait if wait is None else wait
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if not call.done.wait(wait):
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            if call.result is None:
+                return fn(), False  # Not shareable
+            return json.loads(call.result), True
+
+        try:
+            if self._cross_process:
+                value, shared = self._flock_do(key, fn, wait, share)
+            else:
+                value, shared = fn(), False
+            if share is None or share(value):
+                call.result = json.dumps(value)
+            return value, shared
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _flock_do(self, key, fn, wait, share=None):
+        import fcntl
+        lock_path = os.path.join(self.directory, f'{key}.lock')
+        result_path = os.path.join(self.directory, f'{key}.json')
+        wait_path = os.path.join(self.directory, f'{key}.wait')
+        started = time.time()
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another process is fetching this key: ask for its result and wait
+                try:
+                    os.close(os.open(wait_path, os.O_WRONLY | os.O_CREAT, 0o600))
+                except OSError:
+                    pass
+                deadline = time.monotonic() + wait
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except OSError:
+                        if time.monotonic() >= deadline:
+                            return fn(), False
+                        time.sleep(_POLL)
+                shared = self._read_result(result_path, started)
+                if shared is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    return shared, True
+            try:
+                os.utime(lock_path)  # Keeps _sweep() off a lock in use
+                value = fn()
+                if os.path.exists(wait_path):
+                    if share is None or share(value):
+                        self._write_result(result_path, value)
+                    try:
+                        os.unlink(wait_path)
+                    except OSError:
+                        pass
+                return value, False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                if random.random() * SWEEP_EVERY < 1:
+                    self._sweep()
+
+    @staticmethod
+    def _read_result(path, since):
+        """The value left by a leader that finished after `since`, or None."""
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry['value'] if entry.get('at', 0) >= since else None
+
+    def _write_result(self, path, value):
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'at': time.time(), 'value': value}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _sweep(self):
+        """Remove result and lock files of keys nobody has asked for lately."""
+        cutoff = time.time() - RESULT_MAX_AGE
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(('.json', '.lock', '.wait')) and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+        except OSError:
+            pass
+
+
+_flight = None
+_flight_lock = threading.Lock()
+
+
+def get_flight():
+    """Return the process-wide SingleFlight, or None with TWITTER_SINGLEFLIGHT=0."""
+    global _flight
+    if os.environ.get('TWITTER_SINGLEFLIGHT', '1') == '0':
+        return None
+    with _flight_lock:
+        if _flight is None:
+            import twitter_cache
+            _flight = SingleFlight(os.path.join(twitter_cache.cache_dir(), 'inflight'))
+        return _flight
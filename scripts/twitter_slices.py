@@ -0,0 +1,107 @@
+"""
+Time slices for `twitter-api.py search --parallel`.
+
+Following next_token is strictly sequential, so a query with 5,000 recent
+matches costs 50 round-trips one after another. Instead the window is cut
+into start_time/end_time slices that are paged concurrently and merged.
+
+The cuts come from the query's hourly volumes (one /2/tweets/counts/recent
+request), so that every slice holds about the same number of tweets,
+assuming tweets are spread evenly within an hour: a busy hour is cut into
+several slices and a quiet day stays in one. With a limit, the window is
+first narrowed to the newest stretch that holds that many tweets. Without
+volumes (the counts endpoint is not available to every app), the window
+is cut into equal spans instead.
+"""
+
+import math
+import time
+from datetime import datetime, timezone
+
+RECENT_WINDOW = 7 * 86400  # How far back recent search reaches
+START_MARGIN = 60  # Keeps start_time inside that reach by the time the request arrives
+END_MARGIN = 15  # end_time must be at least 10 seconds before the request
+SLICES_PER_WORKER = 2  # Spare slices, so one slow slice does not hold up the others
+PAGE_SIZE = 100
+
+
+def parse_time(text):
+    """Epoch seconds of an ISO 8601 date or datetime (UTC unless it has an offset)."""
+    parsed = datetime.fromisoformat(str(text).strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def iso(ts):
+    """start_time/end_time format (whole seconds, UTC)."""
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
+
+
+def window(since=None, until=None, now=None):
+    """(start, end) in whole epoch seconds, clamped to what recent search accepts."""
+    now = now or time.time()
+    start = max(since or 0, now - RECENT_WINDOW + START_MARGIN)
+    end = min(until or now, now - END_MARGIN)
+    return math.ceil(start), math.floor(end)
+
+
+def volumes(counts):
+    """[(start, end, tweet_count)] from the data of a counts response, oldest first."""
+    return sorted((parse_time(b['start']), parse_time(b['end']), b['tweet_count']) for b in counts)
+
+
+def _clip(buckets, start, end):
+    """Buckets cut to [start, end), their counts scaled to the part kept."""
+    clipped = []
+    for b_start, b_end, count in buckets:
+        lo, hi = max(b_start, start), min(b_end, end)
+        if hi > lo:
+            clipped.append((lo, hi, count * (hi - lo) / (b_end - b_start)))
+    return clipped
+
+
+def _time_at(buckets, target):
+    """When the target-th tweet of the buckets (oldest first) was posted."""
+    seen = 0
+    for start, end, count in buckets:
+        if count and seen + count >= target:
+            return start + (end - start) * (target - seen) / count
+        seen += count
+    return buckets[-1][1]
+
+
+def _newest_start(buckets, limit):
+    """Start of the newest stretch of the buckets that holds `limit` tweets."""
+    seen = 0
+    for start, end, count in reversed(buckets):
+        if count and seen + count >= limit:
+            return end - (end - start) * (limit - seen) / count
+        seen += count
+    return buckets[0][0]
+
+
+def plan(start, end, workers, buckets=None, limit=None):
+    """Cut [start, end) into slices; returns ([(start, end)] newest first, estimated tweets).
+
+    buckets are volumes() of the query over the window, or None when they
+    are unknown, in which case the estimate is None too.
+    """
+    buckets = _clip(buckets or [], start, end)
+    if not buckets:
+        n = workers * SLICES_PER_WORKER
+        cuts = [start + (end - start) * k / n for k in range(n + 1)]
+        estimate = None
+    else:
+        if limit:
+            start = max(start, math.floor(_newest_start(buckets, limit)))
+            buckets = _clip(buckets, start, end)
+        total = sum(count for _, _, count in buckets)
+        # Slices of whole pages: 21 pages over 16 slots is 11 slices of 2 pages
+        # (22 requests), not 16 slices of 1.3 pages (32 requests)
+        pages = max(1, math.ceil(total / PAGE_SIZE))
+        n = math.ceil(pages / math.ceil(pages / (workers * SLICES_PER_WORKER)))
+        cuts = [start] + [_time_at(buckets, total * k / n) for k in range(1, n)] + [end]
+        estimate = round(total)
+    cuts = sorted({start, end} | {round(c) for c in cuts})  # Timestamps have whole seconds
+    return [(a, b) for a, b in zip(cuts, cuts[1:])][::-1], estimate
@@ -0,0 +1,206 @@
+"""
+Filtered-stream consumer for `twitter-api.py stream`.
+
+Instead of polling recent search, `stream` makes the app's filtered-stream
+rules match a set of named queries (rule tag = name, value = query) and
+holds one long-lived connection to /2/tweets/search/stream. The body is
+newline-delimited JSON: one line per matching tweet, plus an empty line
+every 20 seconds as a keep-alive. Lines are decoded as the chunks arrive.
+
+A connection that errors, ends or goes quiet for STALL_TIMEOUT seconds is
+reopened after a backoff, following the API's reconnection guidance:
+linear from 250 ms (capped at 16 s) after network errors and stalls,
+exponential from 5 s (capped at 320 s) after HTTP errors, and from 1
+minute after a 429. Credential and request errors (400, 401, 403) stop
+the consumer instead, since reconnecting cannot fix them.
+
+Received tweets are appended to a Queue: an append-only NDJSON file in
+the cache directory, one tweet per line, each written with a single
+O_APPEND write. Consumers read it by byte offset (`stream_read` keeps an
+offset per consumer), so the writer never waits for readers.
+"""
+
+import os
+import json
+import http.client
+import time
+
+import twitter_http
+
+STALL_TIMEOUT = 30.0  # The API sends a keep-alive at least every 20 seconds
+FATAL_STATUSES = (400, 401, 403)
+MAX_ERRORS_KEPT = 5
+
+
+def rule_changes(current, desired):
+    """(rules to add, rule IDs to delete) turning `current` into the {tag: value} set."""
+    wanted = {(value, tag) for tag, value in desired.items()}
+    kept, delete = set(), []
+    for rule in current:
+        pair = (rule['value'], rule.get('tag'))
+        if pair in wanted and pair not in kept:
+            kept.add(pair)
+        else:
+            delete.append(rule['id'])
+    add = [{"value": value, "tag": tag} for tag, value in desired.items() if (value, tag) not in kept]
+    return add, delete
+
+
+def reconnect_delay(attempt, status=None):
+    """Seconds to wait before reconnecting after `attempt` failures in a row.
+
+    status is the HTTP status of the failed connection, or None for a
+    network error, a stall or a stream the server ended.
+    """
+    if status is None:
+        return min(16.0, 0.25 * (attempt + 1))
+    if status == 429:
+        return min(960.0, 60.0 * 2 ** attempt)
+    return min(320.0, 5.0 * 2 ** attempt)
+
+
+def lines(chunks):
+    """Split byte chunks into lines as they complete; keep-alives come out as b''.
+
+    A trailing partial line (the connection dropped mid-message) is discarded.
+    """
+    buffer = b''
+    for chunk in chunks:
+        buffer += chunk
+        if b'\n' not in chunk:
+            continue
+        *complete, buffer = buffer.split(b'\n')
+        for line in complete:
+            yield line.rstrip(b'\r')
+
+
+def consume(url, headers, on_tweet, until=None, stall_timeout=STALL_TIMEOUT, sleep=time.sleep):
+    """Hold the stream open, reconnecting as needed, and pass each tweet message on.
+
+    on_tweet(message) gets every decoded message with `data`; returning False
+    stops the consumer. `until` is a time.monotonic() value to stop at.
+    Returns counters plus the last few errors; `fatal` is set when an error
+    that reconnecting cannot fix ended the run.
+    """
+    stats = {'connections': 0, 'reconnects': 0, 'keepalives': 0, 'errors': [], 'fatal': None}
+    attempt = 0
+
+    def time_left():
+        return None if until is None else until - time.monotonic()
+
+    def read_timeout():
+        left = time_left()
+        return stall_timeout if left is None else max(0.01, min(stall_timeout, left))
+
+    def note(error):
+        stats['errors'] = (stats['errors'] + [error])[-MAX_ERRORS_KEPT:]
+
+    try:
+        while time_left() is None or time_left() > 0:
+            status = None
+            try:
+                with twitter_http.open_stream(url, headers, timeout=read_timeout()) as stream:
+                    stats['connections'] += 1
+                    if stream.status != 200:
+                        status = stream.status
+                        body = stream.read().decode(errors='replace')
+                        try:
+                            body = json.loads(body)
+                        except json.JSONDecodeError:
+                            pass
+                        note({'status': status, 'error': body})
+                        if status in FATAL_STATUSES:
+                            stats['fatal'] = {'status': status, 'error': body}
+                            return stats
+                    else:
+                        for line in lines(stream.chunks(read_timeout)):
+                            attempt = 0  # Data is flowing again
+                            if not line:
+                                stats['keepalives'] += 1
+                            else:
+                                try:
+                                    message = json.loads(line)
+                                except json.JSONDecodeError:
+                                    note({'error': 'Undecodable stream line', 'line': line[:200].decode(errors='replace')})
+                                    continue
+                                if 'data' in message:
+                                    if on_tweet(message) is False:
+                                        return stats
+                                elif 'errors' in message:
+                                    note({'error': message['errors']})  # e.g. operational-disconnect
+                            if time_left() is not None and time_left() <= 0:
+                                return stats
+                        note({'error': 'Stream ended by the server'})
+            except TimeoutError:
+                if time_left() is not None and time_left() <= 0:
+                    return stats
+                note({'error': f'No data or keep-alive for {stall_timeout:g}s'})
+            except (OSError, http.client.HTTPException) as e:
+                note({'error': f'{type(e).__name__}: {e}'})
+
+            delay = reconnect_delay(attempt, status)
+            attempt += 1
+            left = time_left()
+            if left is not None and left <= delay:
+                return stats
+            stats['reconnects'] += 1
+            sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    return stats
+
+
+class Queue:
+    """Append-only NDJSON file of stream records, read by byte offset."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, record):
+        """Add one record as a single O_APPEND write, so lines never interleave."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read(self, offset=0, limit=None):
+        """Return (records, offset after them) for the whole lines past offset.
+
+        An offset beyond the end (the file was truncated) starts over at 0.
+        A line still being written is left for the next read.
+        """
+        if offset > self.size():
+            offset = 0
+        records = []
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                while limit is None or len(records) < limit:
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        break
+                    offset += len(line)
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except OSError:
+            pass
+        return records, offset
+
+
+def get_queue(path=None):
+    """The queue at path, by default stream/queue.ndjson in the cache directory."""
+    if not path:
+        import twitter_cache
+        path = os.path.join(twitter_cache.cache_dir(), 'stream', 'queue.ndjson')
+    return Queue(path)
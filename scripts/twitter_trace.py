@@ -0,0 +1,65 @@
+"""
+Per-invocation timing for twitter-api.py (`--trace` / TWITTER_TRACE).
+
+A Trace accumulates monotonic millisecond timings per phase (startup, imports,
+.env parsing, JSON decoding, tweet formatting, output) and one record per
+HTTP attempt, including rate-limit waits, retries and every page. In "block"
+mode the timings are attached to the result as `_timing`; in "stderr" mode
+each record is also written to stderr as a JSON line when it happens, so
+slow calls can be followed live and aggregated across runs.
+"""
+
+import os
+import sys
+import json
+import threading
+import time
+
+
+def process_age_ms():
+    """Milliseconds since this process was started, from /proc (Linux only)."""
+    try:
+        with open('/proc/self/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return (uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')) * 1000
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Trace:
+    """Timings for one command invocation."""
+
+    def __init__(self, mode, startup=None):
+        self.mode = mode
+        self.started = time.perf_counter()
+        self.phases = dict(startup or {})
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def add(self, phase, ms):
+        """Accumulate ms into a phase."""
+        with self._lock:
+            self.phases[phase] = round(self.phases.get(phase, 0) + ms, 2)
+
+    def request(self, record):
+        """Record one HTTP attempt."""
+        record = {'t_ms': round((time.perf_counter() - self.started) * 1000, 2), **record}
+        with self._lock:
+            self.requests.append(record)
+        if self.mode == 'stderr':
+            print(json.dumps({'trace': 'request', **record}), file=sys.stderr, flush=True)
+
+    def summary(self):
+        with self._lock:
+            return {
+                'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+                'phases': dict(self.phases),
+                'requests': list(self.requests),
+            }
+
+    def finish(self):
+        """Write the final summary line in stderr mode."""
+        if self.mode == 'stderr':
+            print(json.dumps({'trace': 'summary', **self.summary()}), file=sys.stderr, flush=True)